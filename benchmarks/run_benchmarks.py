@@ -0,0 +1,379 @@
+"""
+Benchmark suite for ostaGIS.
+
+Runs parse_country (every engine), state_dept_twas (against a saved/synthetic feed), wfb_country_scrape,
+wfb_tos_geoscraper and the geomatch replication (geopandas backend) on the bundled help/ datasets,
+scaled up with synthetic inputs, and writes the results as JSON.
+
+Usage:
+    python benchmarks/run_benchmarks.py --scales 1 10 100 --output bench.json
+    python benchmarks/run_benchmarks.py --only parse_country --engines batch rowwise matcher --scales 1 10
+    python benchmarks/run_benchmarks.py --compare baseline.json --max-regression 0.25   # exit 1 on a regression
+
+Each result row has the benchmark, variant (engine/mode), scale, rows, wall_s (best of --repeat runs), rows_per_s
+and the peak memory of a separate run (skip with --no-memory): peak_mem_mb (Python allocations, tracemalloc),
+arrow_peak_mb (Arrow memory pool...Arrow backed strings, Parquet/Feather I/O, which tracemalloc does not see) and
+rss_peak_mb (process resident set size over the run, where the platform reports it).
+"""
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+
+import ostaGIS  # noqa: E402
+
+HELP = os.path.join(REPO, "help")
+T_ORGS_CSV = os.path.join(HELP, "example_datasets", "wfb_t_orgs_geolocated.csv")
+ADVISORIES_XLSX = os.path.join(HELP, "example_datasets", "travel_advisories.xlsx")
+WFB_HTML = os.path.join(HELP, "world_fact_book_scraping", "CIA_wfb.html")
+T_ORGS_HTML = os.path.join(HELP, "mapping_t_orgs", "CIA_t_o.html")
+
+
+# ******* GENERATORS ****************************************************************************
+# ******* GENERATORS ****************************************************************************
+# ******* GENERATORS ****************************************************************************
+def synthetic_aor_text(scale, seed=0):
+    """
+    Description:
+        AOR text rows for parse_country...the bundled 'area of operation' column repeated 'scale' times,
+        with the sentences shuffled between rows so repeated rows are not all identical.
+    Returns:
+        pandas DataFrame with an 'area of operation' column (len == 262 * scale)
+    """
+    import pandas as pd
+
+    rng = random.Random(seed)
+    base = pd.read_csv(T_ORGS_CSV)["area of operation"].dropna().tolist()
+    rows = []
+    for _ in range(scale):
+        for text in base:
+            words = text.split()
+            # Swap in words of another row so the text varies like real AORs do
+            other = rng.choice(base).split()
+            cut = rng.randint(0, len(words))
+            rows.append(" ".join(words[:cut] + other[: rng.randint(0, len(other))]))
+    return pd.DataFrame({"area of operation": rows})
+
+
+def synthetic_feed(scale):
+    """
+    Description:
+        State Dept RSS feed (bytes) built from the bundled travel_advisories.xlsx, every advisory repeated 'scale' times
+        (with unique Country-Tags so every copy is kept).
+    """
+    from xml.sax.saxutils import escape
+    import pandas as pd
+
+    twas = pd.read_excel(ADVISORIES_XLSX).drop_duplicates("DoS_gen2alpha")
+    items = []
+    for r in range(scale):
+        suffix = "" if r == 0 else str(r)
+        for row in twas.itertuples():
+            summary = row.summary if isinstance(row.summary, str) else ""
+            if isinstance(row.summary_cont, str):
+                summary = f"{summary} {row.summary_cont}"
+            items.append(
+                f"<item><title>{escape(row.label)}</title><link>{escape(row.link)}</link>"
+                f'<category domain="Country-Tag">{row.DoS_gen2alpha}{suffix}</category>'
+                f"<pubDate>{escape(str(row.published))}</pubDate><description>{escape(summary)}</description></item>"
+            )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?><rss version="2.0"><channel><title>travel.state.gov: Travel Advisories</title>'
+        + "".join(items) + "</channel></rss>"
+    ).encode("utf-8")
+
+
+def inflated_html(source, scale, folder):
+    """
+    Description:
+        Saved page with its content repeated 'scale' times (like a much larger full-site save).
+    Returns:
+        path of the inflated html file
+    """
+    with open(source, "r", encoding="utf-8") as file:
+        html = file.read()
+    path = os.path.join(folder, f"{os.path.splitext(os.path.basename(source))[0]}_x{scale}.html")
+    with open(path, "w", encoding="utf-8") as file:
+        file.write(html * scale)
+    return path
+
+
+def synthetic_countries(codes, n_vertices=500, seed=0):
+    """
+    Description:
+        GeoDataFrame with one random star shaped polygon per ISO3 code ('ISO_CC').
+    """
+    import math
+    import geopandas as gpd
+    from shapely.geometry import Polygon
+
+    rng = random.Random(seed)
+    geoms = []
+    for i, _ in enumerate(codes):
+        cx, cy = (i % 20) * 10, (i // 20) * 10
+        geoms.append(Polygon([
+            (cx + (4 + rng.random()) * math.cos(2 * math.pi * k / n_vertices), cy + (4 + rng.random()) * math.sin(2 * math.pi * k / n_vertices))
+            for k in range(n_vertices)
+        ]))
+    return gpd.GeoDataFrame({"ISO_CC": list(codes)}, geometry=geoms, crs="EPSG:4326")
+
+
+def synthetic_t_org_table(scale):
+    """
+    Description:
+        The bundled wfb_t_orgs_geolocated table repeated 'scale' times...same 74 names (layers), 'scale' times the records.
+    """
+    import pandas as pd
+
+    return pd.concat([pd.read_csv(T_ORGS_CSV)] * scale, ignore_index=True)
+
+
+# ******* BENCHMARKS ****************************************************************************
+# ******* BENCHMARKS ****************************************************************************
+# ******* BENCHMARKS ****************************************************************************
+# Each benchmark returns a list of (variant, rows, setup) where setup() -> run() does the timed work
+def bench_parse_country(scale, engines, workdir):
+    df = synthetic_aor_text(scale)
+
+    def setup(engine):
+        return lambda: ostaGIS.parse_country(df, "area of operation", "country_aor", engine=engine)
+
+    return [(engine, len(df), lambda engine=engine: setup(engine)) for engine in engines]
+
+
+def bench_state_dept_twas(scale, engines, workdir):
+    feed = synthetic_feed(scale)
+    rows = feed.count(b"<item>")
+    out = os.path.join(workdir, "twas.parquet")
+    return [
+        ("dataframe", rows, lambda: (lambda: ostaGIS.state_dept_twas(source=feed))),
+        ("parquet", rows, lambda: (lambda: ostaGIS.state_dept_twas(out, source=feed))),
+        ("xlsx", rows, lambda: (lambda: ostaGIS.state_dept_twas(os.path.join(workdir, "twas.xlsx"), source=feed))),
+    ]
+
+
+def bench_wfb_country_scrape(scale, engines, workdir):
+    path = inflated_html(WFB_HTML, scale, workdir)
+    with open(path, "r", encoding="utf-8") as file:
+        rows = file.read().count("<a ")
+    return [("dataframe", rows, lambda: (lambda: ostaGIS.wfb_country_scrape(path)))]
+
+
+def bench_wfb_tos_geoscraper(scale, engines, workdir):
+    path = inflated_html(T_ORGS_HTML, scale, workdir)
+    with open(path, "r", encoding="utf-8") as file:
+        rows = file.read().count('class="pb30"')
+    return [
+        ("geoscraper", rows, lambda: (lambda: ostaGIS.wfb_tos_geoscraper(path))),
+        ("batch", rows, lambda: (lambda: ostaGIS.wfb_tos_batch([path]))),
+    ]
+
+
+def bench_geomatch(scale, engines, workdir):
+    table = synthetic_t_org_table(scale)
+    countries = synthetic_countries(sorted(table["country_aor"].dropna().unique()))
+
+    def setup(mode, fmt):
+        out = os.path.join(workdir, f"geomatch_{mode}.{fmt}")
+        return lambda: ostaGIS.geomatch_and_multiply(countries, table, "index", out_gdb=out, backend="geopandas", output_mode=mode)
+
+    return [
+        (f"{mode}_{fmt}", len(table), lambda mode=mode, fmt=fmt: setup(mode, fmt))
+        for mode in ("multiplied", "normalized") for fmt in ("gpkg", "parquet")
+    ]
+
+
+BENCHMARKS = {
+    "parse_country": bench_parse_country,
+    "state_dept_twas": bench_state_dept_twas,
+    "wfb_country_scrape": bench_wfb_country_scrape,
+    "wfb_tos_geoscraper": bench_wfb_tos_geoscraper,
+    "geomatch": bench_geomatch,
+}
+
+
+# ******* RUNNER ********************************************************************************
+# ******* RUNNER ********************************************************************************
+# ******* RUNNER ********************************************************************************
+def _time_run(setup, repeat):
+    # Best wall time of 'repeat' runs (prints of the functions are silenced)
+    best = None
+    for _ in range(repeat):
+        run = setup()
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            run()
+            wall = time.perf_counter() - start
+        best = wall if best is None else min(best, wall)
+    return best
+
+
+def _rss():
+    # Resident set size of this process in bytes (None where /proc is not available)
+    try:
+        with open("/proc/self/statm") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _peak_memory(setup, interval=0.005):
+    """
+    Description:
+        Peak memory (MB) of one run...Python allocations (tracemalloc), the Arrow memory pool over what it held before the run,
+        and the process RSS. Arrow and RSS are sampled every 'interval' seconds on a thread...the pool's own high water mark
+        is also used for the Arrow peak when the run pushed it past any earlier run.
+    Returns:
+        (python peak, arrow peak or None, rss peak or None)
+    """
+    try:
+        import pyarrow as pa
+    except ImportError:
+        pa = None
+    pool = pa.default_memory_pool() if pa is not None else None
+    run = setup()
+
+    arrow_start = pool.bytes_allocated() if pool is not None else 0
+    arrow_max_before = pool.max_memory() if pool is not None else 0
+    peaks = {"arrow": arrow_start, "rss": _rss()}
+    done = threading.Event()
+
+    def sample():
+        while not done.is_set():
+            if pool is not None:
+                peaks["arrow"] = max(peaks["arrow"], pool.bytes_allocated())
+            rss = _rss()
+            if rss is not None:
+                peaks["rss"] = max(peaks["rss"] or 0, rss)
+            done.wait(interval)
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    tracemalloc.start()
+    sampler.start()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            run()
+        python_peak = tracemalloc.get_traced_memory()[1] / 2 ** 20
+    finally:
+        done.set()
+        sampler.join()
+        tracemalloc.stop()
+
+    arrow_peak = None
+    if pool is not None:
+        arrow_max = pool.max_memory() or 0
+        highest = max(peaks["arrow"], arrow_max if arrow_max > arrow_max_before else 0)
+        arrow_peak = (highest - arrow_start) / 2 ** 20
+    rss_peak = peaks["rss"] / 2 ** 20 if peaks["rss"] is not None else None
+    return python_peak, arrow_peak, rss_peak
+
+
+def run_benchmarks(only=None, scales=(1, 10), engines=("batch", "matcher"), repeat=3, memory=True, log=print):
+    """
+    Description:
+        Run the benchmarks and return the results as a dict (see the module docstring).
+    """
+    import country_converter as coco
+    import pandas as pd
+
+    ostaGIS.warmup()
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for name, bench in BENCHMARKS.items():
+            if only and name not in only:
+                continue
+            for scale in scales:
+                for variant, rows, setup in bench(scale, engines, workdir):
+                    wall = _time_run(setup, repeat)
+                    peak, arrow_peak, rss_peak = _peak_memory(setup) if memory else (None, None, None)
+                    row = {
+                        "benchmark": name,
+                        "variant": variant,
+                        "scale": scale,
+                        "rows": rows,
+                        "wall_s": round(wall, 6),
+                        "rows_per_s": round(rows / wall, 2) if wall > 0 else None,
+                        "peak_mem_mb": round(peak, 3) if peak is not None else None,
+                        "arrow_peak_mb": round(arrow_peak, 3) if arrow_peak is not None else None,
+                        "rss_peak_mb": round(rss_peak, 3) if rss_peak is not None else None,
+                    }
+                    results.append(row)
+                    log(f"{name:<20} {variant:<22} x{scale:<5} {rows:>9} rows {wall:>9.3f} s {row['rows_per_s'] or 0:>12.1f} rows/s"
+                        + (f" {peak:>9.1f} MB" if peak is not None else "")
+                        + (f" {arrow_peak:>9.1f} MB arrow" if arrow_peak is not None else "")
+                        + (f" {rss_peak:>9.1f} MB rss" if rss_peak is not None else ""))
+
+    return {
+        "meta": {
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "pandas": pd.__version__,
+            "country_converter": coco.__version__,
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+
+
+def compare(results, baseline, max_regression):
+    """
+    Description:
+        Rows/sec of each result against the same benchmark/variant/scale of a baseline run.
+    Returns:
+        list of regressions -- (key, baseline rows/s, rows/s) slower than the baseline by more than max_regression
+    """
+    base = {(r["benchmark"], r["variant"], r["scale"]): r["rows_per_s"] for r in baseline["results"]}
+    regressions = []
+    for r in results["results"]:
+        key = (r["benchmark"], r["variant"], r["scale"])
+        if base.get(key) and r["rows_per_s"] is not None and r["rows_per_s"] < base[key] * (1 - max_regression):
+            regressions.append((key, base[key], r["rows_per_s"]))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ostaGIS benchmark suite")
+    parser.add_argument("--only", nargs="*", choices=list(BENCHMARKS), help="benchmarks to run (default -- all)")
+    parser.add_argument("--scales", nargs="*", type=int, default=[1, 10], help="input scales, i.e., 1 10 100 1000 (default -- 1 10)")
+    parser.add_argument("--engines", nargs="*", default=["batch", "matcher"],
+                        help="parse_country engines (default -- batch matcher...add rowwise for the slow reference engine)")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per benchmark...the best wall time is kept")
+    parser.add_argument("--no-memory", action="store_true", help="skip the peak memory (tracemalloc/Arrow pool/RSS) run")
+    parser.add_argument("--output", help="write the JSON results to this path (default -- stdout)")
+    parser.add_argument("--compare", help="baseline JSON results to compare rows/sec against")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="allowed rows/sec slowdown vs the baseline (default -- 0.2)")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.only, args.scales, args.engines, args.repeat, not args.no_memory, log=lambda msg: print(msg, file=sys.stderr))
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(text)
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as file:
+            regressions = compare(results, json.load(file), args.max_regression)
+        for key, before, after in regressions:
+            print(f"REGRESSION {key}: {before} -> {after} rows/s", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,10 +1,539 @@
+import contextlib
+import re
+import threading
+import time
+
+
+# ******* SHARED CONVERTER **********************************************************************
+# ******* SHARED CONVERTER **********************************************************************
+# ******* SHARED CONVERTER **********************************************************************
+# One CountryConverter/CountryMatcher per process, built the first time a function needs it (or by warmup)
+_shared = {}
+_shared_lock = threading.RLock()
+
+
+def _get_converter():
+    # Shared coco.CountryConverter...loading the coco country table is only done once per process
+    cc = _shared.get("cc")
+    if cc is None:
+        with _shared_lock:
+            if "cc" not in _shared:
+                import country_converter as coco
+                _shared["cc"] = coco.CountryConverter()
+            cc = _shared["cc"]
+    return cc
+
+
+def _get_matcher():
+    # Shared CountryMatcher...its word/phrase results are kept between calls
+    matcher = _shared.get("matcher")
+    if matcher is None:
+        with _shared_lock:
+            if "matcher" not in _shared:
+                _shared["matcher"] = CountryMatcher(_get_converter())
+            matcher = _shared["matcher"]
+    return matcher
+
+
+def _get_fuzzy():
+    # Shared FuzzyCountryResolver...the trigram index of the coco names is built once per process
+    fuzzy = _shared.get("fuzzy")
+    if fuzzy is None:
+        with _shared_lock:
+            if "fuzzy" not in _shared:
+                _shared["fuzzy"] = FuzzyCountryResolver(_get_converter())
+            fuzzy = _shared["fuzzy"]
+    return fuzzy
+
+
+def warmup(matcher=True):
+    """
+    Description:
+        Build the shared country converter (and country matcher) now instead of on the first function call.
+        Use at the start of a worker/service so the first request does not pay the start up cost.
+    Params:
+        matcher: True or False -- also build the CountryMatcher used by parse_country(engine="matcher") (default -- True)
+    """
+    _get_converter()
+    if matcher:
+        _get_matcher()
+
+
+# ******* INSTRUMENTATION ***********************************************************************
+# ******* INSTRUMENTATION ***********************************************************************
+# ******* INSTRUMENTATION ***********************************************************************
+# Collectors the functions report stage spans and counters to...nothing is measured while the list is empty
+_collectors = []
+_null_span = contextlib.nullcontext()
+
+
+class _Span:
+    # Time a stage and report it to every collector
+    __slots__ = ("stage", "labels", "start")
+
+    def __init__(self, stage, labels):
+        self.stage = stage
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        seconds = time.perf_counter() - self.start
+        for collector in list(_collectors):
+            collector.span(self.stage, seconds, self.labels)
+        return False
+
+
+def _span(stage, **labels):
+    # Context manager timing a stage (i.e., "state_dept_twas.fetch")...a shared no-op when no collector is registered
+    if not _collectors:
+        return _null_span
+    return _Span(stage, labels)
+
+
+def _count(name, value=1, **labels):
+    # Add to a counter (i.e., "rows_processed")...does nothing when no collector is registered
+    if not _collectors:
+        return
+    for collector in list(_collectors):
+        collector.count(name, value, labels)
+
+
+def add_collector(collector):
+    """
+    Description:
+        Register a collector that every function reports its stage spans and counters to.
+        A collector is any object with the methods:
+            span(stage, seconds, labels) -- a stage finished (i.e., "state_dept_twas.fetch", "parse_country.match")
+            count(name, value, labels) -- a counter went up ("rows_processed", "tokens_matched", "not_found",
+                                          "cache_hits", "bytes_written")
+        labels is a dict (i.e., {"function": "parse_country"}).
+    Returns:
+        the collector
+    """
+    with _shared_lock:
+        _collectors.append(collector)
+    return collector
+
+
+def remove_collector(collector):
+    """
+    Description:
+        Stop reporting to a collector registered with add_collector.
+    """
+    with _shared_lock:
+        if collector in _collectors:
+            _collectors.remove(collector)
+
+
+@contextlib.contextmanager
+def instrument(collector=None):
+    """
+    Description:
+        Report the stage spans and counters of every function called inside the 'with' block to a collector.
+            with ostaGIS.instrument() as metrics:
+                ostaGIS.state_dept_twas("advisories.parquet")
+            print(metrics.prometheus())
+    Params:
+        collector: collector to report to (default -- None -- a new MetricsCollector)
+    """
+    collector = MetricsCollector() if collector is None else collector
+    add_collector(collector)
+    try:
+        yield collector
+    finally:
+        remove_collector(collector)
+
+
+class MetricsCollector:
+    """
+    Description:
+        Built in collector...adds up the stage spans (count and seconds) and counters, and can write them as
+        Prometheus text. With a logger each span/counter is also logged as one JSON line (structured log).
+    Params:
+        logger: logging.Logger to log each span/counter to at INFO level (default -- None -- no logging)
+    """
+    def __init__(self, logger=None):
+        self.logger = logger
+        self.spans = {}     # (stage, labels) -> [count, seconds]
+        self.counters = {}  # (name, labels) -> value
+        self._lock = threading.Lock()
+
+    def span(self, stage, seconds, labels):
+        key = (stage, tuple(sorted(labels.items())))
+        with self._lock:
+            total = self.spans.setdefault(key, [0, 0.0])
+            total[0] += 1
+            total[1] += seconds
+        if self.logger is not None:
+            self._log({"event": "span", "stage": stage, "seconds": round(seconds, 6), **labels})
+
+    def count(self, name, value, labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+        if self.logger is not None:
+            self._log({"event": "count", "name": name, "value": value, **labels})
+
+    def _log(self, record):
+        import json
+        self.logger.info(json.dumps(record, default=str))
+
+    def summary(self):
+        """
+        Returns:
+            dict -- 'spans' {stage: {'count', 'seconds'}} and 'counters' {name: value}, added up over the labels
+        """
+        spans = {}
+        counters = {}
+        with self._lock:
+            for (stage, _), (n, seconds) in self.spans.items():
+                total = spans.setdefault(stage, {"count": 0, "seconds": 0.0})
+                total["count"] += n
+                total["seconds"] += seconds
+            for (name, _), value in self.counters.items():
+                counters[name] = counters.get(name, 0) + value
+        return {"spans": spans, "counters": counters}
+
+    def prometheus(self, prefix="ostagis"):
+        """
+        Returns:
+            the spans and counters as Prometheus text exposition format
+        """
+        def labels_text(labels):
+            if not labels:
+                return ""
+            escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in labels)
+            return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(labels, escaped)) + "}"
+
+        lines = [f"# TYPE {prefix}_stage_seconds summary"]
+        with self._lock:
+            for (stage, labels), (n, seconds) in sorted(self.spans.items()):
+                text = labels_text((("stage", stage),) + labels)
+                lines.append(f"{prefix}_stage_seconds_sum{text} {seconds:.6f}")
+                lines.append(f"{prefix}_stage_seconds_count{text} {n}")
+            names = sorted({name for name, _ in self.counters})
+            for name in names:
+                lines.append(f"# TYPE {prefix}_{name}_total counter")
+                for (counter, labels), value in sorted(self.counters.items()):
+                    if counter == name:
+                        lines.append(f"{prefix}_{name}_total{labels_text(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+# ******* NAME CACHE ****************************************************************************
+# ******* NAME CACHE ****************************************************************************
+# ******* NAME CACHE ****************************************************************************
+class NameCache:
+    """
+    Description:
+        On-disk cache of coco conversions...name + conversion (i.e., 'regex>ISO3') -> result, shared by state_dept_twas,
+        wfb_country_scrape and parse_country (batch/rowwise engines) across runs and processes. Turn it on for every function
+        with ostaGIS.use_name_cache(path).
+        SQLite in WAL mode, so several processes can read and write it at the same time. Least recently used names are
+        removed past 'max_entries' (a name's last use is updated the first time this process reads it). The cache is emptied
+        when the country_converter version changes.
+    Params:
+        path: SQLite file (i.e., "names.sqlite")
+        max_entries: most names kept (default -- 100000)
+    """
+    def __init__(self, path, max_entries=100000):
+        import country_converter as coco
+
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._memory = {}  # (scheme, name) -> result already read/written by this process
+        con = self._connect()
+        try:
+            con.execute("PRAGMA journal_mode=WAL")
+            # BEGIN IMMEDIATE...only one process checks/empties the cache at a time
+            con.execute("BEGIN IMMEDIATE")
+            con.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            con.execute("CREATE TABLE IF NOT EXISTS names (name TEXT, scheme TEXT, result TEXT NOT NULL, used REAL NOT NULL, PRIMARY KEY (name, scheme))")
+            con.execute("CREATE INDEX IF NOT EXISTS names_used ON names (used)")
+            row = con.execute("SELECT value FROM meta WHERE key = 'coco_version'").fetchone()
+            if row is None or row[0] != coco.__version__:
+                con.execute("DELETE FROM names")
+                con.execute("INSERT OR REPLACE INTO meta VALUES ('coco_version', ?)", (coco.__version__,))
+            con.execute("COMMIT")
+        finally:
+            con.close()
+
+    def _connect(self):
+        # New connection per call...connections are not shared between threads/processes
+        import sqlite3
+
+        con = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+        con.execute("PRAGMA busy_timeout = 60000")
+        return con
+
+    def __len__(self):
+        con = self._connect()
+        try:
+            return con.execute("SELECT COUNT(*) FROM names").fetchone()[0]
+        finally:
+            con.close()
+
+    def get_many(self, names, scheme):
+        """
+        Returns:
+            dict of name -> cached result for the names in the cache (their last use is updated)
+        """
+        import json
+
+        found = {name: self._memory[(scheme, name)] for name in names if (scheme, name) in self._memory}
+        self.hits += len(found)
+        names = [name for name in names if name not in found]
+        if not names:
+            return found
+        read = {}
+        con = self._connect()
+        try:
+            for i in range(0, len(names), 900):
+                batch = names[i:i + 900]
+                query = f"SELECT name, result FROM names WHERE scheme = ? AND name IN ({','.join('?' * len(batch))})"
+                read.update((name, json.loads(result)) for name, result in con.execute(query, [scheme, *batch]))
+            if read:
+                now = time.time()
+                con.execute("BEGIN IMMEDIATE")
+                con.executemany("UPDATE names SET used = ? WHERE name = ? AND scheme = ?", ((now, name, scheme) for name in read))
+                con.execute("COMMIT")
+        finally:
+            con.close()
+        self._memory.update(((scheme, name), result) for name, result in read.items())
+        self.hits += len(read)
+        self.misses += len(names) - len(read)
+        found.update(read)
+        return found
+
+    def put_many(self, results, scheme):
+        """
+        Description:
+            Add name -> result pairs, then remove the least recently used names past max_entries.
+        """
+        import json
+
+        now = time.time()
+        con = self._connect()
+        try:
+            con.execute("BEGIN IMMEDIATE")
+            con.executemany("INSERT OR REPLACE INTO names VALUES (?, ?, ?, ?)", ((name, scheme, json.dumps(result), now) for name, result in results.items()))
+            extra = con.execute("SELECT COUNT(*) FROM names").fetchone()[0] - self.max_entries
+            if extra > 0:
+                con.execute("DELETE FROM names WHERE rowid IN (SELECT rowid FROM names ORDER BY used LIMIT ?)", (extra,))
+            con.execute("COMMIT")
+        finally:
+            con.close()
+        self._memory.update(((scheme, name), result) for name, result in results.items())
+
+    def clear(self):
+        self._memory.clear()
+        con = self._connect()
+        try:
+            con.execute("DELETE FROM names")
+        finally:
+            con.close()
+
+
+def use_name_cache(path, max_entries=100000):
+    """
+    Description:
+        Use an on-disk NameCache for the coco conversions of every function in this process. parse_country passes the
+        cache to its worker processes (n_jobs/executor), so they use it with any multiprocessing start method.
+            ostaGIS.use_name_cache("names.sqlite")
+    Params:
+        path: SQLite file of the cache...None stops using a cache
+        max_entries: most names kept (default -- 100000)
+    Returns:
+        the NameCache (or None)
+    """
+    with _shared_lock:
+        _shared["name_cache"] = None if path is None else NameCache(path, max_entries)
+    return _shared["name_cache"]
+
+
+def _name_cache_args():
+    # (path, max_entries) of the name cache in use...passed to worker processes, which do not share this process' state
+    import os
+
+    cache = _shared.get("name_cache")
+    return None if cache is None else (os.path.abspath(cache.path), cache.max_entries)
+
+
+def _use_worker_name_cache(name_cache):
+    # Open the parent's name cache in a worker process (once...later chunks reuse it)
+    import os
+
+    cache = _shared.get("name_cache")
+    if name_cache is None:
+        return
+    if cache is None or os.path.abspath(cache.path) != name_cache[0]:
+        use_name_cache(*name_cache)
+
+
+def _convert(names, src=None, to="ISO3", enforce_list=False, not_found="not found", cc=None):
+    # cc.convert of a list of names...always returns one result per name, through the name cache when one is in use
+    # (only for the shared converter...another converter may have other country data)
+    shared = _get_converter()
+    cc = shared if cc is None else cc
+    names = [str(n) for n in names]
+    if not names:
+        return []
+    cache = _shared.get("name_cache")
+    if cache is None or cc is not shared:
+        results = cc.convert(names, src=src, to=to, enforce_list=enforce_list, not_found=not_found)
+        return [results] if len(names) == 1 and not enforce_list else results
+
+    scheme = f"{src}>{to}|{enforce_list}|{not_found}"
+    unique = list(dict.fromkeys(names))
+    found = cache.get_many(unique, scheme)
+    _count("cache_hits", len(found), function="name_cache")
+    missing = [n for n in unique if n not in found]
+    if missing:
+        results = cc.convert(missing, src=src, to=to, enforce_list=enforce_list, not_found=not_found)
+        if len(missing) == 1 and not enforce_list:
+            results = [results]
+        new = dict(zip(missing, results))
+        cache.put_many(new, scheme)
+        found.update(new)
+    return [found[n] for n in names]
+
+
+def _pandas_convert(series, src=None, to="ISO3", not_found="not found"):
+    # cc.pandas_convert of the shared converter...through the name cache when one is in use
+    import pandas as pd
+
+    if _shared.get("name_cache") is None:
+        return _get_converter().pandas_convert(series, src=src, to=to, not_found=not_found)
+    unique = series.unique()
+    mapping = pd.Series(_convert(unique, src=src, to=to, not_found=not_found), index=unique, dtype=object).to_dict()
+    return series.map(mapping).fillna(series if not_found is None else not_found)
+
+
+# ******* TEXT COLUMNS **************************************************************************
+# ******* TEXT COLUMNS **************************************************************************
+# ******* TEXT COLUMNS **************************************************************************
+def _arrow_str_dtype():
+    # Arrow backed string dtype with NaN for missing values (the pandas 3 'str')...None when pandas/pyarrow cannot provide it
+    if "arrow_str" not in _shared:
+        import numpy as np
+        import pandas as pd
+
+        try:
+            import pyarrow  # noqa: F401
+            try:
+                dtype = pd.StringDtype("pyarrow", na_value=np.nan)  # pandas >= 2.3
+            except TypeError:
+                dtype = pd.StringDtype("pyarrow_numpy")  # pandas 2.1/2.2
+        except (ImportError, TypeError, ValueError):
+            dtype = None
+        _shared["arrow_str"] = dtype
+    return _shared["arrow_str"]
+
+
+def _store_text(df, arrow_strings=True, columns=None):
+    """
+    Description:
+        Keep the text columns of a DataFrame as Arrow backed strings (one buffer per column instead of one Python object per cell)
+        or, with arrow_strings=False, as Python object strings. Only columns holding nothing but text (and missing values)
+        are changed...list/dict/number columns are left as they are. Does nothing where pandas/pyarrow have no Arrow strings.
+    Params:
+        df: pandas DataFrame built by the calling function (changed in place and returned)
+        arrow_strings: True or False
+        columns: columns to check (default -- None -- every column)
+    Returns:
+        the DataFrame
+    """
+    import pandas as pd
+
+    dtype = _arrow_str_dtype() if arrow_strings else object
+    if dtype is None:
+        return df
+    for col in (df.columns if columns is None else columns):
+        series = df[col]
+        if series.dtype == dtype or not (series.dtype == object or isinstance(series.dtype, pd.StringDtype)):
+            continue
+        if pd.api.types.infer_dtype(series, skipna=True) == "string":
+            df[col] = series.astype(dtype)
+    return df
+
+
+# ******* WRITE TABLE ***************************************************************************
+# ******* WRITE TABLE ***************************************************************************
+# ******* WRITE TABLE ***************************************************************************
+# File extension -> format name for write_table
+_table_formats = {
+    ".parquet": "parquet",
+    ".feather": "feather",
+    ".csv": "csv",
+    ".xlsx": "xlsx",
+    ".gpkg": "gpkg",
+}
+
+
+def _table_format(path, fmt=None):
+    # Format from the 'fmt' param or else from the path extension
+    import os
+
+    if fmt is None:
+        fmt = _table_formats.get(os.path.splitext(os.fspath(path))[1].lower())
+        if fmt is None:
+            raise Exception(f"cannot tell the format of '{path}'...path must end with one of {list(_table_formats)} or set the fmt param")
+    elif fmt not in _table_formats.values():
+        raise Exception(f"fmt param cannot equal '{fmt}'...fmt must equal one of {list(_table_formats.values())}")
+    return fmt
+
+
+def write_table(df, path, fmt=None, name="data"):
+    """
+    Description:
+        Write a DataFrame to Parquet, Feather, CSV, Excel or GeoPackage.
+        Parquet/Feather are much faster to write than Excel and have no cell size limit.
+    Params:
+        df: pandas DataFrame
+        path: destination file (str or path-like)
+        fmt: "parquet", "feather", "csv", "xlsx" or "gpkg" (default -- None -- taken from the path extension)
+        name: Excel sheet name or GeoPackage layer name (default -- 'data')
+    Returns:
+        path written to
+    """
+    import os
+
+    path = os.fspath(path)
+    fmt = _table_format(path, fmt)
+
+    with _span("write_table", fmt=fmt):
+        if fmt == "parquet":
+            df.to_parquet(path)
+        elif fmt == "feather":
+            # Feather does not store the index
+            df.reset_index(drop=True).to_feather(path)
+        elif fmt == "csv":
+            df.to_csv(path)
+        elif fmt == "xlsx":
+            df.to_excel(path, sheet_name=name)
+        elif fmt == "gpkg":
+            # Attribute only table (no geometry) in the GeoPackage
+            import pyogrio
+            pyogrio.write_dataframe(df, path, layer=name, driver="GPKG")
+    if _collectors:
+        _count("rows_processed", len(df), function="write_table")
+        _count("bytes_written", os.path.getsize(path), function="write_table", fmt=fmt)
+    return path
+
+
 # ******* VALS TO DF ****************************************************************************
 # ******* VALS TO DF ****************************************************************************
 # ******* VALS TO DF ****************************************************************************
-def vals_to_df(entries):
+def vals_to_df(entries, arrow_strings=True):
     """
     Description:
         entries: list of text to be in each row of the DataFrame
+        arrow_strings: True or False -- keep the text as Arrow backed strings (default -- True -- where pandas/pyarrow support it)
     """  
     if isinstance(entries, list):
         None
@@ -14,25 +543,114 @@ def vals_to_df(entries):
     import pandas as pd
     df = {"values": entries}
     df = pd.DataFrame(df)
-    return df
+    return _store_text(df, arrow_strings)
+
+
+# ******* FEED CACHE ****************************************************************************
+# ******* FEED CACHE ****************************************************************************
+# ******* FEED CACHE ****************************************************************************
+_twas_feed_url = 'https://travel.state.gov/_res/rss/TAsTWs.xml/'
+
+
+def _feed_cache_paths(cache_dir, url):
+    # Cached feed (.xml) and its ETag/Last-Modified (.json)...one pair per feed url
+    import hashlib
+    import os
+
+    key = hashlib.sha1(url.encode("utf-8")).hexdigest()[:16]
+    return os.path.join(cache_dir, f"feed_{key}.xml"), os.path.join(cache_dir, f"feed_{key}.json")
+
+
+def _fetch_feed(url, cache_dir=None, timeout=60):
+    """
+    Description:
+        Request a feed, sending the ETag/Last-Modified of the cached copy (if any) so an unchanged feed returns 304.
+    Params:
+        url: feed url
+        cache_dir: folder of the feed cache (optional)
+        timeout: seconds to wait for the server
+    Returns:
+        (HTTP status, feed bytes or None, dict of the response ETag/Last-Modified)
+    """
+    import json
+    import os
+    import urllib.error
+    import urllib.request
+
+    headers = {"User-Agent": "ostaGIS (+https://github.com/samcor33/ostaGIS)"}
+    if cache_dir is not None:
+        xml_path, meta_path = _feed_cache_paths(cache_dir, url)
+        # Only ask for a 304 if the cached feed is still there to fall back on
+        if os.path.exists(xml_path) and os.path.exists(meta_path):
+            with open(meta_path, 'r', encoding='utf-8') as file:
+                meta = json.load(file)
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+
+    request = urllib.request.Request(url, headers=headers)
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            meta = {"url": url, "etag": response.headers.get("ETag"), "last_modified": response.headers.get("Last-Modified")}
+            return response.status, response.read(), meta
+    except urllib.error.HTTPError as e:
+        return e.code, None, {}
+
+
+def _save_feed_cache(cache_dir, url, content, meta):
+    # Write the feed and its ETag/Last-Modified to the cache folder
+    import json
+    import os
+
+    os.makedirs(cache_dir, exist_ok=True)
+    xml_path, meta_path = _feed_cache_paths(cache_dir, url)
+    with open(xml_path, 'wb') as file:
+        file.write(content)
+    with open(meta_path, 'w', encoding='utf-8') as file:
+        json.dump(meta, file)
 
 
 # ******* STATE DEPT TWAS ***********************************************************************
 # ******* STATE DEPT TWAS ***********************************************************************
 # ******* STATE DEPT TWAS ***********************************************************************
-def state_dept_twas(export_path, log="CRITICAL"):
+def state_dept_twas(export_path=None, log="CRITICAL", fmt=None, source=None, cache_dir=None, url=_twas_feed_url, state_dir=None, enrich=False, summary_limit=32000, fuzzy=0.8, arrow_strings=True):
     """
     Description:
-        Extract RSS feed and goelocate State Department Travel Warnings/Advisories. Exports to Excel.
+        Extract RSS feed and goelocate State Department Travel Warnings/Advisories. Exports to Excel, CSV, Parquet, Feather or GeoPackage.
         Geolocated using ISO3 code.
         *Desinged for use with GIS software.
         State Dept RSS Feed - 'https://travel.state.gov/_res/rss/TAsTWs.xml/'
     Params:
-        export_path: destination for dataset(.xlsx)
+        export_path: destination for dataset(.xlsx, .csv, .parquet, .feather or .gpkg)
+            (default -- None -- nothing is written and the DataFrame is returned)
         log: "CRITICAL" or "INFO" will denote whether the 'not found' regexes are displayed as an error.
               CRITICAL - 'not found' regexes will not be displayed.
               INFO - 'not found' regexes will be displayed.
+        fmt: "xlsx", "csv", "parquet", "feather" or "gpkg" (default -- None -- taken from the export_path extension)
+            NOTE: only Excel/CSV exports split summaries over 'summary_limit' characters and put the longest summary on top (ArcGIS Pro import limits).
+        source: path to a saved feed (.xml) or the feed as bytes to parse offline/replay a run instead of requesting the feed
+            (default -- None -- the feed is requested from 'url')
+        cache_dir: folder for the on-disk feed cache (default -- None -- no cache)
+            The ETag/Last-Modified of the last run are sent with the request...if the feed has not changed (304)
+            nothing is processed or written and None is returned. The cached feed (.xml) can be used as 'source'.
+        url: feed url (default -- the State Dept RSS feed)
+        state_dir: folder to keep the state of the last run in (default -- None -- every advisory is processed)
+            A content hash of every advisory (keyed by DoS_gen2alpha, includes 'published') and the processed rows are kept.
+            Only new/changed advisories are processed and merged with the unchanged rows of the last run.
+            The change set (added/updated/removed ISO3 codes and threat level changes) is written to 'changes.json'
+            in the folder and kept in the returned DataFrame's attrs['changes'].
+        enrich: True or False -- add the full advisory page and OSAC report text (see enrich_twas) (default -- False)
+            Pages are cached in cache_dir/pages when cache_dir is given.
+        summary_limit: max characters per summary cell for Excel/CSV exports (default -- 32000)
+            Longer summaries are split on word boundaries into 'summary', 'summary_cont', 'summary_cont_2'... as needed,
+            each filled with as many words as fit.
+        fuzzy: lowest FuzzyCountryResolver score accepted for country names coco does not find (i.e., misspelled "Azerbajian")
+            (default -- 0.8 -- None -- names coco does not find are dropped)
+        arrow_strings: True or False -- keep the text columns (summary, links...) as Arrow backed strings while processing and in
+            the result (default -- True -- where pandas/pyarrow support it)...False keeps Python object strings
     """
+    import os
     import feedparser
     import pandas as pd
     import country_converter as coco
@@ -49,138 +667,466 @@ def state_dept_twas(export_path, log="CRITICAL"):
     else:
         raise Exception(f"log param cannot equal '{log}'...log must equal 'CRITICAL' or 'INFO'")
 
-    if not export_path.endswith(".xlsx"):
-        raise Exception("exported dataset is an excel file and must end with '.xlsx'")
+    # Check the export format up front...Excel/CSV need the ArcGIS Pro import workarounds below
+    if export_path is not None:
+        fmt = _table_format(export_path, fmt)
+    arcgis_import = fmt in ("xlsx", "csv")
+    summary_limit = summary_limit if arcgis_import else None
 
     # Start of fucntion
-    feed = feedparser.parse('https://travel.state.gov/_res/rss/TAsTWs.xml/')
+    if source is not None:
+        # Offline/replay run from a saved feed...no HTTP request
+        if isinstance(source, (bytes, bytearray)):
+            content = bytes(source)
+        else:
+            with open(source, 'rb') as file:
+                content = file.read()
+        status = 200
+    else:
+        with _span("state_dept_twas.fetch"):
+            status, content, cache_meta = _fetch_feed(url, cache_dir)
+        # The feed has not changed since the last cached run...nothing to do
+        if status == 304:
+            _count("cache_hits", 1, function="state_dept_twas", cache="feed")
+            print(f"RSS feed not modified since the last run...see {cache_dir}")
+            return None
+
+    if status != 200:
+        raise Exception(f"Failed to retrieve the RSS feed. Status code: {status} {url}")
+    with _span("state_dept_twas.parse_feed"):
+        feed = feedparser.parse(content)
+    _count("rows_processed", len(feed.entries), function="state_dept_twas")
     
     country_threat_info = {}
-    if feed.status == 200:    
-        for entry in feed.entries:
-            #print(entry)
-            for tag in entry.tags:
-                    
-                # Fuction to get the country name directly from the travel advisory url since the threat levels can be non-standard to parse and match with COCO
-                def parse_country(url):
-                    pc = url.split("/")
-                    # V - This is bad code but it works - V
-                    parsed_country = pc[len(pc) - 1].removesuffix("-travel-advisory.html").replace('advisory', "").replace('travel', "").replace("-", " ").replace(".html", "").title()
-                    #Specifically handles the "Azerbajian" naming error from the State Dept
-                    if parsed_country == "Azerbajian":
-                        parsed_country = 'Azerbaijan'
-                        return parsed_country
-                    else:
-                        return parsed_country
+    for entry in feed.entries:
+        #print(entry)
+        for tag in entry.tags:
                 
-                # This statement specifically handles the labeling issue with the 'Israel, the West Bank and Gaza' Travel Advisory
-                if entry.title == 'See Individual Summaries -':
-                    country_threat_info['IL'] = {
-                        'label': 'Israel, the West Bank and Gaza - See Individual Summaries',
-                        'link': entry.link,
-                        'published': entry.published,
-                        'summary': entry.summary,
-                        'summary_cont': None,
-                        'DoS_country_name': parse_country(entry.link)
-                    }
-                # This statement is the standard parsing code
-                elif "Country-Tag" in tag.values():
-                    country_threat_info[list(tag.values())[0]] = {
-                        'label': entry.title,
-                        'link': entry.link,
-                        'published': entry.published,
-                        'summary': entry.summary,
-                        'summary_cont': None,
-                        'DoS_country_name': parse_country(entry.link)
-                    }
-    
-    else:
-        print("Failed to retrieve the RSS feed. Status code:", feed.status, link)
+            # Fuction to get the country name directly from the travel advisory url since the threat levels can be non-standard to parse and match with COCO
+            def parse_country(url):
+                pc = url.split("/")
+                # V - This is bad code but it works - V
+                parsed_country = pc[len(pc) - 1].removesuffix("-travel-advisory.html").replace('advisory', "").replace('travel', "").replace("-", " ").replace(".html", "").title()
+                # Misspelled names (i.e., the State Dept's "Azerbajian") are resolved by the fuzzy fallback when matching
+                return parsed_country
+            
+            # This statement specifically handles the labeling issue with the 'Israel, the West Bank and Gaza' Travel Advisory
+            if entry.title == 'See Individual Summaries -':
+                country_threat_info['IL'] = {
+                    'label': 'Israel, the West Bank and Gaza - See Individual Summaries',
+                    'link': entry.link,
+                    'published': entry.published,
+                    'summary': entry.summary,
+                    'summary_cont': None,
+                    'DoS_country_name': parse_country(entry.link)
+                }
+            # This statement is the standard parsing code
+            elif "Country-Tag" in tag.values():
+                country_threat_info[list(tag.values())[0]] = {
+                    'label': entry.title,
+                    'link': entry.link,
+                    'published': entry.published,
+                    'summary': entry.summary,
+                    'summary_cont': None,
+                    'DoS_country_name': parse_country(entry.link)
+                }
     
     twa_df = pd.DataFrame(country_threat_info).transpose().reset_index().rename(columns={"index": "DoS_gen2alpha"})
-    
-    # ****************** PARSE OUT SECURITY REPORT *************************************************
-    sec_reports = []
-    for s in twa_df['summary']:
-        sec_rep = "https://www.osac.gov/"
-        if sec_rep in s:
-            tail_url = s.split(sec_rep, 1)[1].split(">", 1)
-            full_sec_rep_url = sec_rep + tail_url[0]
-            sec_reports.append(full_sec_rep_url.replace('"', ""))
+    twa_df = _store_text(twa_df, arrow_strings)
+    
+    # Only process new/changed advisories when the state of the last run is kept
+    with _span("state_dept_twas.process"):
+        if state_dir is not None:
+            twa_df, changes, state = _twas_incremental(twa_df, state_dir, summary_limit, fuzzy)
+        elif len(twa_df):
+            twa_df = _process_twas(twa_df, summary_limit, fuzzy)
         else:
-            sec_reports.append("https://www.osac.gov/Content/Browse/Report?subContentTypes=Country%20Security%20Report")
-    
-    twa_df["security_report"] = pd.Series(sec_reports)
-    # ****************** PARSE OUT SECURITY REPORT *************************************************
-    
-    # Check if any Summary text is over the 32000 limit for exporting to csv
-    for s in twa_df['summary']:
-        
-        # Split the summary at the midpoint using chunk_at_midpoint
-        # This is not dynamic but it's likely no summary will be over 64000 characters...Mexico is the only one over 32000 by a large margin
-        def chunk_at_midpoint(text):
-            words = text.split()
-            midpoint = int(len(words) / 2)
-            return [' '.join(words[i:i+midpoint]) for i in range(0, len(words), midpoint)]
-            
-        if len(s) > 32000:
-            # Get indexing information to chnage text using the '.loc' method 
-            fltr = twa_df[twa_df['summary'] == s]
-            row = fltr.index[0]
-            s_clmn = twa_df.columns[twa_df.columns == "summary"][0]
-            sc_clmn = twa_df.columns[twa_df.columns == "summary_cont"][0]
-            
-            chunk = chunk_at_midpoint(s)
+            twa_df = pd.DataFrame(columns=_twas_columns)
+
+    # Sort alphabetically
+    twa_df = twa_df.sort_values(['country', 'DoS_gen2alpha'], kind='stable')
     
-            # Save text chunck to appropriate columns
-            twa_df.loc[row, s_clmn] = chunk[0]
-            twa_df.loc[row, sc_clmn] = chunk[1]
+    # Put the longest summary (Mexico) at the top for ArcGIS Pro importing
+    # The longest text must be at the top so when it's imported, it automatically makes the character length 32767.
+    if arcgis_import and len(twa_df) > 0:
+        longest = twa_df['summary'].str.len().to_numpy().argmax()
+        twa_df = twa_df.iloc[[longest] + [i for i in range(len(twa_df)) if i != longest]]
+    twa_df = twa_df.reset_index().drop(columns='index')
     
+    # Rearrange columns for finished dataset
+    twa_df_final = twa_df
+    cont_columns = sorted((c for c in twa_df_final.columns if c.startswith('summary_cont_')), key=lambda c: int(c.rsplit('_', 1)[1]))
+    twa_df_final = twa_df_final[_twas_columns[:7] + cont_columns + _twas_columns[7:]]
+
+    if enrich:
+        twa_df_final = enrich_twas(twa_df_final, cache_dir=os.path.join(cache_dir, "pages") if cache_dir is not None else None)
+    twa_df_final = _store_text(twa_df_final.copy(deep=False), arrow_strings)
+
+    if export_path is not None:
+        write_table(twa_df_final, export_path, fmt=fmt, name='travel_advisories')
+
+    # Keep the state for the next run once the run has finished
+    if state_dir is not None:
+        twa_df_final.attrs['changes'] = changes
+        _save_twas_state(state_dir, state, changes)
+
+    # Only remember the feed once the run has finished so a failed run is not skipped as 'not modified' next time
+    if source is None and cache_dir is not None:
+        _save_feed_cache(cache_dir, url, content, cache_meta)
+
+    # Return the DataFrame without writing when there is no export path
+    if export_path is None:
+        return twa_df_final
+
+
+def _process_twas(twa_df, summary_limit=None, fuzzy=0.8):
+    """
+    Description:
+        Per advisory processing for state_dept_twas...security report url, long summary split, threat level and coco matching.
+    Params:
+        twa_df: pandas DataFrame of feed entries (one row per DoS_gen2alpha, RangeIndex)
+        summary_limit: split summaries longer than this many characters for Excel/CSV (default -- None -- no split)
+        fuzzy: FuzzyCountryResolver threshold for names coco does not find (default -- 0.8 -- None -- no fallback)
+    Returns:
+        pandas DataFrame with one row per advisory/ISO3 code (advisories without an ISO3 code removed)
+    """
+    # ****************** PARSE OUT SECURITY REPORT *************************************************
+    sec_reports = twa_df['summary'].str.extract(r'(https://www\.osac\.gov/[^>]*)', expand=False).str.replace('"', "", regex=False)
+    twa_df["security_report"] = sec_reports.fillna("https://www.osac.gov/Content/Browse/Report?subContentTypes=Country%20Security%20Report")
+    # ****************** PARSE OUT SECURITY REPORT *************************************************
+
+    # Split any Summary text over the limit for exporting to Excel/CSV into 'summary', 'summary_cont', 'summary_cont_2'...
+    if summary_limit is not None:
+        too_long = twa_df['summary'].str.len() > summary_limit
+        if too_long.any():
+            chunks = twa_df.loc[too_long, 'summary'].map(lambda text: _split_on_words(text, summary_limit))
+            for n in range(chunks.map(len).max()):
+                column = "summary" if n == 0 else "summary_cont" if n == 1 else f"summary_cont_{n}"
+                if column not in twa_df.columns:
+                    twa_df[column] = None
+                twa_df.loc[chunks.index, column] = chunks.map(lambda c: c[n] if n < len(c) else None)
+
     # Split country/threat level and keep threat level only
     cnt = twa_df['label'].str.split(" - ", n=1, expand=True).rename(columns={1: "threat_level"}).drop(columns=0)
     twa_df= cnt.join(twa_df)
     
     # Match countries thru COCO to assign proper **3 Digit ISO Code**
-    cc = coco.CountryConverter()
     countries = twa_df['DoS_country_name']
     
-    country_names = cc.pandas_convert(countries, to='name_short')
+    with _span("state_dept_twas.match"):
+        country_names = _pandas_convert(countries, to='name_short')
+        if fuzzy is not None:
+            country_names = _fuzzy_fallback(countries, country_names, fuzzy, 'name_short', "state_dept_twas")
     twa_df['country'] = country_names
-    twa_df = twa_df.explode('country')
+    with _span("state_dept_twas.explode"):
+        twa_df = twa_df.explode('country')
     
-    country_iso3_codes = cc.pandas_convert(twa_df['country'], to='ISO3')
+    with _span("state_dept_twas.match"):
+        country_iso3_codes = _pandas_convert(twa_df['country'], to='ISO3')
     twa_df['ISO3_CODE'] = country_iso3_codes
-    twa_df = twa_df.explode('ISO3_CODE')
+    with _span("state_dept_twas.explode"):
+        twa_df = twa_df.explode('ISO3_CODE')
     
-    # Remove advisories for locations without an ISO3 Code then sort alphabetically
+    # Remove advisories for locations without an ISO3 Code
+    if _collectors:
+        _count("not_found", int((twa_df['country'] == 'not found').sum()), function="state_dept_twas")
     twa_df = twa_df[twa_df['country'] != 'not found']
-    twa_df = twa_df.sort_values('country')
-    
-    # Put Mexico at the top for ArcGIS Pro importing
-    # The longest text must be at the top so when it's imported, it automatically makes the character length 32767.
-    # You may need to adjust the country below if Mexico's summary falls below 32767 and another country's summary exceeds 32767
-    m = twa_df[twa_df['ISO3_CODE'] == 'MEX']
-    m_df = pd.DataFrame(m)
-    twa_df = twa_df.drop(m.index[0])
-    twa_df = pd.concat([m_df, twa_df])
-    twa_df = twa_df.reset_index().drop(columns='index')
-    
-    # Rearrange columns for finished dataset
-    twa_df_final = twa_df
-    twa_df_final = twa_df_final[['country', 'threat_level', 'published', 'security_report', 'link', 'summary', 'summary_cont', 'ISO3_CODE', 'label', 'DoS_country_name', 'DoS_gen2alpha']]
-    twa_df_final.to_excel(export_path, sheet_name='travel_advisories')
+
+    return twa_df
+
+
+def _split_on_words(text, limit):
+    # Pack words into runs of up to 'limit' characters...a run is closed when the next word would not fit
+    chunks = []
+    run = ""
+    for word in text.split():
+        # A single word over the limit is cut into pieces of the limit
+        while len(word) > limit:
+            if run:
+                chunks.append(run)
+                run = ""
+            chunks.append(word[:limit])
+            word = word[limit:]
+        if run and len(run) + 1 + len(word) > limit:
+            chunks.append(run)
+            run = word
+        else:
+            run = f"{run} {word}" if run else word
+    if run:
+        chunks.append(run)
+    return chunks
+
+
+# Columns of the state_dept_twas dataset...any 'summary_cont_2', 'summary_cont_3'... go after 'summary_cont'
+_twas_columns = ['country', 'threat_level', 'published', 'security_report', 'link', 'summary', 'summary_cont', 'ISO3_CODE', 'label', 'DoS_country_name', 'DoS_gen2alpha']
+
+
+# Bump when _process_twas changes its rows (i.e., how summaries are split)...state of older versions is not reused
+_twas_state_version = 2
+
+
+def _twas_entry_hash(entry):
+    # Content hash of one advisory...changes when it is republished or any of its text changes
+    import hashlib
+
+    content = "\x1f".join(str(entry[c]) for c in ('DoS_gen2alpha', 'published', 'label', 'link', 'summary', 'DoS_country_name'))
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def _twas_incremental(twa_df, state_dir, summary_limit, fuzzy=0.8):
+    """
+    Description:
+        Process only the advisories that are new or changed since the last run and merge them with the
+        unchanged rows kept from the last run.
+    Params:
+        twa_df: pandas DataFrame of feed entries (one row per DoS_gen2alpha)
+        state_dir: folder with the state of the last run
+        summary_limit, fuzzy: see _process_twas
+    Returns:
+        (processed pandas DataFrame, change set dict, new state dict)
+    """
+    import os
+    import pandas as pd
+    import country_converter as coco
+
+    hashes = {row['DoS_gen2alpha']: _twas_entry_hash(row) for row in twa_df.to_dict('records')}
+
+    state_path = os.path.join(state_dir, "twas_state.pkl")
+    prev = pd.read_pickle(state_path) if os.path.exists(state_path) else None
+    # The kept rows can only be reused if they were processed the same way
+    if (
+        prev is None or prev.get('version') != _twas_state_version or prev.get('summary_limit') != summary_limit
+        or prev.get('fuzzy') != fuzzy or prev['coco_version'] != coco.__version__
+    ):
+        prev_hashes = {}
+        prev_rows = None
+    else:
+        prev_hashes = prev['hashes']
+        prev_rows = prev['rows']
+
+    changed = [k for k, h in hashes.items() if prev_hashes.get(k) != h]
+    removed = [k for k in prev_hashes if k not in hashes]
+    _count("cache_hits", len(hashes) - len(changed), function="state_dept_twas", cache="state")
+
+    frames = []
+    if prev_rows is not None:
+        unchanged = [k for k in hashes if k not in changed]
+        frames.append(prev_rows[prev_rows['DoS_gen2alpha'].isin(unchanged)])
+    if changed:
+        new_entries = twa_df[twa_df['DoS_gen2alpha'].isin(changed)].reset_index(drop=True)
+        frames.append(_process_twas(new_entries, summary_limit, fuzzy))
+    # An empty feed with no kept rows has nothing to merge
+    twa_rows = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=_twas_columns)
+
+    changes = _twas_changes(prev_rows, twa_rows, changed)
+    changes['processed'] = len(changed)
+    changes['removed_advisories'] = removed
+
+    state = {
+        'version': _twas_state_version,
+        'hashes': hashes,
+        'rows': twa_rows,
+        'summary_limit': summary_limit,
+        'fuzzy': fuzzy,
+        'coco_version': coco.__version__,
+    }
+    return twa_rows, changes, state
+
+
+def _twas_changes(prev_rows, rows, changed):
+    """
+    Description:
+        Change set between the processed advisories of the last run and this run, by ISO3 code.
+    Returns:
+        dict -- 'added', 'updated', 'removed' lists of ISO3 codes and 'threat_level_changes' list of
+        {'ISO3_CODE', 'country', 'old', 'new'} dicts
+    """
+    def by_iso3(df):
+        if df is None:
+            return {}
+        return {r['ISO3_CODE']: r for r in df.drop_duplicates('ISO3_CODE').to_dict('records')}
+
+    old = by_iso3(prev_rows)
+    new = by_iso3(rows)
+
+    changes = {
+        'added': sorted(k for k in new if k not in old),
+        'updated': sorted(k for k in new if k in old and new[k]['DoS_gen2alpha'] in changed),
+        'removed': sorted(k for k in old if k not in new),
+        'threat_level_changes': [
+            {'ISO3_CODE': k, 'country': new[k]['country'], 'old': old[k]['threat_level'], 'new': new[k]['threat_level']}
+            for k in sorted(new) if k in old and old[k]['threat_level'] != new[k]['threat_level']
+        ],
+    }
+    return changes
+
+
+def _save_twas_state(state_dir, state, changes):
+    # Write the state for the next run and the change set of this run
+    import json
+    import os
+    import pandas as pd
+
+    os.makedirs(state_dir, exist_ok=True)
+    pd.to_pickle(state, os.path.join(state_dir, "twas_state.pkl"))
+    with open(os.path.join(state_dir, "changes.json"), 'w', encoding='utf-8') as file:
+        json.dump(changes, file, indent=2)
+
+
+# ******* TWAS ENRICHMENT ***********************************************************************
+# ******* TWAS ENRICHMENT ***********************************************************************
+# ******* TWAS ENRICHMENT ***********************************************************************
+def enrich_twas(twa_df, cache_dir=None, concurrency=16, per_host_rate=4, retries=3, timeout=30):
+    """
+    Description:
+        Fetch the full travel advisory page ('link') and OSAC country security report ('security_report') of every
+        advisory and add their text as the 'advisory_text' and 'security_report_text' columns.
+        Pages are requested concurrently over one pooled HTTP session (aiohttp). Safe to call from inside a running
+        event loop (e.g. Jupyter)...the requests then run on a separate thread. Use enrich_twas_async to await it instead.
+    Params:
+        twa_df: pandas DataFrame returned by state_dept_twas
+        cache_dir: folder for the on-disk page cache (default -- None -- no cache)
+            Pages in the cache are not requested again. Delete the folder to refresh them.
+        concurrency: max requests in flight at once
+        per_host_rate: max requests started per second to the same host
+        retries: times a request is retried after a connection error/timeout/429/5xx (with backoff)
+        timeout: seconds to wait for each request
+    Returns:
+        a copy of twa_df with 'advisory_text' and 'security_report_text' (empty where the page could not be fetched)
+    """
+    import asyncio
+    import concurrent.futures
+
+    coro = enrich_twas_async(twa_df, cache_dir, concurrency, per_host_rate, retries, timeout)
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    # An event loop is already running in this thread...run ours on another thread
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as pool:
+        return pool.submit(asyncio.run, coro).result()
+
+
+async def enrich_twas_async(twa_df, cache_dir=None, concurrency=16, per_host_rate=4, retries=3, timeout=30):
+    """
+    Description:
+        Awaitable version of enrich_twas...see enrich_twas for the params.
+    """
+    # Advisories covering more than one country share their pages...fetch each url once
+    urls = set(twa_df['link'].dropna()) | set(twa_df['security_report'].dropna())
+    pages = await _fetch_pages(sorted(urls), cache_dir, concurrency, per_host_rate, retries, timeout)
+    texts = {url: _page_text(html) if html is not None else None for url, html in pages.items()}
+
+    twa_df = twa_df.copy()
+    twa_df['advisory_text'] = twa_df['link'].map(texts).astype(object)
+    twa_df['security_report_text'] = twa_df['security_report'].map(texts).astype(object)
+    return twa_df
+
+
+async def _fetch_pages(urls, cache_dir, concurrency, per_host_rate, retries, timeout):
+    """
+    Description:
+        Request the urls with bounded concurrency, a per host rate limit and retries.
+    Returns:
+        dict of url -> page text (None if the page could not be fetched)
+    """
+    import asyncio
+    import hashlib
+    import os
+    import time
+    import urllib.parse
+    import aiohttp
+
+    def cache_path(url):
+        return os.path.join(cache_dir, f"page_{hashlib.sha1(url.encode('utf-8')).hexdigest()[:16]}.html")
+
+    pages = {}
+    todo = []
+    for url in urls:
+        if cache_dir is not None and os.path.exists(cache_path(url)):
+            with open(cache_path(url), 'r', encoding='utf-8') as file:
+                pages[url] = file.read()
+            _count("cache_hits", 1, function="enrich_twas", cache="pages")
+        else:
+            todo.append(url)
+    if not todo:
+        return pages
+    if cache_dir is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+
+    semaphore = asyncio.Semaphore(concurrency)
+    host_locks = {}
+    host_next = {}
+
+    async def wait_for_host(host):
+        # Space out the request starts to each host by 1/per_host_rate seconds
+        lock = host_locks.setdefault(host, asyncio.Lock())
+        async with lock:
+            delay = host_next.get(host, 0) - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            host_next[host] = time.monotonic() + 1 / per_host_rate
+
+    async def fetch(session, url):
+        host = urllib.parse.urlsplit(url).netloc
+        for attempt in range(retries + 1):
+            if attempt:
+                await asyncio.sleep(0.5 * 2 ** (attempt - 1))
+            await wait_for_host(host)
+            try:
+                async with semaphore, session.get(url) as response:
+                    if response.status == 429 or response.status >= 500:
+                        continue
+                    if response.status != 200:
+                        return url, None
+                    html = await response.text(errors='replace')
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                continue
+            _count("rows_processed", 1, function="enrich_twas")
+            if cache_dir is not None:
+                with open(cache_path(url), 'w', encoding='utf-8') as file:
+                    file.write(html)
+            return url, html
+        return url, None
+
+    headers = {"User-Agent": "ostaGIS (+https://github.com/samcor33/ostaGIS)"}
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector, headers=headers, timeout=aiohttp.ClientTimeout(total=timeout)) as session:
+        with _span("enrich_twas.fetch"):
+            fetched = await asyncio.gather(*(fetch(session, url) for url in todo))
+        for url, html in fetched:
+            pages[url] = html
+    return pages
+
+
+def _page_text(html):
+    # Visible text of a page without its scripts/styles/navigation
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, 'lxml')
+    for tag in soup(['script', 'style', 'noscript', 'nav', 'header', 'footer']):
+        tag.decompose()
+    body = soup.body if soup.body is not None else soup
+    return " ".join(body.get_text(" ").split())
 
 
 # ******* PARSE COUNTRY *************************************************************************
 # ******* PARSE COUNTRY *************************************************************************
 # ******* PARSE COUNTRY *************************************************************************
-def parse_country(df, col_to_be_parsed, new_match_column, explode=True, log="CRITICAL"):
+def parse_country(df, col_to_be_parsed, new_match_column, explode=True, log="CRITICAL", engine="batch", n_jobs=1, executor=None, store=None, output="frame", fuzzy=None, arrow_strings=True):
     """
     Args:
         df: pandas DataFrame
         col_to_be_parsed: str
         explode: True or False
         log: Can be "CRITICAL" or "INFO"
+        engine: Can be "batch", "rowwise" or "matcher"
+        n_jobs: int
+        executor: concurrent.futures Executor (optional)
+        store: path (optional)
+        output: Can be "frame" or "compact"
+        fuzzy: float (optional)
+        arrow_strings: True or False
     Description:
     -- Use to parse country names that can be found in a string of text stored in a df cell. Geolocate the countries using regex and match to the ISO3 code. Return an exploded or unexploded df that contains all the countries ISO3 codes that were found in the text.
         df: pandas DataFrame.
@@ -191,7 +1137,37 @@ def parse_country(df, col_to_be_parsed, new_match_column, explode=True, log="CRI
         log: "CRITICAL" or "INFO" will denote whether the 'not found' regexes are displayed as an error.
             CRITICAL - 'not found' regexes will not be displayed.
             INFO - 'not found' regexes will be displayed.
+        engine: Default "batch"
+            batch - tokenize the whole column and run every unique word through coco once.
+            rowwise - run coco on every word of every row (original method, much slower on large DataFrames).
+            Both engines return the same result.
+            matcher - scan each full text once with a CountryMatcher...also finds multi-word names
+                      (i.e., 'Saudi Arabia', 'South Sudan', 'Guinea Bissau') that the word by word engines miss or mis-match.
+        n_jobs: Default 1
+            Number of worker processes. The rows are split into chunks that are geocoded in a process pool and put back
+            in the original order...the result is the same as n_jobs=1. -1 uses every CPU.
+        executor: Default None
+            An existing concurrent.futures Executor (i.e., ProcessPoolExecutor) to geocode the chunks with instead of
+            starting a new pool. n_jobs is then only used to size the chunks.
+        store: Default None
+            Path to a match store (.sqlite/.db SQLite file, or .parquet) kept between runs. The matches of every text are saved
+            under a hash of the text...only new or changed texts are matched, the rest are read from the store.
+            The store is emptied when the country_converter version or the matcher configuration (engine, max_words) changes.
+        output: Default "frame"
+            frame - the DataFrame with the matches (exploded or in lists, see explode).
+            compact - a CountryMatches...the matched ISO3 codes of all rows as one categorical array with CSR style row offsets.
+                      Memory grows with the number of matches only (no row copies, no list per cell). Converts to the
+                      exploded/list forms (to_exploded, to_lists) or a scipy sparse row x country matrix (to_sparse).
+                      explode is not used.
+        fuzzy: Default None
+            Lowest FuzzyCountryResolver score (i.e., 0.8) accepted for misspelled country names in the text. Capitalized words
+            that are close to, but not the same as, a country name (i.e., 'Afganistan', 'Phillipines') add that country.
+        arrow_strings: Default True
+            Clean and keep the parsed text column as Arrow backed strings (where pandas/pyarrow support it)...the clean up
+            runs in Arrow compute and the cleaned column is one buffer instead of one Python string per row.
+            False - Python object strings.
     """
+    import os
     import pandas as pd
     import country_converter as coco
     import logging
@@ -203,79 +1179,1300 @@ def parse_country(df, col_to_be_parsed, new_match_column, explode=True, log="CRI
     else:
         raise Exception('explode param does not have bool value.')
 
-    # Check that the 'log' param is 'CRITICAL' or 'INFO'
-    if log == "CRITICAL":
-        coco_logger = coco.logging.getLogger()
-        coco_logger.setLevel(logging.CRITICAL)
-    elif log == "INFO":
-        coco_logger = coco.logging.getLogger()
-        coco_logger.setLevel(logging.INFO)
-    else:
-        raise Exception(f"log param cannot equal '{log}'...log must equal 'CRITICAL' or 'INFO'")
-    
-    # Translator to remove/correct extraneous characters
-    replacements = str.maketrans({
-        '–': '', 
-        ',': '', 
-        ';': '', 
-        '.': '', 
-        '(': '', 
-        ')': '', 
-        '-': ' '
-    })
-    
-    df[col_to_be_parsed] = df[col_to_be_parsed].str.translate(replacements)
-    
-    # Add "TempText" to start of text as the first word to not match the coco regex for sorting purposes
-    df['col_with_id'] = "TempText " + df[col_to_be_parsed]  
-    # Fill newly created column with 'null' values as placeholder
-    df[new_match_column] = None
+    # Check that the 'log' param is 'CRITICAL' or 'INFO'
+    if log == "CRITICAL":
+        coco_logger = coco.logging.getLogger()
+        coco_logger.setLevel(logging.CRITICAL)
+    elif log == "INFO":
+        coco_logger = coco.logging.getLogger()
+        coco_logger.setLevel(logging.INFO)
+    else:
+        raise Exception(f"log param cannot equal '{log}'...log must equal 'CRITICAL' or 'INFO'")
+
+    # Check that the 'engine' param is 'batch', 'rowwise' or 'matcher'
+    if engine not in ("batch", "rowwise", "matcher"):
+        raise Exception(f"engine param cannot equal '{engine}'...engine must equal 'batch', 'rowwise' or 'matcher'")
+
+    # Check that the 'output' param is 'frame' or 'compact'
+    if output not in ("frame", "compact"):
+        raise Exception(f"output param cannot equal '{output}'...output must equal 'frame' or 'compact'")
+
+    # Check that 'n_jobs' param is a positive int or -1
+    if n_jobs == -1:
+        n_jobs = os.cpu_count() or 1
+    elif not isinstance(n_jobs, int) or isinstance(n_jobs, bool) or n_jobs < 1:
+        raise Exception(f"n_jobs param cannot equal '{n_jobs}'...n_jobs must be a positive int or -1")
+    
+    # Work on a shallow copy so the caller's DataFrame is not changed...only the cleaned text column is new
+    df = df.copy(deep=False)
+    df[col_to_be_parsed] = _clean_text(df[col_to_be_parsed], arrow_strings)
+    
+    def match(text):
+        if n_jobs > 1 or executor is not None:
+            return _match_column_parallel(text, engine, log, n_jobs, executor)
+        return _match_column(text, engine)
+
+    with _span("parse_country.match", engine=engine):
+        if store is None:
+            matches = match(df[col_to_be_parsed])
+        else:
+            matches = _match_column_stored(df[col_to_be_parsed], engine, store, match)
+        if fuzzy is not None:
+            matches = _fuzzy_text_matches(df[col_to_be_parsed], matches, fuzzy)
+    if _collectors:
+        _count("rows_processed", len(matches), function="parse_country")
+        _count("tokens_matched", sum(len(m) for m in matches if isinstance(m, list)), function="parse_country")
+        _count("not_found", sum(1 for m in matches if not m), function="parse_country")
+
+    if output == "compact":
+        return CountryMatches.from_lists(matches, index=df.index, name=new_match_column, text_column=col_to_be_parsed, arrow_strings=arrow_strings)
+
+    # Insert the matched ISO3 code lists by position so any index type lines up
+    df[new_match_column] = pd.Series(matches, index=df.index, dtype=object)
+
+    # explaode values by default. Do not explode with False and keep macthed country ISO 3 codes in list form wihtin the cell.
+    if explode == True:
+        with _span("parse_country.explode"):
+            return df.explode(new_match_column)
+    else:
+        return df
+
+
+def _clean_text(text, arrow_strings=True):
+    """
+    Description:
+        Remove/correct extraneous characters of the text to be parsed ('–', ',', ';', '.', '(', ')' removed, '-' to ' ').
+        Arrow backed text is cleaned with Arrow compute (no Python string per row)...otherwise with str.translate.
+    Params:
+        text: pandas Series of text
+        arrow_strings: True or False
+    Returns:
+        the cleaned pandas Series (Arrow backed strings or Python object strings)
+    """
+    dtype = _arrow_str_dtype() if arrow_strings else None
+    if dtype is None:
+        # Translator to remove/correct extraneous characters
+        replacements = str.maketrans({
+            '–': '', 
+            ',': '', 
+            ';': '', 
+            '.': '', 
+            '(': '', 
+            ')': '', 
+            '-': ' '
+        })
+        return text.astype(object).str.translate(replacements)
+    return text.astype(dtype).str.replace(r"[–,;.()]", "", regex=True).str.replace("-", " ", regex=False)
+
+
+def _match_column(text, engine):
+    """
+    Description:
+        Match every row of a text column to ISO3 codes with the selected parse_country engine.
+        Uses the shared converter/matcher of this process.
+    Params:
+        text: pandas Series of (already translated) text
+        engine: "batch", "rowwise" or "matcher"
+    Returns:
+        list with one sorted list of unique ISO3 codes per row
+    """
+    if engine == "batch":
+        return _match_column_batch(text, _get_converter())
+    elif engine == "matcher":
+        return _get_matcher().match_column(text)
+    else:
+        return _match_column_rowwise(text, _get_converter())
+
+
+def _init_parse_worker(log="CRITICAL", name_cache=None):
+    # Build the worker's shared converter/matcher once when the process starts...and open the parent's name cache
+    import logging
+    import country_converter as coco
+
+    coco.logging.getLogger().setLevel(getattr(logging, log))
+    _use_worker_name_cache(name_cache)
+    warmup()
+
+
+def _parse_chunk(texts, engine, log="CRITICAL", name_cache=None):
+    import logging
+    import pandas as pd
+    import country_converter as coco
+
+    # Workers of an executor passed in by the caller have not run the initializer...the shared converter/matcher
+    # and name cache are then set up on the first chunk and reused for the rest
+    coco.logging.getLogger().setLevel(getattr(logging, log))
+    _use_worker_name_cache(name_cache)
+    return _match_column(pd.Series(texts, dtype=object), engine)
+
+
+def _match_column_parallel(text, engine, log, n_jobs, executor=None):
+    """
+    Description:
+        Split a text column into row chunks and match them in a process pool.
+        Chunks are returned in submission order so the result matches a serial run.
+    Params:
+        text: pandas Series of (already translated) text
+        engine: "batch", "rowwise" or "matcher"
+        log: "CRITICAL" or "INFO"
+        n_jobs: number of worker processes
+        executor: existing concurrent.futures Executor (optional)
+    Returns:
+        list with one sorted list of unique ISO3 codes per row
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    rows = text.to_list()
+    # A few chunks per worker so a slow chunk does not hold up the pool
+    size = max(1, -(-len(rows) // (n_jobs * 4)))
+    chunks = [rows[i:i + size] for i in range(0, len(rows), size)]
+
+    name_cache = _name_cache_args()
+    args = (chunks, [engine] * len(chunks), [log] * len(chunks), [name_cache] * len(chunks))
+    matches = []
+    if executor is None:
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_parse_worker, initargs=(log, name_cache)) as pool:
+            for chunk_matches in pool.map(_parse_chunk, *args):
+                matches.extend(chunk_matches)
+    else:
+        for chunk_matches in executor.map(_parse_chunk, *args):
+            matches.extend(chunk_matches)
+    return matches
+
+
+def _match_column_batch(text, cc):
+    """
+    Description:
+        Match every row of a text column to ISO3 codes with a single coco call.
+        The column is split into words, the unique words of the whole column are checked against the coco regexes once,
+        then the matches are joined back to their rows.
+    Params:
+        text: pandas Series of (already translated) text
+        cc: coco.CountryConverter
+    Returns:
+        list with one sorted list of unique ISO3 codes per row
+    """
+    import pandas as pd
+
+    # One row per word...the index holds the row position of each word
+    words = text.fillna("N/A").str.split()
+    words.index = range(len(words))
+    words = words.explode().dropna()
+
+    # Check each unique word once...words matching more than one regex keep every match
+    unique_words = words.unique().tolist()
+    codes = _convert(unique_words, src="regex", to="ISO3", enforce_list=True, not_found='AAAA', cc=cc)
+    lookup = pd.Series(codes, index=unique_words, dtype=object).explode()
+    lookup = lookup[lookup != 'AAAA']
+
+    # Join matched words back to their rows...drop repeated countries...sort alphabetically within each row
+    hits = pd.DataFrame({"row": words.index, "word": words.to_numpy()})
+    hits = hits.merge(pd.DataFrame({"word": lookup.index, "code": lookup.to_numpy()}), on="word")
+    hits = hits[["row", "code"]].drop_duplicates().sort_values(["row", "code"])
+    grouped = hits.groupby("row")["code"].agg(list)
+
+    return [grouped.get(i, []) for i in range(len(text))]
+
+
+def _match_column_rowwise(text, cc):
+    """
+    Description:
+        Match every row of a text column to ISO3 codes one row at a time (original parse_country method).
+    Params:
+        text: pandas Series of (already translated) text
+        cc: coco.CountryConverter
+    Returns:
+        list with one sorted list of unique ISO3 codes per row
+    """
+    import pandas as pd
+
+    matches = []
+    for row in text.to_list():
+
+        # "TempText" is put in front of the words of each row as the first word to not match the coco regex for sorting purposes
+        # (added to the word list of the row...no temporary text column is built)
+        words = ["TempText", *row.split()] if isinstance(row, str) else ["N/A"]
+    
+        # Check the regex to find any countries matching in coco and match using the ISO3 Code.
+        # Any word not matching a country is labeled "AAAA" for sorting and final data cleaning
+        # mc is the 'new' matching column
+        mc = pd.Series(_convert(words, src="regex", to="ISO3", not_found='AAAA', cc=cc))
+        
+        # Words for comparison to coco matched column "mc"
+        # og is the original column separated to creat a one for on match when concatenating "mc" and "og"
+        og = pd.Series(words)
+    
+        # Combine "mc" and "og" for comparison
+        comb = pd.concat([og, mc], axis=1)
+    
+        # Access the 2nd column (mc) and drop duplicated countries and all words labeled as "AAAA" to leave only a single "AAAA" and countries
+        comb_drop_d = comb[1].drop_duplicates()
+
+        # Sort values alphabetically...remove "comb_drop_d[0]" (i.e. "AAAA")...turn into list
+        matches.append(comb_drop_d.sort_values().drop(0).to_list())
+
+    return matches
+
+
+# ******* COUNTRY MATCHES ***********************************************************************
+# ******* COUNTRY MATCHES ***********************************************************************
+# ******* COUNTRY MATCHES ***********************************************************************
+class CountryMatches:
+    """
+    Description:
+        Compact form of the parse_country matches (parse_country(..., output="compact")).
+        The ISO3 codes of every row are stored one after the other in a categorical array (codes) and row i holds
+        codes[offsets[i]:offsets[i + 1]] (CSR style)...a row without matches holds nothing. Memory grows with the number of
+        matches only, the text and other columns are never copied.
+            matches = ostaGIS.parse_country(df, "area of operation", "country_aor", output="compact")
+            matches.to_exploded(df)   # same as parse_country(..., explode=True)...the text column is cleaned the same way
+            matches.to_lists()        # same column as parse_country(..., explode=False)
+            matches.to_sparse()       # scipy.sparse row x country indicator matrix...columns are matches.countries
+    Params:
+        codes: pandas Categorical of the ISO3 codes of all rows, row by row (sorted within each row)
+        offsets: numpy int64 array of len(rows) + 1 row offsets into codes
+        index: index of the rows (default -- None -- RangeIndex)
+        name: name of the match column in the converted forms (default -- "country")
+        text_column: parsed text column...to_exploded(df) cleans it like parse_country does (default -- None -- left as it is)
+        arrow_strings: cleaned text column as Arrow backed strings (default -- True -- see parse_country)
+    """
+    def __init__(self, codes, offsets, index=None, name="country", text_column=None, arrow_strings=True):
+        import numpy as np
+        import pandas as pd
+
+        self.codes = codes
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.index = pd.RangeIndex(len(self.offsets) - 1) if index is None else index
+        self.name = name
+        self.text_column = text_column
+        self.arrow_strings = arrow_strings
+        if len(self.index) != len(self.offsets) - 1 or self.offsets[-1] != len(codes):
+            raise Exception(f"offsets cannot have {len(self.offsets)} values...offsets must have one more value than the rows and end at len(codes)")
+
+    @classmethod
+    def from_lists(cls, matches, index=None, name="country", text_column=None, arrow_strings=True):
+        """
+        Description:
+            Build from one list of ISO3 codes per row (the parse_country(..., explode=False) column, or a list of lists).
+        """
+        import itertools
+        import numpy as np
+        import pandas as pd
+
+        if isinstance(matches, pd.Series):
+            index = matches.index if index is None else index
+            matches = matches.to_list()
+        lengths = np.fromiter((len(m) if isinstance(m, list) else 0 for m in matches), dtype=np.int64, count=len(matches))
+        offsets = np.zeros(len(matches) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        flat = list(itertools.chain.from_iterable(m for m in matches if isinstance(m, list)))
+        codes = pd.Categorical(flat, categories=sorted(set(flat)))
+        return cls(codes, offsets, index=index, name=name, text_column=text_column, arrow_strings=arrow_strings)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    @property
+    def countries(self):
+        # ISO3 code of each column of to_sparse()
+        return self.codes.categories
+
+    @property
+    def nbytes(self):
+        return self.codes.codes.nbytes + self.codes.categories.memory_usage(deep=True) + self.offsets.nbytes
+
+    def counts(self):
+        # Number of matched countries per row
+        import numpy as np
+        return np.diff(self.offsets)
+
+    def to_lists(self):
+        """
+        Returns:
+            pandas Series of one list of ISO3 codes per row (parse_country(..., explode=False) form)
+        """
+        import numpy as np
+        import pandas as pd
+
+        values = np.asarray(self.codes.categories, dtype=object)[self.codes.codes].tolist()
+        offsets = self.offsets.tolist()
+        lists = [values[offsets[i]:offsets[i + 1]] for i in range(len(self))]
+        return pd.Series(lists, index=self.index, name=self.name, dtype=object)
+
+    def to_exploded(self, df=None):
+        """
+        Description:
+            One row per matched country...rows without a match are kept once with NaN (parse_country(..., explode=True) form).
+            The text_column of df (set by parse_country) is cleaned like parse_country cleans it, so the result is the same
+            as parse_country(..., explode=True).
+        Params:
+            df: DataFrame of the rows (same order) to repeat with the match column added (default -- None -- the match column only)
+        Returns:
+            pandas Series, or DataFrame when df is given
+        """
+        import numpy as np
+        import pandas as pd
+
+        counts = self.counts()
+        reps = np.maximum(counts, 1)
+        out_offsets = np.zeros(len(self) + 1, dtype=np.int64)
+        np.cumsum(reps, out=out_offsets[1:])
+        positions = np.repeat(np.arange(len(self)), reps)
+
+        # Each match goes to its row's first output row plus its place within the row
+        match_rows = np.repeat(np.arange(len(self)), counts)
+        dest = out_offsets[match_rows] + np.arange(len(self.codes)) - self.offsets[match_rows]
+        values = np.full(len(positions), np.nan, dtype=object)
+        values[dest] = np.asarray(self.codes.categories, dtype=object)[self.codes.codes]
+
+        if df is None:
+            return pd.Series(values, index=self.index.take(positions), name=self.name)
+        if len(df) != len(self):
+            raise Exception(f"df cannot have {len(df)} rows...df must have the {len(self)} rows that were matched")
+        if self.text_column is not None and self.text_column in df.columns:
+            df = df.copy(deep=False)
+            df[self.text_column] = _clean_text(df[self.text_column], self.arrow_strings)
+        out = df.iloc[positions].copy(deep=False)
+        out[self.name] = values
+        return out
+
+    def to_long(self):
+        """
+        Returns:
+            DataFrame with one row per match only...'row' (index value of the row) and the categorical ISO3 column
+        """
+        import numpy as np
+        import pandas as pd
+
+        rows = self.index.take(np.repeat(np.arange(len(self)), self.counts()))
+        return pd.DataFrame({"row": rows, self.name: self.codes})
+
+    def to_sparse(self):
+        """
+        Returns:
+            scipy.sparse.csr_matrix (rows x countries) of int8 ones where a row mentions a country...columns are self.countries
+        """
+        import numpy as np
+        from scipy import sparse
+
+        data = np.ones(len(self.codes), dtype=np.int8)
+        return sparse.csr_matrix((data, self.codes.codes.astype(np.int32), self.offsets), shape=(len(self), len(self.countries)))
+
+    @classmethod
+    def from_sparse(cls, matrix, countries, index=None, name="country"):
+        """
+        Description:
+            Build from a row x country matrix (i.e., from to_sparse) and the ISO3 code of each column.
+        """
+        import pandas as pd
+
+        matrix = matrix.tocsr()
+        matrix.eliminate_zeros()
+        matrix.sort_indices()
+        categories = pd.Index(countries)
+        codes = pd.Categorical.from_codes(matrix.indices, categories=categories)
+        return cls(codes, matrix.indptr, index=index, name=name)
+
+
+# ******* COUNTRY INDEX *************************************************************************
+# ******* COUNTRY INDEX *************************************************************************
+# ******* COUNTRY INDEX *************************************************************************
+def build_country_index(data, path, column="country_aor", keep_rows=True):
+    """
+    Description:
+        Build an inverted index of ISO3 code -> sorted row ids over geocoded rows and save it to a folder.
+        The postings are saved as .npy arrays that CountryIndex memory maps, so a lookup only reads the postings of the
+        countries asked for. The rows are saved as an uncompressed Arrow file that is memory mapped too...only the rows
+        that are returned are read.
+            ostaGIS.build_country_index(ostaGIS.parse_country(df, "area of operation", "country_aor"), "aor_index")
+            ostaGIS.build_country_index(ostaGIS.state_dept_twas(), "twas_index", column="ISO3_CODE")
+            index = ostaGIS.CountryIndex("aor_index")
+            index.search(["SYR", "IRQ"], how="and")
+    Params:
+        data: parse_country output (exploded or explode=False), state_dept_twas output, or a CountryMatches
+            The rows of an exploded DataFrame are put back together by their index (one row per original row).
+        path: folder to save the index to (created or replaced)
+        column: column with the ISO3 codes (or lists of codes) (default -- "country_aor" -- use "ISO3_CODE" for state_dept_twas)
+        keep_rows: True or False -- also save the rows so search can return them (default -- True)
+    Returns:
+        CountryIndex
+    """
+    import os
+    import json
+    import shutil
+    import numpy as np
+    import pandas as pd
+
+    # One row per original row and its matches in CountryMatches form
+    if isinstance(data, CountryMatches):
+        matches, rows = data, None
+    elif data[column].map(lambda v: isinstance(v, list)).any():
+        matches = CountryMatches.from_lists(data[column], name=column)
+        rows = data
+    else:
+        row_ids, _ = pd.factorize(data.index)
+        first = ~pd.Index(row_ids).duplicated()
+        codes = data[column].to_numpy(dtype=object)
+        found = pd.notna(codes)
+        ids = row_ids[found]
+        order = np.argsort(ids, kind="stable")
+        flat = codes[found][order]
+        offsets = np.zeros(first.sum() + 1, dtype=np.int64)
+        np.cumsum(np.bincount(ids, minlength=first.sum()), out=offsets[1:])
+        matches = CountryMatches(pd.Categorical(flat, categories=sorted(set(flat))), offsets, index=data.index[first], name=column)
+        rows = data[first].copy(deep=False)
+        rows[column] = matches.to_lists().to_numpy()
+
+    # Postings...the row ids of each country, in country order then row order
+    code_ids = matches.codes.codes.astype(np.int64)
+    row_of_match = np.repeat(np.arange(len(matches), dtype=np.int64), matches.counts())
+    postings = row_of_match[np.argsort(code_ids, kind="stable")]
+    offsets = np.zeros(len(matches.countries) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(code_ids, minlength=len(matches.countries)), out=offsets[1:])
+    dtype = np.uint32 if len(matches) < 2 ** 32 else np.int64
+
+    if os.path.exists(path):
+        shutil.rmtree(path)
+    os.makedirs(path)
+    np.save(os.path.join(path, "postings.npy"), postings.astype(dtype))
+    np.save(os.path.join(path, "offsets.npy"), offsets)
+    meta = {"countries": [str(c) for c in matches.countries], "rows": len(matches), "column": column, "has_rows": rows is not None and keep_rows}
+    if meta["has_rows"]:
+        import pyarrow as pa
+        import pyarrow.feather as feather
+
+        # The index is kept in the file and comes back as the index of the rows read
+        table = pa.Table.from_pandas(rows, preserve_index=True)
+        feather.write_feather(table, os.path.join(path, "rows.arrow"), compression="uncompressed")
+    with open(os.path.join(path, "index.json"), "w", encoding="utf-8") as file:
+        json.dump(meta, file)
+
+    print(f"finished...see {path}")
+    return CountryIndex(path)
+
+
+class CountryIndex:
+    """
+    Description:
+        Read side of build_country_index...answers "which rows mention country X (or X, Y and/or Z)?" without loading the dataset.
+            index = ostaGIS.CountryIndex("aor_index")
+            index.lookup("SYR")                        # sorted row ids
+            index.query(["SYR", "IRQ", "LBN"])         # row ids mentioning any of them
+            index.query(["SYR", "IRQ"], how="and")     # row ids mentioning all of them
+            index.search(["SYR", "IRQ"], how="and")    # the rows themselves (DataFrame)
+    Params:
+        path: folder written by build_country_index
+    """
+    def __init__(self, path):
+        import os
+        import json
+        import numpy as np
+
+        self.path = path
+        with open(os.path.join(path, "index.json"), encoding="utf-8") as file:
+            meta = json.load(file)
+        self.countries = meta["countries"]
+        self.n_rows = meta["rows"]
+        self.column = meta["column"]
+        self._has_rows = meta["has_rows"]
+        self._position = {code: i for i, code in enumerate(self.countries)}
+        self._postings = np.load(os.path.join(path, "postings.npy"), mmap_mode="r")
+        self._offsets = np.load(os.path.join(path, "offsets.npy"))
+        self._rows = None
+
+    def __len__(self):
+        return self.n_rows
+
+    def lookup(self, iso3):
+        """
+        Returns:
+            sorted numpy array of the row ids that mention the ISO3 code (empty when no row does)
+        """
+        import numpy as np
+
+        i = self._position.get(str(iso3).upper())
+        if i is None:
+            return np.empty(0, dtype=self._postings.dtype)
+        return self._postings[self._offsets[i]:self._offsets[i + 1]]
+
+    def count(self, iso3):
+        # Number of rows that mention the ISO3 code
+        i = self._position.get(str(iso3).upper())
+        return 0 if i is None else int(self._offsets[i + 1] - self._offsets[i])
+
+    def query(self, countries, how="or"):
+        """
+        Params:
+            countries: ISO3 code or list of ISO3 codes
+            how: "or" -- rows mentioning any of the countries (default)...."and" -- rows mentioning all of them
+        Returns:
+            sorted numpy array of row ids
+        """
+        import numpy as np
+
+        if how not in ("or", "and"):
+            raise Exception(f"how param cannot equal '{how}'...how must equal 'or' or 'and'")
+        countries = [countries] if isinstance(countries, str) else list(countries)
+        if not countries:
+            return np.empty(0, dtype=self._postings.dtype)
+        # Smallest postings first...an AND can stop as soon as nothing is left
+        postings = sorted((self.lookup(c) for c in countries), key=len)
+        if how == "or":
+            return np.unique(np.concatenate(postings))
+        ids = np.asarray(postings[0])
+        for other in postings[1:]:
+            if not len(ids):
+                break
+            ids = np.intersect1d(ids, other, assume_unique=True)
+        return ids
+
+    def rows(self, ids, columns=None):
+        """
+        Description:
+            Read only the given rows from the memory mapped rows file.
+        Params:
+            ids: row ids (i.e., from query)
+            columns: columns to read (default -- None -- every column)
+        Returns:
+            pandas DataFrame
+        """
+        import os
+        import numpy as np
+        import pyarrow as pa
+
+        if not self._has_rows:
+            raise Exception(f"index '{self.path}' has no rows...build it from a DataFrame with keep_rows=True")
+        if self._rows is None:
+            self._rows = pa.ipc.open_file(pa.memory_map(os.path.join(self.path, "rows.arrow"))).read_all()
+        table = self._rows
+        if columns is not None:
+            index_columns = [c for c in (table.schema.pandas_metadata or {}).get("index_columns", []) if isinstance(c, str)]
+            table = table.select(index_columns + [c for c in columns if c not in index_columns])
+        return table.take(pa.array(np.asarray(ids, dtype=np.int64))).to_pandas()
+
+    def search(self, countries, how="or", columns=None):
+        """
+        Returns:
+            pandas DataFrame of the rows mentioning any ("or") or all ("and") of the countries...see query and rows
+        """
+        return self.rows(self.query(countries, how), columns)
+
+
+# ******* PARSE COUNTRY STORE *******************************************************************
+# ******* PARSE COUNTRY STORE *******************************************************************
+# ******* PARSE COUNTRY STORE *******************************************************************
+# Bump when the matching code changes in a way that changes its results...stores of older versions are emptied
+_parse_store_version = 1
+
+
+def _parse_store_config(engine):
+    # Everything the matches depend on besides the text...a store built with another config is emptied
+    import json
+    import country_converter as coco
+
+    config = {"version": _parse_store_version, "coco": coco.__version__, "engine": "matcher" if engine == "matcher" else "words"}
+    if engine == "matcher":
+        config["max_words"] = _get_matcher().max_words
+    return json.dumps(config, sort_keys=True)
+
+
+def _match_column_stored(text, engine, store, match):
+    """
+    Description:
+        Match a text column through a match store...texts already in the store are not matched again.
+        Each unique text is matched once, new matches are added to the store.
+    Params:
+        text: pandas Series of (already translated) text
+        engine: "batch", "rowwise" or "matcher"
+        store: path to the .sqlite/.db or .parquet store
+        match: function matching a text Series...returns one list of ISO3 codes per row
+    Returns:
+        list with one sorted list of unique ISO3 codes per row
+    """
+    import os
+    import hashlib
+    import pandas as pd
+
+    # Rows are keyed by a hash of their text...missing text (NaN) has its own key
+    keys = [hashlib.blake2b(t.encode("utf-8") if isinstance(t, str) else b"\0", digest_size=16).hexdigest() for t in text]
+    first = {}
+    for i, key in enumerate(keys):
+        first.setdefault(key, i)
+
+    store = _ParquetParseStore(store) if os.fspath(store).lower().endswith(".parquet") else _SqliteParseStore(store)
+    try:
+        store.open(_parse_store_config(engine))
+        codes = store.get(list(first))
+        missing = [key for key in first if key not in codes]
+        _count("cache_hits", len(first) - len(missing), function="parse_country")
+        if missing:
+            new = match(pd.Series([text.iat[first[key]] for key in missing], dtype=text.dtype))
+            new = {key: " ".join(m) for key, m in zip(missing, new)}
+            store.put(new)
+            codes.update(new)
+    finally:
+        store.close()
+
+    return [codes[key].split() for key in keys]
+
+
+# Match stores...text hash -> ISO3 codes (space separated) kept between parse_country runs.
+# Both have open(config), get(keys), put(codes) and close().
+class _SqliteParseStore:
+    def __init__(self, path):
+        self.path = path
+        self.con = None
+
+    def open(self, config):
+        import sqlite3
+
+        self.con = sqlite3.connect(self.path, timeout=60)
+        with self.con:
+            self.con.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            self.con.execute("CREATE TABLE IF NOT EXISTS matches (hash TEXT PRIMARY KEY, codes TEXT NOT NULL)")
+            row = self.con.execute("SELECT value FROM meta WHERE key = 'config'").fetchone()
+            if row is None or row[0] != config:
+                self.con.execute("DELETE FROM matches")
+                self.con.execute("INSERT OR REPLACE INTO meta VALUES ('config', ?)", (config,))
+
+    def get(self, keys):
+        codes = {}
+        # SQLite limits the number of query params...look the keys up in batches
+        for i in range(0, len(keys), 900):
+            batch = keys[i:i + 900]
+            query = f"SELECT hash, codes FROM matches WHERE hash IN ({','.join('?' * len(batch))})"
+            codes.update(self.con.execute(query, batch).fetchall())
+        return codes
+
+    def put(self, codes):
+        with self.con:
+            self.con.executemany("INSERT OR REPLACE INTO matches VALUES (?, ?)", codes.items())
+
+    def close(self):
+        if self.con is not None:
+            self.con.close()
+            self.con = None
+
+
+class _ParquetParseStore:
+    # The whole store is read on open and rewritten on close when matches were added
+    def __init__(self, path):
+        self.path = path
+        self.changed = False
+
+    def open(self, config):
+        import os
+        import pyarrow.parquet as pq
+
+        self.config = config
+        self.codes = {}
+        self.changed = False
+        if os.path.exists(self.path):
+            table = pq.read_table(self.path)
+            if (table.schema.metadata or {}).get(b"ostagis_config", b"").decode("utf-8") == config:
+                self.codes = dict(zip(table.column("hash").to_pylist(), table.column("codes").to_pylist()))
+            else:
+                self.changed = True
+
+    def get(self, keys):
+        return {key: self.codes[key] for key in keys if key in self.codes}
+
+    def put(self, codes):
+        self.codes.update(codes)
+        self.changed = True
+
+    def close(self):
+        import os
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if not self.changed:
+            return
+        table = pa.table({"hash": list(self.codes), "codes": list(self.codes.values())}, schema=pa.schema(
+            [("hash", pa.string()), ("codes", pa.string())], metadata={"ostagis_config": self.config}
+        ))
+        # Write next to the store and swap it in...a failed write leaves the old store
+        tmp = f"{self.path}.tmp"
+        pq.write_table(table, tmp)
+        os.replace(tmp, self.path)
+        self.changed = False
+
+
+# ******* PARSE COUNTRY STREAM ******************************************************************
+# ******* PARSE COUNTRY STREAM ******************************************************************
+# ******* PARSE COUNTRY STREAM ******************************************************************
+def iter_parse_country(source, col_to_be_parsed, new_match_column, chunksize=100000, explode=True, log="CRITICAL", engine="batch", n_jobs=1, store=None):
+    """
+    Description:
+        Generator version of parse_country for files/tables larger than memory.
+        Reads the source one chunk at a time, geocodes each chunk with parse_country and yields the geocoded chunk.
+        Only one chunk is held in memory at a time.
+    Params:
+        source: one of
+            path to a .csv or .parquet file
+            pandas DataFrame (yielded in slices of 'chunksize' rows)
+            iterator of pandas DataFrames (i.e., pd.read_csv(path, chunksize=...))
+        col_to_be_parsed: Name of column that the country(s) will be extracted from.
+        new_match_column: Name of the new column with the matched ISO3 codes.
+        chunksize: rows read per chunk (default -- 100000)
+        explode, log, engine, n_jobs, store: see parse_country
+    Yields:
+        geocoded pandas DataFrame for each chunk (index continues from chunk to chunk)
+    """
+    import os
+    import pandas as pd
+
+    if isinstance(source, (str, os.PathLike)):
+        path = os.fspath(source)
+        if path.endswith(".csv"):
+            chunks = pd.read_csv(path, chunksize=chunksize)
+        elif path.endswith(".parquet"):
+            chunks = _iter_parquet(path, chunksize)
+        else:
+            raise Exception("source file must end with '.csv' or '.parquet'")
+    elif isinstance(source, pd.DataFrame):
+        chunks = (source.iloc[i:i + chunksize] for i in range(0, len(source), chunksize))
+    else:
+        chunks = iter(source)
+
+    for chunk in chunks:
+        yield parse_country(chunk, col_to_be_parsed, new_match_column, explode=explode, log=log, engine=engine, n_jobs=n_jobs, store=store)
+
+
+def _iter_parquet(path, chunksize):
+    # Read a parquet file in record batches...the index continues from batch to batch
+    import pyarrow.parquet as pq
+
+    start = 0
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize):
+        chunk = batch.to_pandas()
+        chunk.index = range(start, start + len(chunk))
+        start += len(chunk)
+        yield chunk
+
+
+def parse_country_to_file(source, output_path, col_to_be_parsed, new_match_column, chunksize=100000, explode=True, log="CRITICAL", engine="batch", n_jobs=1, store=None):
+    """
+    Description:
+        Geocode a large file/table chunk by chunk (see iter_parse_country) and write each geocoded chunk to the
+        output file as soon as it is ready. Peak memory is bounded by the chunk size.
+    Params:
+        source: path to a .csv or .parquet file, pandas DataFrame or iterator of pandas DataFrames
+        output_path: destination for dataset (.csv or .parquet)
+        col_to_be_parsed: Name of column that the country(s) will be extracted from.
+        new_match_column: Name of the new column with the matched ISO3 codes.
+        chunksize: rows read per chunk (default -- 100000)
+        explode, log, engine, n_jobs, store: see parse_country
+    Returns:
+        number of rows written
+    """
+    import os
+
+    output_path = os.fspath(output_path)
+    if output_path.endswith(".csv"):
+        fmt = "csv"
+    elif output_path.endswith(".parquet"):
+        fmt = "parquet"
+    else:
+        raise Exception("output_path must end with '.csv' or '.parquet'")
+
+    # Written next to the output and renamed when done...a failed run never leaves a truncated file behind
+    partial = output_path + ".part"
+    rows = 0
+    writer = None
+    try:
+        for chunk in iter_parse_country(source, col_to_be_parsed, new_match_column, chunksize=chunksize, explode=explode, log=log, engine=engine, n_jobs=n_jobs, store=store):
+            if fmt == "csv":
+                # Header is only written with the first chunk
+                chunk.to_csv(partial, mode="w" if rows == 0 else "a", header=rows == 0)
+            else:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+
+                table = pa.Table.from_pandas(chunk)
+                if writer is None:
+                    writer = pq.ParquetWriter(partial, _parquet_chunk_schema(table, new_match_column, explode))
+                writer.write_table(_cast_to_schema(table, writer.schema))
+            rows += len(chunk)
+        if writer is not None:
+            writer.close()
+            writer = None
+        os.replace(partial, output_path)
+    finally:
+        if writer is not None:
+            writer.close()
+        if os.path.exists(partial):
+            os.remove(partial)
+
+    if _collectors:
+        _count("bytes_written", os.path.getsize(output_path), function="parse_country_to_file")
+    print(f"finished...see {output_path}")
+    return rows
+
+
+def _parquet_chunk_schema(table, new_match_column, explode):
+    """
+    Description:
+        Schema of a chunked Parquet output, taken from the first geocoded chunk. Later chunks are cast to it.
+        The matched column is typed up front and columns with no values in the first chunk (i.e., an empty CSV column
+        read as float NaN) are typed as strings, so values in later chunks still fit the schema.
+    """
+    import pyarrow as pa
+
+    fields = []
+    for field, column in zip(table.schema, table.columns):
+        if field.name == new_match_column:
+            field = pa.field(field.name, pa.string() if explode else pa.list_(pa.string()))
+        elif column.null_count == len(column):
+            field = pa.field(field.name, pa.large_string())
+        fields.append(field)
+    return pa.schema(fields, metadata=table.schema.metadata)
+
+
+def _cast_to_schema(table, schema):
+    # Cast a chunk's columns to the writer schema...columns the chunk does not have are written as nulls
+    import pyarrow as pa
+
+    columns = []
+    for field in schema:
+        if field.name not in table.column_names:
+            columns.append(pa.nulls(len(table), field.type))
+            continue
+        try:
+            columns.append(table.column(field.name).cast(field.type))
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError) as e:
+            raise Exception(f"column '{field.name}' of a later chunk cannot be written as {field.type}, the type in the first chunk...{e}") from e
+    return pa.Table.from_arrays(columns, schema=schema)
+
+
+# ******* COUNTRY MATCHER ***********************************************************************
+# ******* COUNTRY MATCHER ***********************************************************************
+# ******* COUNTRY MATCHER ***********************************************************************
+class CountryMatcher:
+    """
+    Description:
+        Precompiled country matcher built once from the coco regex table.
+        Scans a whole string in one pass and returns the ISO3 codes found with their character spans.
+        Multi-word names (i.e., 'Saudi Arabia', 'Burkina Faso', 'Central African Republic', 'South Sudan') are matched as one phrase,
+        the longest phrase starting at a word wins so 'Guinea Bissau' is not read as 'Guinea'.
+        NOTE: the coco regexes are written for a single country name (anchors, look-aheads over the whole string), so they are
+        not run over the free text directly. The text is scanned word by word and each word/phrase is checked once against
+        one combined alternation of every coco regex...the result is remembered for the rest of the scan(s).
+    Params:
+        cc: coco.CountryConverter (optional -- the shared converter is used if not provided)
+        max_words: longest phrase, in words, that will be checked against the coco regexes
+            (default -- 6 -- i.e., 'Democratic Republic of the Congo')
+    """
+
+    # Characters removed from each word (same as parse_country)...'-' splits words
+    _drop_chars = str.maketrans('', '', '–,;.()')
+    _conjunctions = {"and", "or", "&"}
+
+    def __init__(self, cc=None, max_words=6):
+        import re
+
+        if cc is None:
+            cc = _get_converter()
+        self.max_words = max_words
+
+        # ISO3 code for each coco regex (cleaned the same way coco cleans its output)
+        self._iso3 = ["".join(c for c in str(iso).split("|")[0] if c.isalnum()).upper() for iso in cc.data["ISO3"]]
+        self._regexes = list(cc.regexes)
+        # One combined alternation...a word/phrase that does not match this cannot match any single coco regex
+        self._any_regex = re.compile("|".join(f"(?:{r.pattern})" for r in self._regexes), re.IGNORECASE)
+        self._word_regex = re.compile(r"[^\s\-]+")
+
+        # Known words of country names...only phrases made of these words are checked (single words are always checked)
+        names = set()
+        vocab = set()
+        for col in ("name_short", "name_official"):
+            for name in cc.data[col].dropna():
+                words = self._normalize(name.replace("-", " ")).split()
+                names.add(" ".join(words))
+                vocab.update(words)
+        for r in self._regexes:
+            vocab.update(re.findall(r"[a-z]{4,}", re.sub(r"\\[A-Za-z]", " ", r.pattern.lower())))
+        self._names = names
+        self._vocab = vocab
+
+        self._phrase_cache = {}
+        self._vocab_cache = {}
+        self._token_cache = {}
+        self._code_cache = {}
+
+    @classmethod
+    def _normalize(cls, word):
+        return word.translate(cls._drop_chars).lower()
+
+    def _lookup(self, phrase):
+        # All ISO3 codes whose coco regex matches the word/phrase (cached)
+        codes = self._phrase_cache.get(phrase)
+        if codes is None:
+            if self._any_regex.search(phrase):
+                codes = tuple(iso for iso, r in zip(self._iso3, self._regexes) if r.search(phrase))
+            else:
+                codes = ()
+            self._phrase_cache[phrase] = codes
+        return codes
+
+    def _in_vocab(self, word):
+        known = self._vocab_cache.get(word)
+        if known is None:
+            known = word in self._vocab or any(word[:n] in self._vocab for n in range(4, len(word)))
+            self._vocab_cache[word] = known
+        return known
+
+    def _token(self, raw):
+        # (normalized word, characters trimmed from the start, characters trimmed from the end, known word, ISO3 codes)
+        word = self._normalize(raw)
+        if not word:
+            return (word, 0, 0, False, ())
+        lead = len(raw) - len(raw.lstrip('–,;.()'))
+        trail = len(raw) - len(raw.rstrip('–,;.()'))
+        return (word, lead, trail, self._in_vocab(word), self._lookup(word))
+
+    def _phrase_code(self, words):
+        # ISO3 code for a phrase of 2+ words or None (cached)
+        phrase = " ".join(words)
+        if phrase not in self._code_cache:
+            self._code_cache[phrase] = self._check_phrase(phrase, words)
+        return self._code_cache[phrase]
+
+    def _check_phrase(self, phrase, words):
+        # The phrase must point to one country and be a country name or need both its first and last word for the match
+        # (i.e., 'the United States' is left to 'United States'...'Lebanon also' is left to 'Lebanon')
+        if phrase in self._names:
+            codes = self._lookup(phrase)
+            return codes[0] if len(codes) == 1 else None
+        # Lists of countries (i.e., 'Lebanon Syria Iraq') are not checked as one phrase
+        if len({code for word in words for code in self._lookup(word)}) > 1:
+            return None
+        codes = self._lookup(phrase)
+        if len(codes) != 1:
+            return None
+        if self._conjunctions.intersection(words):
+            return None
+        if codes == self._lookup(" ".join(words[1:])) or codes == self._lookup(" ".join(words[:-1])):
+            return None
+        return codes[0]
+
+    def find(self, text):
+        """
+        Description:
+            Find every country mentioned in the text.
+        Params:
+            text: str
+        Returns:
+            list of (ISO3 code, start, end) tuples in the order found...text[start:end] is the matched word/phrase
+        """
+        if not isinstance(text, str):
+            return []
+
+        # Normalized word, span and known/matched info for every word (cached by the raw word)
+        words = []
+        spans = []
+        known = []
+        for m in self._word_regex.finditer(text):
+            raw = m.group()
+            token = self._token_cache.get(raw)
+            if token is None:
+                token = self._token(raw)
+                self._token_cache[raw] = token
+            if token[0]:
+                words.append(token)
+                spans.append((m.start() + token[1], m.end() - token[2]))
+                known.append(token[3])
+
+        found = []
+        i = 0
+        while i < len(words):
+            # Longest run of known words starting here (limited by max_words)
+            run = 1
+            if known[i]:
+                while run < self.max_words and i + run < len(words) and known[i + run]:
+                    run += 1
+
+            matched = False
+            for n in range(run, 1, -1):
+                code = self._phrase_code([w[0] for w in words[i:i + n]])
+                if code is not None:
+                    found.append((code, spans[i][0], spans[i + n - 1][1]))
+                    i += n
+                    matched = True
+                    break
+            if matched:
+                continue
+
+            for code in words[i][4]:
+                found.append((code, spans[i][0], spans[i][1]))
+            i += 1
+
+        return found
+
+    def codes(self, text):
+        """
+        Description:
+            Sorted list of the unique ISO3 codes mentioned in the text (same form as the parse_country lists).
+        """
+        return sorted({code for code, start, end in self.find(text)})
+
+    def match_column(self, text):
+        """
+        Description:
+            Sorted list of unique ISO3 codes for every row of a pandas Series of text.
+            Repeated texts are only scanned once.
+        """
+        rows = text.to_list()
+        found = {}
+        for t in rows:
+            if t not in found:
+                found[t] = self.codes(t)
+        return [list(found[t]) for t in rows]
+
+
+# ******* FUZZY COUNTRY RESOLVER ****************************************************************
+# ******* FUZZY COUNTRY RESOLVER ****************************************************************
+# ******* FUZZY COUNTRY RESOLVER ****************************************************************
+class FuzzyCountryResolver:
+    """
+    Description:
+        Fallback for names coco reports as 'not found' (typos, url slugs, misspelled AOR text)...i.e., 'Azerbajian',
+        'congo-republic-of-the', 'Afganistan'. Every coco short/official name is split into trigrams once and kept in an
+        inverted index (trigram -> names), so a lookup only scores the names sharing a trigram with the input instead of
+        comparing it with every name. The closest names by trigrams are then compared character by character...the score
+        (0 to 1) is the higher of the trigram (Dice) similarity, which ignores word order, and the difflib ratio, which is
+        forgiving of swapped/missing letters. Results are remembered for the rest of the run.
+        A name is left unmatched when it is ambiguous...only generic words (i.e., 'Union', 'Islands'), a demonym of the
+        best name (i.e., 'Indian', 'Palestinian'), part of the names of two countries (i.e., 'Congo') or the top two
+        countries score within 'margin' of each other.
+    Params:
+        cc: coco.CountryConverter (optional -- the shared converter is used if not provided)
+        threshold: a match must score over this (default -- 0.8)
+        aliases: dict of extra name -> ISO3 code to index (optional)
+        margin: lowest lead the best country needs over the runner-up (default -- 0.05)
+    """
+    # Words shared by many country names...a name made only of these says nothing about which country is meant
+    _generic = frozenset((
+        "union", "republic", "islands", "island", "guinea", "kingdom", "states", "state", "united", "democratic",
+        "people", "peoples", "federal", "federation", "federated", "north", "south", "east", "west", "central",
+        "new", "saint", "st", "the", "of", "and", "arab", "islamic", "socialist", "territory", "territories",
+    ))
+    # Endings that turn a country name into its demonym (i.e., 'India' -> 'Indian', 'Palestine' -> 'Palestinian')
+    _demonym_endings = ("n", "an", "ian", "ean", "ese", "ish", "i", "ic", "er", "ite")
+
+    def __init__(self, cc=None, threshold=0.8, aliases=None, margin=0.05):
+        if cc is None:
+            cc = _get_converter()
+        self.threshold = threshold
+        self.margin = margin
+
+        entries = {}
+        for col in ("name_short", "name_official"):
+            for iso, name in zip(cc.data["ISO3"], cc.data[col]):
+                if isinstance(name, str):
+                    iso = "".join(c for c in str(iso).split("|")[0] if c.isalnum()).upper()
+                    entries.setdefault((self._normalize(name), iso), name)
+        for name, iso in (aliases or {}).items():
+            entries[(self._normalize(name), iso.upper())] = name
+
+        self._iso3 = []
+        self._names = []
+        self._labels = []
+        self._grams = []
+        self._index = {}
+        for (normalized, iso), label in entries.items():
+            grams = self._trigrams(normalized)
+            if not grams:
+                continue
+            for gram in grams:
+                self._index.setdefault(gram, []).append(len(self._grams))
+            self._iso3.append(iso)
+            self._names.append(normalized)
+            self._labels.append(label)
+            self._grams.append(grams)
+        self._cache = {}
+
+    @staticmethod
+    def _normalize(name):
+        # Lower case words without accents or punctuation...'-' and '_' split words (url slugs)
+        import unicodedata
+
+        name = unicodedata.normalize("NFKD", str(name)).encode("ascii", "ignore").decode("ascii").lower()
+        return " ".join(re.sub(r"[^a-z0-9]+", " ", name).split())
+
+    @staticmethod
+    def _trigrams(normalized):
+        # Trigrams of each word padded with two spaces in front and one behind (i.e., '  a', ' az', 'aze'...'an ')
+        grams = set()
+        for word in normalized.split():
+            padded = f"  {word} "
+            grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+        return frozenset(grams)
+
+    def candidates(self, name, limit=5):
+        """
+        Returns:
+            list of up to 'limit' (ISO3, matched name, score) tuples...best score first, one per ISO3 code
+        """
+        import difflib
+
+        normalized = self._normalize(name)
+        grams = self._trigrams(normalized)
+        if not grams:
+            return []
+        shared = {}
+        for gram in grams:
+            for i in self._index.get(gram, ()):
+                shared[i] = shared.get(i, 0) + 1
+        # Only the names closest by trigrams are compared character by character
+        dice = sorted(((2 * n / (len(grams) + len(self._grams[i])), i) for i, n in shared.items()), key=lambda x: (-x[0], x[1]))
+        scored = []
+        for score, i in dice[:max(20, 4 * limit)]:
+            ratio = difflib.SequenceMatcher(None, normalized, self._names[i], autojunk=False).ratio()
+            scored.append((max(score, ratio), i))
+        scored.sort(key=lambda x: (-x[0], x[1]))
+        results = []
+        seen = set()
+        for score, i in scored:
+            if self._iso3[i] not in seen:
+                seen.add(self._iso3[i])
+                results.append((self._iso3[i], self._labels[i], round(score, 4)))
+                if len(results) == limit:
+                    break
+        return results
+
+    def _is_demonym(self, words, label):
+        # True when a word is a name word plus a demonym ending (i.e., 'syrian' of 'syria')...typos change letters instead
+        for word in words:
+            for part in self._normalize(label).split():
+                stem = part.rstrip("aeiou")
+                if word != part and len(stem) >= 3 and word.startswith(stem) and word[len(stem):] in self._demonym_endings:
+                    return True
+        return False
+
+    def _best(self, name):
+        # (ISO3, matched name, score) of the best match...ISO3 and matched name are None when the name is ambiguous
+        words = self._normalize(name).split()
+        if all(word in self._generic for word in words):
+            return (None, None, 0.0)
+        found = self.candidates(name, limit=5)
+        if not found:
+            return (None, None, 0.0)
+        iso, label, score = found[0]
+        if score < 1:
+            contained = [c for c in found if set(words) <= set(self._normalize(c[1]).split())]
+            if (
+                (len(found) > 1 and score - found[1][2] < self.margin)
+                or len(contained) > 1
+                or self._is_demonym(words, label)
+            ):
+                return (None, None, score)
+        return (iso, label, score)
+
+    def resolve(self, name, threshold=None):
+        """
+        Returns:
+            (ISO3, score) of the best match...ISO3 is None when the score is not over the threshold or the name is ambiguous
+        """
+        threshold = self.threshold if threshold is None else threshold
+        best = self._cache.get(name)
+        if best is None:
+            best = self._best(name)
+            self._cache[name] = best
+        return (best[0], best[2]) if best[0] is not None and best[2] > threshold else (None, best[2])
+
+    def resolve_many(self, names, threshold=None):
+        """
+        Returns:
+            pandas DataFrame -- 'name', 'ISO3' (None when unmatched), 'matched_name' and 'score' per name
+        """
+        import pandas as pd
+
+        threshold = self.threshold if threshold is None else threshold
+        rows = []
+        for name in names:
+            if name not in self._cache:
+                self.resolve(name)
+            iso, label, score = self._cache[name]
+            matched = iso is not None and score > threshold
+            rows.append((name, iso if matched else None, label if matched else None, score))
+        return pd.DataFrame(rows, columns=["name", "ISO3", "matched_name", "score"])
+
 
-    # Temporary column for parsing
-    col_parsed_filled = df['col_with_id'].fillna("N/A")
-    
-    # country_converter
-    cc = coco.CountryConverter()
-    
-    i = -1
-    while i < (len(col_parsed_filled) - 1):
-        i += 1
-    
-        # Split text at every " "...then check the regex to find any countries matching in coco and match using the ISO3 Code.
-        # Any word not matching a country is labeled "AAAA" for sorting and final data cleaning
-        # mc is the 'new' matching column
-        mc = pd.Series(cc.convert(col_parsed_filled[i].split(), src="regex", to="ISO3", not_found='AAAA'))
-        
-        # Split text at every " " for comparison to coco matched column "mc"
-        # og is the original column separated to creat a one for on match when concatenating "mc" and "og"
-        og = pd.Series(col_parsed_filled[i].split())
-    
-        # Combine "mc" and "og" for comparison
-        comb = pd.concat([og, mc], axis=1)
-    
-        # Access the 2nd column (mc) and drop duplicated countries and all words labeled as "AAAA" to leave only a single "AAAA" and countries
-        comb_drop_d = comb[1].drop_duplicates()
+def _fuzzy_fallback(names, converted, threshold, to, function):
+    # Replace the 'not found' results of a coco conversion with the fuzzy match of the original name (when over the threshold)
+    cc = _get_converter()
+    converted = list(converted)
+    missing = [i for i, value in enumerate(converted) if isinstance(value, str) and value == "not found"]
+    if not missing:
+        return converted
+    resolved = _get_fuzzy().resolve_many([names.iat[i] for i in missing], threshold)
+    for i, iso in zip(missing, resolved["ISO3"]):
+        if isinstance(iso, str):
+            converted[i] = cc.convert(iso, src="ISO3", to=to)
+    _count("fuzzy_matched", int(resolved["ISO3"].notna().sum()), function=function)
+    return converted
 
-        # Sort values alphabetically...remove "comb_drop_d[0]" (i.e. "AAAA")...reset index...remove old index column...rename ISO3 Coded column as "new_match_column"
-        new_df = pd.DataFrame(comb_drop_d)[1].sort_values().drop(0).reset_index().drop(columns='index').rename(columns={1: new_match_column})
-        
-        # Turn "new_match_column" into list to insert values into the "df"
-        new_df_list = new_df[new_match_column].to_list()
 
-        # Replace empty df["new_match_column"] values with ISO3 Codes from "new_df_list" based on matching index number
-        df.at[i, new_match_column] = new_df_list
+def _fuzzy_text_matches(text, matches, threshold):
+    # Add the countries of capitalized words that are close to (but not exactly) a country name to each row's matches
+    resolver = _get_fuzzy()
+    words = text.fillna("").str.findall(r"\b[A-Z][A-Za-z']{3,}\b")
+    words.index = range(len(words))
+    words = words.explode().dropna()
 
-    # explaode values by default. Do not explode with False and keep macthed country ISO 3 codes in list form wihtin the cell.
-    if explode == True:
-        return df.explode(new_match_column).drop(columns='col_with_id')
-    else:
-        return df.drop(columns='col_with_id')
+    lookup = {}
+    for word in words.unique():
+        iso, score = resolver.resolve(word, threshold)
+        # Exact names are left to the engine (i.e., 'Guinea' of 'Papua New Guinea')
+        if iso is not None and score < 1:
+            lookup[word] = iso
+    if not lookup:
+        return matches
+
+    extra = words.map(lookup).dropna()
+    _count("fuzzy_matched", len(extra), function="parse_country")
+    matches = list(matches)
+    for row, codes in extra.groupby(level=0).agg(set).items():
+        matches[row] = sorted(set(matches[row]) | codes)
+    return matches
+
+
+def fuzzy_resolve(names, threshold=0.8):
+    """
+    Description:
+        Resolve names coco cannot match (typos, slugs) to ISO3 codes with the shared FuzzyCountryResolver.
+    Params:
+        names: list (or pandas Series) of names
+        threshold: lowest score accepted as a match (default -- 0.8)
+    Returns:
+        pandas DataFrame -- 'name', 'ISO3', 'matched_name' and 'score' per name
+    """
+    return _get_fuzzy().resolve_many(list(names), threshold)
+
+
+# ******* SAVED HTML ****************************************************************************
+# ******* SAVED HTML ****************************************************************************
+# ******* SAVED HTML ****************************************************************************
+def _parse_saved_html(saved_html, parse_only):
+    """
+    Description:
+        Parse a saved World Factbook page with lxml, only building the elements matched by 'parse_only'.
+        Much faster and smaller than a full 'html.parser' tree on full site saves.
+    Params:
+        saved_html: path to the saved html file
+        parse_only: bs4 SoupStrainer of the elements to keep
+    """
+    from bs4 import BeautifulSoup
+
+    with _span("wfb.parse_html"), open(saved_html, 'rb') as file:
+        return BeautifulSoup(file, 'lxml', parse_only=parse_only, from_encoding='utf-8')
 
 
 # ******* WFB COUNTRY SCRAPE ********************************************************************
 # ******* WFB COUNTRY SCRAPE ********************************************************************
 # ******* WFB COUNTRY SCRAPE ********************************************************************
-def wfb_country_scrape(saved_html, output_folder, log="CRITICAL"):
+def wfb_country_scrape(saved_html, output_folder=None, log="CRITICAL", fmt="csv", fuzzy=None, arrow_strings=True):
     """
     Description:
         Extract links for each country from the CIA World Factbook.
@@ -283,11 +2480,17 @@ def wfb_country_scrape(saved_html, output_folder, log="CRITICAL"):
         saved_html: path to the saved CIA wfb html file -- see documentation 'https://github.com/samcor33/ostaGIS/'
         output_folder: path to folder for resulting datasets
             Example - 'C:\\Users\\me\\project_folder\\saved_datasets'
+            (default -- None -- nothing is written and (coded, not coded) DataFrames are returned)
         log: 'CRITICAL' or 'INFO' will denote whether the 'not found' regexes are displayed as an error
               CRITICAL - 'not found' regexes will not be displayed
               INFO - 'not found' regexes will be displayed
+        fmt: "csv", "parquet", "feather", "xlsx" or "gpkg" format of the resulting datasets (default -- "csv")
+        fuzzy: lowest FuzzyCountryResolver score accepted for link names coco does not find (i.e., 'cabo-verde', 'congo-republic-of-the')
+            (default -- None -- names coco does not find go to the not coded dataset)
+        arrow_strings: True or False -- keep the link/name columns as Arrow backed strings (default -- True -- where supported)
     """
-    from bs4 import BeautifulSoup, NavigableString
+    from bs4 import SoupStrainer
+    import os
     import pandas as pd
     import country_converter as coco
     import logging
@@ -304,15 +2507,9 @@ def wfb_country_scrape(saved_html, output_folder, log="CRITICAL"):
     
     wfb_country_links = [] # Stores each link
     
-    # Open the HTML file
-    with open(saved_html, 'r', encoding='utf-8') as file:
-        html_content = file.read()
-    
-    # Parse the HTML content
-    soup = BeautifulSoup(html_content, 'html.parser')
-    
-    # Find div elements labeled "pb30" which hold the information for each t_org
-    sections = soup.find_all("a", attrs={"href": any})
+    # Parse only the links of the saved page
+    soup = _parse_saved_html(saved_html, SoupStrainer("a", href=True))
+    sections = [a for a in soup.find_all("a") if a.get("href")]
     
     for a in sections:
         # Replace "file:///C:/" with the CIA url to make the "href" url valid an clickable
@@ -326,14 +2523,19 @@ def wfb_country_scrape(saved_html, output_folder, log="CRITICAL"):
     #Get country name from split link
     wfb_df_country = wfb_df_coded[5]
 
-    cc = coco.CountryConverter()
-    #Compare country with coco and create column with matched country
-    country_names = cc.pandas_convert(wfb_df_country, to='short_name')
-    wfb_df_coded['country'] = country_names
-    
-    #Get ISO3 Code with coco based off of the matched country
-    iso3_codes = cc.pandas_convert(wfb_df_coded['country'], to='ISO3')
-    wfb_df_coded['ISO3_CODE'] = iso3_codes
+    with _span("wfb_country_scrape.match"):
+        #Compare country with coco and create column with matched country
+        country_names = _pandas_convert(wfb_df_country, to='short_name')
+        if fuzzy is not None:
+            country_names = _fuzzy_fallback(wfb_df_country, country_names, fuzzy, 'short_name', "wfb_country_scrape")
+        wfb_df_coded['country'] = country_names
+        
+        #Get ISO3 Code with coco based off of the matched country
+        iso3_codes = _pandas_convert(wfb_df_coded['country'], to='ISO3')
+        wfb_df_coded['ISO3_CODE'] = iso3_codes
+    if _collectors:
+        _count("rows_processed", len(wfb_df_coded), function="wfb_country_scrape")
+        _count("not_found", int((wfb_df_coded['country'] == "not found").sum()), function="wfb_country_scrape")
     
     #Merge split link data with original link df...then drop & rename columns
     wfb_coded = wfb_df.merge(wfb_df_coded, left_index=True, right_index=True).drop(columns=["0_y",	1,	2,	3,	4, 6]).rename(columns={"0_x": "wfb_country_link", 5: "wfb_country_name"})
@@ -341,12 +2543,18 @@ def wfb_country_scrape(saved_html, output_folder, log="CRITICAL"):
     #Create two separate dfs...one without coded links and one with the coded links
     wfb_code_not_found = wfb_coded[wfb_coded['country'] == "not found"].drop_duplicates().reset_index().drop(columns="index")
     wfb_coded = wfb_coded[wfb_coded['country'] != "not found"].drop_duplicates().reset_index().drop(columns="index")
+    wfb_coded = _store_text(wfb_coded, arrow_strings)
+    wfb_code_not_found = _store_text(wfb_code_not_found, arrow_strings)
     
+    # Return the DataFrames without writing when there is no output folder
+    if output_folder is None:
+        return wfb_coded, wfb_code_not_found
+
     # Dataset of locations not found thru coco...(i.e., place.drop_duplicates()s, not official countries)
-    wfb_code_not_found.to_csv(output_folder + "\\wfb_countries_not_coded.csv")
+    write_table(wfb_code_not_found, os.path.join(output_folder, f"wfb_countries_not_coded.{fmt}"), fmt=fmt)
     
     # Dataset of goelocated World Fact Book links
-    wfb_coded.to_csv(output_folder + "\\wfb_countries_coded.csv")
+    write_table(wfb_coded, os.path.join(output_folder, f"wfb_countries_coded.{fmt}"), fmt=fmt)
 
     return(print(f"finished...see {output_folder}"))
 
@@ -354,7 +2562,7 @@ def wfb_country_scrape(saved_html, output_folder, log="CRITICAL"):
 # ******* WFB TOS GEOSCRAPER ********************************************************************
 # ******* WFB TOS GEOSCRAPER ********************************************************************
 # ******* WFB TOS GEOSCRAPER ********************************************************************
-def wfb_tos_geoscraper(saved_html):
+def wfb_tos_geoscraper(saved_html, arrow_strings=True):
     """
     saved_html: path to the saved CIA wfb html file -- see documentation 'https://github.com/samcor33/ostaGIS/'
     
@@ -366,21 +2574,16 @@ def wfb_tos_geoscraper(saved_html):
     | torg (name) |  AOR description  |
     
     Designed for: use with the `parse_country` function to geolocate the AORs
+    arrow_strings: True or False -- keep the text as Arrow backed strings (default -- True -- where pandas/pyarrow support it)
     """
-    from bs4 import BeautifulSoup, NavigableString
+    from bs4 import SoupStrainer
     import pandas as pd
     import country_converter as coco
     
     wfb_tos = {}
     
-    # Open the HTML file
-    with open(saved_html, 'r', encoding='utf-8') as file:
-        html_content = file.read()
-    
-    # Parse the HTML content
-    soup = BeautifulSoup(html_content, 'html.parser')
-    
-    # Find div elements labeled "pb30" which hold the information for each t_org
+    # Parse only the div elements labeled "pb30" which hold the information for each t_org
+    soup = _parse_saved_html(saved_html, SoupStrainer('div', attrs={"class": "pb30"}))
     sections = soup.find_all('div', attrs={"class":"pb30"})
     
     # Extract information (example: all paragraph tags)
@@ -416,7 +2619,169 @@ def wfb_tos_geoscraper(saved_html):
                     break
     
     # Put "wfb_tos" into pandas dataframe
-    return pd.DataFrame(wfb_tos).T.reset_index()
+    _count("rows_processed", len(wfb_tos), function="wfb_tos_geoscraper")
+    return _store_text(pd.DataFrame(wfb_tos).T.reset_index(), arrow_strings)
+
+
+# ******* WFB TOS BATCH *************************************************************************
+# ******* WFB TOS BATCH *************************************************************************
+# ******* WFB TOS BATCH *************************************************************************
+# Column of the batch dataset for each label used by the CIA (labels vary between t_orgs and snapshots)
+_torg_fields = {
+    "aliases": ("aka",),
+    "history": ("history", "established"),
+    "objectives": ("goals",),
+    "leadership": ("leadership and organization", "leadership"),
+    "area of operation": ("areas of operation", "area(s) of operation"),
+    "tactics": ("targets, tactics, and weapons", "tactics, targets, and weapons", "targets and tactics"),
+    "strength": ("strength", "membership"),
+    "support": ("financial and other support", "financial resources", "funding and other support"),
+    "designation": ("designation",),
+}
+_torg_labels = {label: field for field, labels in _torg_fields.items() for label in labels}
+_torg_embedded_label = re.compile(
+    "(" + "|".join(re.escape(label) for label in sorted(_torg_labels, key=len, reverse=True) if len(label) > 5) + r")(?=\s*[–\-]\s)"
+)
+
+
+def wfb_tos_batch(saved_htmls, snapshot_dates=None, n_jobs=1, executor=None, arrow_strings=True):
+    """
+    Description:
+        Scrape every labeled field of every t_org from many saved CIA wfb terrorist organization pages (e.g. monthly snapshots).
+        Each file is parsed in one pass per t_org section. Files are parsed in parallel worker processes when n_jobs > 1.
+    Params:
+        saved_htmls: list of paths to saved CIA wfb html files -- see documentation 'https://github.com/samcor33/ostaGIS/'
+        snapshot_dates: dict of path -> date of the snapshot (optional)
+            (default -- None -- taken from a YYYY-MM-DD, YYYY_MM_DD, YYYYMMDD or YYYY-MM date in the file name, else the file's modified date)
+        n_jobs: number of worker processes (default -- 1 -- files are parsed in this process; -1 uses every CPU)
+        executor: existing concurrent.futures Executor to parse the files with (optional -- overrides n_jobs)
+        arrow_strings: True or False -- keep the text columns as Arrow backed strings (default -- True -- where pandas/pyarrow
+            support it) or Python object strings (False)
+    Result: a Pandas Dataframe with one row per t_org per snapshot
+        snapshot_source, snapshot_date, name, aliases (list), history, objectives, leadership, area of operation,
+        tactics, strength, support, designation, other (dict of any other labeled fields)
+    Designed for: use with the `parse_country` function to geolocate the AORs ('area of operation')
+    """
+    import os
+    import pandas as pd
+    from concurrent.futures import ProcessPoolExecutor
+
+    if isinstance(saved_htmls, (str, os.PathLike)):
+        saved_htmls = [saved_htmls]
+    saved_htmls = [os.fspath(path) for path in saved_htmls]
+    snapshot_dates = snapshot_dates or {}
+    dates = [snapshot_dates.get(path, _snapshot_date(path)) for path in saved_htmls]
+
+    if n_jobs == -1:
+        n_jobs = os.cpu_count() or 1
+    elif not isinstance(n_jobs, int) or isinstance(n_jobs, bool) or n_jobs < 1:
+        raise Exception(f"n_jobs param cannot equal '{n_jobs}'...n_jobs must be a positive int or -1")
+
+    if executor is not None:
+        file_records = list(executor.map(_scrape_torg_file, saved_htmls))
+    elif n_jobs > 1 and len(saved_htmls) > 1:
+        with ProcessPoolExecutor(max_workers=min(n_jobs, len(saved_htmls))) as pool:
+            file_records = list(pool.map(_scrape_torg_file, saved_htmls))
+    else:
+        file_records = [_scrape_torg_file(path) for path in saved_htmls]
+
+    rows = []
+    for path, date, records in zip(saved_htmls, dates, file_records):
+        for record in records:
+            rows.append({"snapshot_source": path, "snapshot_date": date, **record})
+
+    columns = ["snapshot_source", "snapshot_date", "name", *_torg_fields, "other"]
+    _count("rows_processed", len(rows), function="wfb_tos_batch")
+    torgs = pd.DataFrame(rows, columns=columns)
+    torgs["snapshot_date"] = pd.to_datetime(torgs["snapshot_date"])
+    text_columns = ["snapshot_source", "name", *(f for f in _torg_fields if f != "aliases")]
+    return _store_text(torgs, arrow_strings, text_columns)
+
+
+def _snapshot_date(path):
+    # Date of a snapshot from its file name...else the date the file was saved
+    import datetime
+    import os
+    import re
+
+    name = os.path.basename(path)
+    found = re.search(r'(\d{4})[-_]?(\d{2})[-_]?(\d{2})(?!\d)', name) or re.search(r'(\d{4})[-_](\d{2})(?!\d)', name)
+    if found:
+        year, month, day = int(found.group(1)), int(found.group(2)), int(found.group(3)) if found.lastindex == 3 else 1
+        try:
+            return datetime.date(year, month, day)
+        except ValueError:
+            pass
+    return datetime.date.fromtimestamp(os.path.getmtime(path))
+
+
+def _scrape_torg_file(saved_html):
+    """
+    Description:
+        Records of every t_org in one saved CIA wfb terrorist organization page.
+    Returns:
+        list of dicts -- name, the _torg_fields columns and other
+    """
+    from bs4 import SoupStrainer
+
+    soup = _parse_saved_html(saved_html, SoupStrainer('div', attrs={"class": "pb30"}))
+    records = []
+    for section in soup.find_all('div', attrs={"class": "pb30"}):
+        title = section.find("h2")
+        if title is None:
+            continue
+        record = {"name": title.get_text(), **{field: None for field in _torg_fields}, "other": {}}
+        for p in section.find_all('p'):
+            for label, value in _torg_paragraph_fields(p):
+                field = _torg_labels.get(label.lower())
+                if field is None:
+                    # CIA labels are lower case...capitalized ones are sub-branch headings (i.e., 'Islamic State of
+                    # Iraq and ash-Sham – Algeria'), not fields
+                    if label[:1].islower():
+                        record["other"][label] = value
+                elif record[field] is None:
+                    record[field] = value
+        if record["aliases"] is not None:
+            record["aliases"] = [alias.strip() for alias in record["aliases"].split(";") if alias.strip()]
+        # Saved pages can hold each t_org section more than once
+        if record not in records:
+            records.append(record)
+    return records
+
+
+def _torg_paragraph_fields(p):
+    """
+    Description:
+        (label, text) pairs of a t_org paragraph. Labels are normally "<strong>label</strong> – text" but a paragraph
+        can hold more than one, some are plain "label - text" and some run straight into the text before them.
+    """
+    import re
+    from bs4 import NavigableString
+
+    fields = []
+    for child in p.children:
+        if not isinstance(child, NavigableString) and child.name == "strong" and child.get_text().strip(" \xa0–-:"):
+            label = child.get_text().strip(" \xa0–-:\n")
+            # "<strong>leadership</strong> <strong>and organization</strong>" is one label
+            if fields and not fields[-1][1].strip():
+                fields[-1][0] = f"{fields[-1][0]} {label}"
+            else:
+                fields.append([label, ""])
+        elif fields:
+            fields[-1][1] += child.get_text()
+    if not fields:
+        found = re.match(r'\s*([^–\-:]{2,60}?)\s*[–\-]', p.get_text())
+        if not found:
+            return []
+        fields.append([found.group(1).strip(), p.get_text()[found.end(1):]])
+
+    # Known labels that run into the text of the field before them...e.g. "...criminal organizationsareas of operation – ..."
+    pairs = []
+    for label, value in fields:
+        parts = _torg_embedded_label.split(value)
+        pairs.append((label, parts[0]))
+        pairs.extend(zip(parts[1::2], parts[2::2]))
+    return [(label, re.sub(r'^\s*[–\-]\s*', '', value).strip()) for label, value in pairs]
 
 
 # ******* GEOMATCH AND MULTIPLY *****************************************************************
@@ -429,7 +2794,9 @@ def geomatch_and_multiply(
     out_gdb = "country_mult.gdb", 
     countries_join_field = "ISO_CC",
     table_join_field = "country_aor",
-    feature_dataset_name = "individual_fc"
+    feature_dataset_name = "individual_fc",
+    backend = "arcpy",
+    output_mode = "multiplied"
 ):
     
     """
@@ -464,8 +2831,30 @@ def geomatch_and_multiply(
     feature_dataset_name (str):
         name of feature dataset that will contain the individually mapped feature classes
         (default -- "individual_fc")
+
+    backend (str):
+        "arcpy" -- run inside ArcGIS Pro on the CURRENT project (default)
+        "geopandas" -- run headless with GeoPandas/pyogrio (no ArcGIS needed)
+            countries_fc/iso_table are file paths (any format GDAL reads, .csv/.parquet/.xlsx tables) or (Geo)DataFrames.
+            out_gdb is a GeoPackage (.gpkg) or GeoParquet (.parquet) path...a '.gdb' name is written as '.gpkg'.
+            GeoPackage -- "countries_multiplied" and one layer per name in the same file.
+            GeoParquet -- "countries_multiplied" in out_gdb and one file per name in the '<out_gdb>_<feature_dataset_name>' folder.
+
+    output_mode (str):
+        "multiplied" -- every matched table record gets its own copy of the country polygon (default)
+        "normalized" -- each matched country polygon is stored once ("countries") with a "countries_links" table of the
+            table records keyed by the join fields. The multiplied data is derived only when it is used:
+            arcpy -- a relationship class between "countries" and "countries_links" (no per-name feature classes)
+            GeoPackage -- "countries_multiplied" and the per-name layers are views of the two tables
+            GeoParquet -- '<out_gdb>' holds the countries and '<out_gdb>_links.parquet' the links (see read_multiplied)
     """
-    
+    if output_mode not in ("multiplied", "normalized"):
+        raise Exception(f"output_mode param cannot equal '{output_mode}'...output_mode must equal 'multiplied' or 'normalized'")
+    if backend == "geopandas":
+        return _geomatch_and_multiply_gpd(countries_fc, iso_table, name_col, out_gdb, countries_join_field, table_join_field, feature_dataset_name, output_mode)
+    elif backend != "arcpy":
+        raise Exception(f"backend param cannot equal '{backend}'...backend must equal 'arcpy' or 'geopandas'")
+
     import arcpy
     # Get CURRENT project
     aprx = arcpy.mp.ArcGISProject("CURRENT")
@@ -492,6 +2881,12 @@ def geomatch_and_multiply(
         aprx.defaultGeodatabase = f"{aprx.homeFolder}\\{out_gdb}"
         print(out_gdb + " created!")
     
+    if output_mode == "normalized":
+        _geomatch_normalized_arcpy(aprx, countries_fc, iso_table, countries_join_field, table_join_field)
+        aprx.defaultGeodatabase = og_default_gdb
+        print('Individual Mapping Complete')
+        return
+
     #_______________________PART 1___________________________________________________
     # Credit for part 1 goes to AI which helped me design the actual operation of the code. I only adjusted certain portions to integrate it with the whole function.
     mult_fc = f"{aprx.defaultGeodatabase}\\countries_multiplied",
@@ -547,43 +2942,25 @@ def geomatch_and_multiply(
     print("Many-to-many replication completed!")
     
     #_______________________PART 2___________________________________________________
-    # Stats table to be created - to get unique name count (i.e, index--not record count)
-    stats_table = f"{aprx.defaultGeodatabase}\\stats_table"
-    
-    # Run stats to get count and name of each t_org
-    arcpy.analysis.Statistics(iso_table, stats_table, [[name_col, "COUNT"]], case_field=name_col)
-    
-    # Feature layer "countries_multiplied" must be in map
-    mult_lyr = aprx.activeMap.listLayers('countries_multiplied')
-    # Get the unique values of each name/index from table and put in list
-    names_array = arcpy.da.TableToNumPyArray(stats_table, [name_col])
-    
     # Create Feature Dataset named "individual_fc" as a container to store the individual Feature Classes
     arcpy.management.CreateFeatureDataset(
         out_dataset_path=out_gdb,
         out_name=feature_dataset_name
     )
-    
-    # Run a loop for the entirety of the list
-    i = -1
-    while i < len(names_array) - 1:
-        i = i + 1
-        
-        # Clean strings to remove forbidden characters
-        fc_name = names_array[i][0].replace(" ", "_").replace("'", "_").replace("(", "").replace(")", "").replace("-", "_").replace("/", "_").replace("’", "_").replace("–", "_").replace(",", "")
-        
-        # Export Feature Class based on matching #s in "Field1" (number associated with the unique value)
-        arcpy.conversion.ExportFeatures(
-            in_features = "countries_multiplied",
-            out_features = f"{out_gdb}\\{feature_dataset_name}\\{fc_name}",
-            where_clause = f"Field1 = {i}"
-        )
-        # Name of newley created layer
-        new_lyr = aprx.activeMap.listLayers(fc_name)
-        
-        # Delete newly created layer to save space in the "Contents" pane
-        arcpy.Delete_management(new_lyr)
-    
+
+    # Read "countries_multiplied" once and route each feature to the feature class of its name
+    # New feature classes are not added to the "Contents" pane
+    og_add_outputs = arcpy.env.addOutputsToMap
+    arcpy.env.addOutputsToMap = False
+    mult_fields = [f.name for f in arcpy.ListFields("countries_multiplied") if f.type not in ('Geometry', 'OID') and f.editable] + ['SHAPE@']
+    writer = _ArcpyLayerWriter(f"{out_gdb}\\{feature_dataset_name}", "countries_multiplied", mult_fields, reserved=["countries_multiplied"])
+    try:
+        with arcpy.da.SearchCursor("countries_multiplied", mult_fields) as cursor:
+            _write_partitioned(cursor, mult_fields.index(name_col), writer)
+    finally:
+        writer.close()
+        arcpy.env.addOutputsToMap = og_add_outputs
+
     # ---------------------RETURN GDB TO ORIGINAL DEFAULT------------------------------
     # Set default back to original gdb file path
     aprx.defaultGeodatabase = og_default_gdb
@@ -591,43 +2968,793 @@ def geomatch_and_multiply(
     print('Individual Mapping Complete')
 
 
+def _read_geo_input(data, geometry=True):
+    # (Geo)DataFrame as is...else read the path with pandas (tables) or pyogrio (everything else)
+    import os
+    import pandas as pd
+    import geopandas as gpd
+
+    if isinstance(data, pd.DataFrame):
+        return data
+    ext = os.path.splitext(os.fspath(data))[1].lower()
+    if not geometry and ext == ".csv":
+        return pd.read_csv(data)
+    if not geometry and ext == ".xlsx":
+        return pd.read_excel(data)
+    if ext == ".parquet":
+        return gpd.read_parquet(data) if geometry else pd.read_parquet(data)
+    return gpd.read_file(data, engine="pyogrio", read_geometry=geometry)
+
+
+_layer_name_chars = str.maketrans({" ": "_", "'": "_", "-": "_", "/": "_", "’": "_", "–": "_", "(": None, ")": None, ",": None})
+
+
+def layer_name(name, taken=(), max_len=160):
+    """
+    Description:
+        Turn a name (i.e., a t_org name) into a valid feature class/layer name that is not already taken.
+        Spaces, dashes, slashes and quotes become "_" and brackets/commas are removed (as before), letters are reduced
+        to ASCII, any other character becomes "_", names starting with a digit get a "fc_" prefix, and "_2", "_3"...
+        is added when the name is already taken (not case sensitive).
+    Params:
+        name: name to clean
+        taken: layer names already used (i.e., a set that is added to as names are made)
+        max_len: longest name allowed (default -- 160 -- file geodatabase limit)
+    """
+    import unicodedata
+
+    clean = str(name).translate(_layer_name_chars)
+    clean = unicodedata.normalize("NFKD", clean).encode("ascii", "ignore").decode("ascii")
+    clean = re.sub(r"[^0-9A-Za-z_]", "_", clean)
+    if not clean or clean[0].isdigit():
+        clean = f"fc_{clean}"
+    clean = clean[:max_len]
+
+    used = {t.lower() for t in taken}
+    unique, n = clean, 1
+    while unique.lower() in used:
+        n += 1
+        suffix = f"_{n}"
+        unique = clean[:max_len - len(suffix)] + suffix
+    if isinstance(taken, set):
+        taken.add(unique)
+    return unique
+
+
+def _write_partitioned(rows, key_index, writer, batch_size=5000):
+    """
+    Description:
+        Route each row to the output layer of its name in a single pass over the rows.
+        Rows are handed to the writer in batches of up to batch_size per layer.
+    Params:
+        rows: iterable of row tuples (i.e., an arcpy SearchCursor or DataFrame.itertuples)
+        key_index: position of the name in each row
+        writer: _LayerWriter
+    Returns:
+        dict of name -> layer name
+    """
+    layers = {}
+    batches = {}
+    for row in rows:
+        key = row[key_index]
+        layer = layers.get(key)
+        if layer is None:
+            layer = layers[key] = writer.layer_name(key)
+            batches[layer] = []
+        batch = batches[layer]
+        batch.append(row)
+        if len(batch) >= batch_size:
+            writer.write_rows(layer, batch)
+            batches[layer] = []
+    for layer, batch in batches.items():
+        if batch:
+            writer.write_rows(layer, batch)
+    return layers
+
+
+class _LayerWriter:
+    """
+    Description:
+        Shared part of the output backends of _write_partitioned...one output layer per name.
+        Each backend adds write_rows(layer, rows) to write the rows (tuples in 'fields' order) of a layer, and finishes in close.
+    """
+    def __init__(self, fields, reserved=()):
+        self.fields = list(fields)
+        self.taken = set(reserved)
+
+    def layer_name(self, name):
+        return layer_name(name, self.taken)
+
+    def close(self):
+        pass
+
+
+class _GpkgLayerWriter(_LayerWriter):
+    # Layers of one GeoPackage...the first batch of a layer replaces it, later batches are appended
+    def __init__(self, path, fields, geometry_name, crs, reserved=()):
+        super().__init__(fields, reserved)
+        self.path = path
+        self.geometry_name = geometry_name
+        self.crs = crs
+        self.written = set()
+
+    def write_rows(self, layer, rows):
+        import geopandas as gpd
+        import pyogrio
+
+        frame = gpd.GeoDataFrame.from_records(rows, columns=self.fields)
+        frame = frame.set_geometry(self.geometry_name, crs=self.crs)
+        pyogrio.write_dataframe(frame, self.path, layer=layer, driver="GPKG", append=layer in self.written)
+        self.written.add(layer)
+
+
+class _ParquetLayerWriter(_LayerWriter):
+    # One GeoParquet file per layer in a folder...rows are kept until close as a Parquet file cannot be appended to
+    def __init__(self, folder, fields, geometry_name, crs, reserved=()):
+        super().__init__(fields, reserved)
+        self.folder = folder
+        self.geometry_name = geometry_name
+        self.crs = crs
+        self.rows = {}
+
+    def write_rows(self, layer, rows):
+        self.rows.setdefault(layer, []).extend(rows)
+
+    def close(self):
+        import os
+        import geopandas as gpd
+
+        os.makedirs(self.folder, exist_ok=True)
+        for layer, rows in self.rows.items():
+            frame = gpd.GeoDataFrame.from_records(rows, columns=self.fields)
+            frame.set_geometry(self.geometry_name, crs=self.crs).to_parquet(os.path.join(self.folder, f"{layer}.parquet"))
+        self.rows = {}
+
+
+class _ArcpyLayerWriter(_LayerWriter):
+    # Feature classes in a feature dataset, created from a template feature class the first time they are written to
+    def __init__(self, out_dataset, template, fields, reserved=()):
+        super().__init__(fields, reserved)
+        self.out_dataset = out_dataset
+        self.template = template
+        self.cursors = {}
+
+    def write_rows(self, layer, rows):
+        import arcpy
+
+        cursor = self.cursors.get(layer)
+        if cursor is None:
+            arcpy.CreateFeatureclass_management(
+                out_path=self.out_dataset,
+                out_name=layer,
+                geometry_type=arcpy.Describe(self.template).shapeType,
+                template=self.template,
+                spatial_reference=arcpy.Describe(self.template).spatialReference
+            )
+            cursor = self.cursors[layer] = arcpy.da.InsertCursor(f"{self.out_dataset}\\{layer}", self.fields)
+        for row in rows:
+            cursor.insertRow(row)
+
+    def close(self):
+        # arcpy cursors release their locks when they are deleted
+        self.cursors.clear()
+
+
+def _geomatch_and_multiply_gpd(countries_fc, iso_table, name_col, out_gdb, countries_join_field, table_join_field, feature_dataset_name, output_mode="multiplied"):
+    """
+    Description:
+        GeoPandas/pyogrio backend of geomatch_and_multiply...see geomatch_and_multiply for the params.
+        The many-to-many replication is one merge of the countries and the table on the join fields.
+    """
+    import os
+    import pandas as pd
+    import geopandas as gpd
+
+    countries = _read_geo_input(countries_fc)
+    table = _read_geo_input(iso_table, geometry=False)
+    if isinstance(table, gpd.GeoDataFrame):
+        table = pd.DataFrame(table.drop(columns=table.geometry.name))
+
+    if out_gdb.lower().endswith(".gdb"):
+        out_gdb = out_gdb[:-4] + ".gpkg"
+    out_fmt = _table_format(out_gdb)
+    if out_fmt not in ("gpkg", "parquet"):
+        raise Exception(f"out_gdb cannot be '{out_gdb}'...out_gdb must be a .gpkg or .parquet path with backend='geopandas'")
+
+    table = table[table[table_join_field].notna()]
+    if output_mode == "normalized":
+        _geomatch_normalized_gpd(countries, table, name_col, out_gdb, out_fmt, countries_join_field, table_join_field)
+        print('Individual Mapping Complete')
+        return
+
+    #_______________________PART 1___________________________________________________
+    # Every country attribute + every table attribute + the country geometry, for each table record of each country
+    geometry_name = countries.geometry.name
+    countries_fields = [c for c in countries.columns if c != geometry_name]
+    with _span("geomatch.merge"):
+        mult = countries[countries_fields + [geometry_name]].merge(
+            table, how="inner", left_on=countries_join_field, right_on=table_join_field, suffixes=("", "_1")
+        )
+        mult = gpd.GeoDataFrame(mult[[c for c in mult.columns if c != geometry_name] + [geometry_name]], geometry=geometry_name, crs=countries.crs)
+    _count("rows_processed", len(mult), function="geomatch_and_multiply")
+
+    with _span("geomatch.write", layer="countries_multiplied"):
+        if out_fmt == "gpkg":
+            mult.to_file(out_gdb, layer="countries_multiplied", driver="GPKG", engine="pyogrio")
+        else:
+            mult.to_parquet(out_gdb)
+    print("Many-to-many replication completed!")
+
+    #_______________________PART 2___________________________________________________
+    # One layer per unique name...the multiplied features are read once and routed to their layer
+    # A table name_col that is also a countries field was given the "_1" suffix by the merge...partition on the table's values
+    fields = list(mult.columns)
+    part_col = name_col + "_1" if name_col in countries_fields and name_col + "_1" in fields else name_col
+    if out_fmt == "gpkg":
+        writer = _GpkgLayerWriter(out_gdb, fields, geometry_name, mult.crs, reserved=["countries_multiplied"])
+    else:
+        writer = _ParquetLayerWriter(f"{os.path.splitext(out_gdb)[0]}_{feature_dataset_name}", fields, geometry_name, mult.crs)
+    try:
+        with _span("geomatch.write", layer="per_name"):
+            _write_partitioned(mult.itertuples(index=False, name=None), fields.index(part_col), writer)
+    finally:
+        writer.close()
+
+    print('Individual Mapping Complete')
+
+
+def _geomatch_normalized_gpd(countries, table, name_col, out_gdb, out_fmt, countries_join_field, table_join_field):
+    """
+    Description:
+        Normalized output of the geopandas backend...each matched country polygon once and a link table of the table records.
+        GeoPackage outputs also get "countries_multiplied" and one view per name, joined only when they are read.
+    """
+    import os
+    import sqlite3
+    import pyogrio
+
+    matched = countries[countries[countries_join_field].isin(table[table_join_field])]
+    if out_fmt == "parquet":
+        matched.to_parquet(out_gdb)
+        table.to_parquet(f"{os.path.splitext(out_gdb)[0]}_links.parquet", index=False)
+        print("Countries and links written!")
+        return
+
+    matched.to_file(out_gdb, layer="countries", driver="GPKG", engine="pyogrio")
+    pyogrio.write_dataframe(table, out_gdb, layer="countries_links", driver="GPKG")
+
+    def quote(name):
+        return '"' + str(name).replace('"', '""') + '"'
+
+    with sqlite3.connect(out_gdb) as con:
+        geom_col, geom_type, srs_id = con.execute(
+            "SELECT column_name, geometry_type_name, srs_id FROM gpkg_geometry_columns WHERE table_name = 'countries'"
+        ).fetchone()
+        country_cols = [r[1] for r in con.execute("PRAGMA table_info(countries)") if r[1] not in ("fid", geom_col)]
+        link_cols = [r[1] for r in con.execute("PRAGMA table_info(countries_links)") if r[1] != "fid"]
+        con.execute(f"CREATE INDEX IF NOT EXISTS countries_links_join ON countries_links ({quote(table_join_field)})")
+
+        # Same columns as the multiplied layer...table fields that clash with a country field get "_1"
+        select = ", ".join(
+            ["l.fid AS fid"]
+            + [f"c.{quote(c)}" for c in country_cols]
+            + [f"l.{quote(c)} AS {quote(c + '_1' if c in country_cols else c)}" for c in link_cols]
+            + [f"c.{quote(geom_col)} AS {quote(geom_col)}"]
+        )
+        views = {"countries_multiplied": (
+            f"SELECT {select} FROM countries_links l JOIN countries c ON c.{quote(countries_join_field)} = l.{quote(table_join_field)}"
+        )}
+        taken = {"countries", "countries_links", "countries_multiplied"}
+        view_name_col = name_col + "_1" if name_col in country_cols else name_col
+        for name in table[name_col].dropna().unique():
+            literal = "'" + str(name).replace("'", "''") + "'"
+            views[layer_name(name, taken)] = f"SELECT * FROM countries_multiplied WHERE {quote(view_name_col)} = {literal}"
+
+        for view, sql in views.items():
+            con.execute(f"DROP VIEW IF EXISTS {quote(view)}")
+            con.execute(f"CREATE VIEW {quote(view)} AS {sql}")
+            # Register the view as a feature layer so GIS software lists it
+            con.execute("DELETE FROM gpkg_contents WHERE table_name = ?", (view,))
+            con.execute("DELETE FROM gpkg_geometry_columns WHERE table_name = ?", (view,))
+            con.execute(
+                "INSERT INTO gpkg_contents (table_name, identifier, data_type, srs_id) VALUES (?, ?, 'features', ?)",
+                (view, view, srs_id)
+            )
+            con.execute(
+                "INSERT INTO gpkg_geometry_columns (table_name, column_name, geometry_type_name, srs_id, z, m) VALUES (?, ?, ?, ?, 0, 0)",
+                (view, geom_col, geom_type, srs_id)
+            )
+    print("Countries, links and views written!")
+
+
+def _geomatch_normalized_arcpy(aprx, countries_fc, iso_table, countries_join_field, table_join_field):
+    # Normalized output of the arcpy backend...matched countries once, the table records and a relationship class
+    import arcpy
+
+    table_codes = set()
+    with arcpy.da.SearchCursor(iso_table, [table_join_field]) as cursor:
+        for row in cursor:
+            if row[0] is not None:
+                table_codes.add(row[0])
+    codes = ", ".join("'" + str(code).replace("'", "''") + "'" for code in sorted(table_codes))
+
+    countries_out = f"{aprx.defaultGeodatabase}\\countries"
+    links_out = f"{aprx.defaultGeodatabase}\\countries_links"
+    arcpy.conversion.ExportFeatures(countries_fc, countries_out, where_clause=f"{countries_join_field} IN ({codes})")
+    arcpy.conversion.ExportTable(iso_table, links_out, where_clause=f"{table_join_field} IS NOT NULL")
+    arcpy.management.CreateRelationshipClass(
+        countries_out, links_out, f"{aprx.defaultGeodatabase}\\countries_links_rel",
+        "SIMPLE", "countries_links", "countries", "NONE", "ONE_TO_MANY", "NONE",
+        countries_join_field, table_join_field
+    )
+    print("Countries, links and relationship class created!")
+
+
+def read_multiplied(out_gdb, name=None, name_col="index", countries_join_field="ISO_CC", table_join_field="country_aor"):
+    """
+    Description:
+        Read the multiplied countries (one polygon per table record) written by geomatch_and_multiply(backend="geopandas")
+        in either output mode, optionally only the records of one name.
+    Params:
+        out_gdb: the .gpkg or .parquet path written by geomatch_and_multiply
+        name: only read the records with this name_col value (default -- None -- every record)
+        name_col, countries_join_field, table_join_field: same as given to geomatch_and_multiply
+    Returns:
+        GeoDataFrame
+    """
+    import os
+    import pandas as pd
+    import geopandas as gpd
+
+    if out_gdb.lower().endswith(".gdb"):
+        out_gdb = out_gdb[:-4] + ".gpkg"
+    links_path = f"{os.path.splitext(out_gdb)[0]}_links.parquet"
+
+    if _table_format(out_gdb) == "gpkg":
+        mult = gpd.read_file(out_gdb, layer="countries_multiplied", engine="pyogrio")
+    elif os.path.exists(links_path):
+        countries = gpd.read_parquet(out_gdb)
+        geometry_name = countries.geometry.name
+        links = pd.read_parquet(links_path)
+        mult = countries.merge(links, how="inner", left_on=countries_join_field, right_on=table_join_field, suffixes=("", "_1"))
+        mult = mult[[c for c in mult.columns if c != geometry_name] + [geometry_name]]
+    else:
+        mult = gpd.read_parquet(out_gdb)
+
+    if name is not None:
+        # A table name_col that is also a countries field has the "_1" suffix (see geomatch_and_multiply)
+        if name_col + "_1" in mult.columns and name_col != table_join_field:
+            name_col = name_col + "_1"
+        mult = mult[mult[name_col] == name].reset_index(drop=True)
+    return mult
+
+
 # ******* APPLY STYLE TO GP LYR *****************************************************************
 # ******* APPLY STYLE TO GP LYR *****************************************************************
 # ******* APPLY STYLE TO GP LYR *****************************************************************
-def apply_style_to_gp_lyr(gp_lyr_name, style_name):
+def apply_style_to_gp_lyr(gp_lyr_name, style_name, colors=None, m=None):
     """
     Description:
-        Add a new style to the symbology of every layer within a specified group layer.
+        Add a new style to the symbology of every layer within one or more group layers.
+        The style is looked up in the gallery once (per symbol type) and its definition is copied to every other layer.
+    Params:
+        gp_lyr_name: name of the group layer, or a list of group layer names
+        style_name: name of the style in the gallery (i.e., 'Hollow')
+        colors: fill color of each layer (optional -- default -- None -- the style's color)
+            list of [R, G, B] or [R, G, B, A] colors used in turn, or dict of layer name -> color
+        m: map holding the group layers (default -- None -- the active map of the CURRENT ArcGIS Pro project)
+            Anything with the arcpy.mp Map/Layer methods used here (listLayers, name, isGroupLayer, symbology,
+            getDefinition, setDefinition) can be passed...i.e., a stand-in for testing without ArcGIS.
     """
-    import arcpy
-    aprx = arcpy.mp.ArcGISProject("CURRENT")
-    
-    # get the current map
-    m = aprx.activeMap
-    
+    import copy
+
+    if m is None:
+        import arcpy
+        aprx = arcpy.mp.ArcGISProject("CURRENT")
+        # get the current map
+        m = aprx.activeMap
+
+    gp_lyr_names = [gp_lyr_name] if isinstance(gp_lyr_name, str) else list(gp_lyr_name)
+
     # individual org layers must be grouped
-    # find all layers in map
-    lyrs = m.listLayers()
-    
-    # find the grouped layers in group
-    for gp_lyr in lyrs:
-        if gp_lyr.name == gp_lyr_name:
-            gpd_lyrs = gp_lyr.listLayers()
-            
-            # run loop counting the total of layers in the group
-            i = -1
-            while i < len(gpd_lyrs) -1 :
-                i = i + 1
-                
-                # get the symbology for each layer
-                symbology = gpd_lyrs[i].symbology
-    
-                if hasattr(symbology, "renderer"):
-                    symbology.updateRenderer("SimpleRenderer")
-                # update symbology to desired style
-                    symbology.renderer.symbol.applySymbolFromGallery(style_name)
-                    gpd_lyrs[i].symbology = symbology  # Apply changes
+    # find the grouped layers in each group
+    gpd_lyrs = []
+    found = []
+    for gp_lyr in m.listLayers():
+        if gp_lyr.name in gp_lyr_names and gp_lyr.isGroupLayer:
+            found.append(gp_lyr.name)
+            gpd_lyrs.extend(lyr for lyr in gp_lyr.listLayers() if not lyr.isGroupLayer)
+    missing = [name for name in gp_lyr_names if name not in found]
+    if missing:
+        raise Exception(f"No Group Layer Found! {missing} \n Either the group layer name entered was mispelled or does not exist. \n NOTE: To apply a style to multiple feature layers, the layers must be within a group layer.")
+
+    symbols = {}  # renderer with the style applied...per symbol type (polygon, line, point)
+    n = 0
+    for lyr in gpd_lyrs:
+        if not hasattr(lyr.symbology, "renderer"):
+            continue
+        cim = lyr.getDefinition("V3")
+        kind = type(getattr(getattr(cim.renderer, "symbol", None), "symbol", None)).__name__
+        changed = False
+        if kind in symbols:
+            cim.renderer = copy.deepcopy(symbols[kind])
+            changed = True
         else:
-            raise Exception("No Group Layer Found! \n Either the group layer name entered was mispelled or does not exist. \n NOTE: To apply a style to multiple feature layers, the layers must be within a group layer.")
+            # update symbology to desired style from the gallery
+            symbology = lyr.symbology
+            symbology.updateRenderer("SimpleRenderer")
+            symbology.renderer.symbol.applySymbolFromGallery(style_name)
+            lyr.symbology = symbology
+            cim = lyr.getDefinition("V3")
+            # Layers without a simple renderer do not tell their symbol type up front...always use the gallery for them
+            if kind != "NoneType":
+                symbols[kind] = copy.deepcopy(cim.renderer)
+
+        color = colors.get(lyr.name) if isinstance(colors, dict) else colors[n % len(colors)] if colors else None
+        n += 1
+        if color is not None:
+            _set_symbol_color(cim.renderer.symbol.symbol, color)
+            changed = True
+        if changed:
+            lyr.setDefinition(cim)  # Apply changes
 
     print("Style applied to group")
+
+
+def _set_symbol_color(symbol, color):
+    # Color the fill(s) of a CIM symbol...or every colored symbol layer of a line/point symbol
+    import copy
+
+    values = list(color) + [100] if len(color) == 3 else list(color)
+    fills = [sl for sl in symbol.symbolLayers if type(sl).__name__ == "CIMSolidFill"]
+    for sl in fills or [sl for sl in symbol.symbolLayers if hasattr(sl, "color")]:
+        if type(sl.color).__name__ == "CIMRGBColor":
+            sl.color = copy.copy(sl.color)
+        else:
+            import arcpy
+            sl.color = arcpy.cim.CreateCIMObjectFromClassName("CIMRGBColor", "V3")
+        sl.color.values = values
+
+
+# ******* PIPELINE ******************************************************************************
+# ******* PIPELINE ******************************************************************************
+# ******* PIPELINE ******************************************************************************
+class Pipeline:
+    """
+    Description:
+        Chain ostaGIS functions (or any function) as named stages...i.e., wfb_tos_geoscraper -> parse_country -> geomatch_and_multiply
+        next to state_dept_twas. The inputs and params of each stage are hashed and its result is kept in a local artifact cache
+        under that hash, so a stage whose inputs have not changed is not run again. Stages that do not depend on each other
+        (i.e., the advisory and the WFB branch) run at the same time.
+            pipe = ostaGIS.Pipeline(".ostagis_cache")
+            pipe.stage("twas", "state_dept_twas", volatile=True, export="advisories.parquet")
+            pipe.stage("torgs", "wfb_tos_geoscraper", params={"saved_html": "t_orgs.html"})
+            pipe.stage("torgs_geo", "parse_country", inputs={"df": "torgs"},
+                       params={"col_to_be_parsed": "area of operation", "new_match_column": "country_aor"})
+            pipe.stage("geomatch", "geomatch_and_multiply", inputs={"iso_table": "torgs_geo"},
+                       params={"countries_fc": "countries.gpkg", "name_col": "index", "out_gdb": "country_mult.gpkg",
+                               "backend": "geopandas"}, output="out_gdb", export="geomatch_out")
+            results = pipe.run()
+    Params:
+        cache_dir: folder of the artifact cache (default -- ".ostagis_cache")
+    """
+    def __init__(self, cache_dir=".ostagis_cache"):
+        self.cache_dir = cache_dir
+        self.stages = {}
+        self.report = []
+
+    def stage(self, name, func, inputs=None, params=None, output=None, volatile=False, export=None):
+        """
+        Description:
+            Add a stage.
+        Params:
+            name: stage name (unique)
+            func: function to run...a callable or the name of an ostaGIS function (i.e., "parse_country")
+            inputs: dict of func param -> name of the stage whose result is passed to it
+            params: dict of func param -> value...paths of existing files/folders are hashed by their content
+            output: func param that takes an output path (i.e., "export_path", "out_gdb") (default -- None)
+                The file name given in params is written inside the stage's artifact folder and the path is the stage result.
+            volatile: True or False -- always run the stage (i.e., it requests a web feed) (default -- False)
+                The stages after it are still skipped when its result has not changed.
+            export: copy the stage result here after the run (default -- None)
+                DataFrame results are written with write_table (any format it supports)...output stages are copied into the folder.
+                Missing parent folders are created. A failed export fails the stage, so nothing is cached and the next run retries it.
+        Returns:
+            the Pipeline
+        """
+        if name in self.stages:
+            raise Exception(f"name param cannot equal '{name}'...a stage named '{name}' already exists")
+        if isinstance(func, str):
+            if not callable(globals().get(func)):
+                raise Exception(f"func param cannot equal '{func}'...func must be a callable or the name of an ostaGIS function")
+            func = globals()[func]
+        params = dict(params or {})
+        if output is not None and not params.get(output):
+            raise Exception(f"output param cannot equal '{output}'...params must give a file name for '{output}'")
+        self.stages[name] = {
+            "func": func, "inputs": dict(inputs or {}), "params": params,
+            "output": output, "volatile": volatile, "export": export,
+        }
+        return self
+
+    @classmethod
+    def from_config(cls, config):
+        """
+        Description:
+            Build a Pipeline from a dict or a JSON file:
+                {"cache_dir": ".ostagis_cache",
+                 "stages": {"torgs": {"func": "wfb_tos_geoscraper", "params": {"saved_html": "t_orgs.html"}},
+                            "torgs_geo": {"func": "parse_country", "inputs": {"df": "torgs"}, "params": {...}}, ...}}
+            Every stage takes the keyword arguments of Pipeline.stage. A "n_jobs" key is kept for run().
+        Params:
+            config: dict or path to a .json file
+        Returns:
+            Pipeline
+        """
+        import json
+
+        if not isinstance(config, dict):
+            with open(config, encoding="utf-8") as file:
+                config = json.load(file)
+        pipe = cls(config.get("cache_dir", ".ostagis_cache"))
+        pipe.n_jobs = config.get("n_jobs")
+        for name, stage in config.get("stages", {}).items():
+            pipe.stage(name, **stage)
+        return pipe
+
+    def _order(self):
+        # Stage names so every stage comes after the stages it takes inputs from
+        order = []
+        state = {}
+
+        def visit(name, path):
+            if state.get(name) == "done":
+                return
+            if state.get(name) == "visiting":
+                raise Exception(f"stages cannot depend on each other in a loop...{' -> '.join(path + [name])}")
+            state[name] = "visiting"
+            for upstream in self.stages[name]["inputs"].values():
+                if upstream not in self.stages:
+                    raise Exception(f"inputs cannot equal '{upstream}'...stage '{name}' takes an input from a stage that does not exist")
+                visit(upstream, path + [name])
+            state[name] = "done"
+            order.append(name)
+
+        for name in self.stages:
+            visit(name, [])
+        return order
+
+    def run(self, n_jobs=None, force=()):
+        """
+        Description:
+            Run every stage whose inputs changed since it was cached, and load the others from the artifact cache.
+        Params:
+            n_jobs: number of stages run at the same time (default -- None -- every independent stage)
+            force: stage names to run even when they are cached
+        Returns:
+            dict of stage name -> result (the returned value, or the output path of an output stage)
+            self.report lists each stage with its status ("ran"/"cached"), seconds and artifact key
+        """
+        from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+        order = self._order()
+        n_jobs = n_jobs or getattr(self, "n_jobs", None) or len(order) or 1
+        results = {}
+        digests = {}
+        self.report = []
+
+        with ThreadPoolExecutor(max_workers=n_jobs) as pool:
+            running = {}
+            pending = list(order)
+            while pending or running:
+                for name in [n for n in pending if all(u in digests for u in self.stages[n]["inputs"].values())]:
+                    pending.remove(name)
+                    upstream = {param: (results[u], digests[u]) for param, u in self.stages[name]["inputs"].items()}
+                    running[pool.submit(self._run_stage, name, upstream, name in force)] = name
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        results[name], digests[name], entry = future.result()
+                    except Exception:
+                        for other in running:
+                            other.cancel()
+                        raise
+                    self.report.append(entry)
+
+        print(f"finished...see {self.cache_dir}")
+        return results
+
+    def _run_stage(self, name, upstream, force=False):
+        import os
+        import json
+        import pickle
+        import shutil
+        import tempfile
+
+        stage = self.stages[name]
+        key = _hash_json({
+            "stage": name,
+            "code": _func_fingerprint(stage["func"]),
+            "params": {k: _hash_value(v) for k, v in sorted(stage["params"].items()) if k != stage["output"]},
+            "output": stage["output"] and os.path.basename(stage["params"][stage["output"]]),
+            "inputs": {k: digest for k, (_, digest) in sorted(upstream.items())},
+        })
+        artifacts = os.path.join(self.cache_dir, "artifacts")
+        folder = os.path.join(artifacts, key)
+        meta_path = os.path.join(folder, "meta.json")
+
+        if os.path.exists(meta_path) and not (force or stage["volatile"]):
+            with open(meta_path, encoding="utf-8") as file:
+                meta = json.load(file)
+            result = self._load_result(folder, meta)
+            _count("cache_hits", function="pipeline", stage=name)
+            print(f"{name}: unchanged...cached")
+            self._export(name, result, ran=False)
+            return result, meta["digest"], {"stage": name, "status": "cached", "seconds": 0.0, "key": key}
+
+        os.makedirs(artifacts, exist_ok=True)
+        tmp = tempfile.mkdtemp(prefix=f".{key}.", dir=artifacts)
+        try:
+            kwargs = dict(stage["params"])
+            kwargs.update({param: value for param, (value, _) in upstream.items()})
+            if stage["output"]:
+                kwargs[stage["output"]] = os.path.join(tmp, os.path.basename(stage["params"][stage["output"]]))
+
+            start = time.perf_counter()
+            with _span(f"pipeline.{name}"):
+                result = stage["func"](**kwargs)
+            seconds = time.perf_counter() - start
+
+            meta = {"stage": name, "seconds": round(seconds, 6), "created": time.strftime("%Y-%m-%dT%H:%M:%S")}
+            if stage["output"]:
+                meta["output"] = os.path.basename(kwargs[stage["output"]])
+                meta["digest"] = _hash_path(tmp)
+            else:
+                with open(os.path.join(tmp, "result.pkl"), "wb") as file:
+                    pickle.dump(result, file, protocol=pickle.HIGHEST_PROTOCOL)
+                meta["digest"] = _hash_path(os.path.join(tmp, "result.pkl"))
+            with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as file:
+                json.dump(meta, file, indent=1)
+
+            # Export before the artifact is cached...a failed export fails the stage so the next run retries it
+            self._export(name, self._load_result(tmp, meta) if stage["output"] else result, ran=True)
+
+            # Swap the finished artifact in...a run stopped part way never leaves a half written artifact behind
+            if os.path.exists(folder):
+                shutil.rmtree(folder)
+            os.replace(tmp, folder)
+        except BaseException:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+
+        result = self._load_result(folder, meta) if stage["output"] else result
+        print(f"{name}: finished in {seconds:.2f}s")
+        return result, meta["digest"], {"stage": name, "status": "ran", "seconds": seconds, "key": key}
+
+    def _load_result(self, folder, meta):
+        import os
+        import pickle
+
+        if "output" in meta:
+            return os.path.join(folder, meta["output"])
+        with open(os.path.join(folder, "result.pkl"), "rb") as file:
+            return pickle.load(file)
+
+    def _export(self, name, result, ran):
+        # Copy the result to the stage's export path...only when it changed or the export is missing
+        import os
+        import shutil
+        import pandas as pd
+
+        export = self.stages[name]["export"]
+        if export is None or (not ran and os.path.exists(export)):
+            return
+        if self.stages[name]["output"]:
+            os.makedirs(export, exist_ok=True)
+            folder = os.path.dirname(result)
+            for item in os.listdir(folder):
+                if item == "meta.json":
+                    continue
+                src, dst = os.path.join(folder, item), os.path.join(export, item)
+                if os.path.isdir(src):
+                    shutil.copytree(src, dst, dirs_exist_ok=True)
+                else:
+                    shutil.copy2(src, dst)
+        elif isinstance(result, pd.DataFrame):
+            os.makedirs(os.path.dirname(export) or ".", exist_ok=True)
+            write_table(result, export)
+        else:
+            raise Exception(f"export cannot be used on stage '{name}'...only DataFrame results and output stages can be exported")
+
+
+def _hash_json(value):
+    import json
+    import hashlib
+    return hashlib.sha256(json.dumps(value, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def _hash_path(path):
+    # Content hash of a file, or of every file (and its relative path) in a folder
+    import os
+    import hashlib
+
+    digest = hashlib.sha256()
+    if os.path.isdir(path):
+        files = sorted(os.path.relpath(os.path.join(root, f), path) for root, _, fs in os.walk(path) for f in fs)
+        files = [f for f in files if f != "meta.json"]
+    else:
+        files = [""]
+    for rel in files:
+        digest.update(rel.replace(os.sep, "/").encode("utf-8") + b"\0")
+        with open(os.path.join(path, rel) if rel else path, "rb") as file:
+            for block in iter(lambda: file.read(1 << 20), b""):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def _hash_value(value):
+    # Hash of a stage param...existing paths by their content, plain values as JSON, anything else as its pickle
+    import os
+    import pickle
+    import hashlib
+
+    if isinstance(value, (str, os.PathLike)) and os.path.exists(value):
+        return {"path": _hash_path(value)}
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, (list, tuple)):
+        return [_hash_value(v) for v in value]
+    if isinstance(value, dict):
+        return {str(k): _hash_value(v) for k, v in value.items()}
+    return {"pickle": hashlib.sha256(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)).hexdigest()}
+
+
+def _func_fingerprint(func):
+    # ostaGIS functions call each other, so any change to this file (or to coco's country table) changes them all
+    import os
+    import inspect
+    import hashlib
+
+    if getattr(func, "__module__", None) == __name__:
+        fingerprint = _shared.get("fingerprint")
+        if fingerprint is None:
+            import country_converter as coco
+            fingerprint = f"{_hash_path(os.path.abspath(__file__))}:{coco.__version__}"
+            _shared["fingerprint"] = fingerprint
+        return f"{func.__name__}:{fingerprint}"
+    try:
+        source = inspect.getsource(func)
+    except (OSError, TypeError):
+        source = ""
+    return f"{getattr(func, '__module__', '')}.{getattr(func, '__qualname__', repr(func))}:{hashlib.sha256(source.encode('utf-8')).hexdigest()}"
+
+
+def main(argv=None):
+    """
+    Description:
+        Command line runner...python ostaGIS.py run pipeline.json [--n-jobs N] [--force STAGE ...]
+        See Pipeline.from_config for the JSON layout.
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="ostaGIS", description="Run an ostaGIS pipeline with a content-addressed stage cache.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run = commands.add_parser("run", help="run the stages of a pipeline JSON file")
+    run.add_argument("config", help="pipeline JSON file")
+    run.add_argument("--n-jobs", type=int, default=None, help="stages run at the same time (default: every independent stage)")
+    run.add_argument("--force", nargs="*", default=(), metavar="STAGE", help="run these stages even when cached")
+    run.add_argument("--cache-dir", default=None, help="artifact cache folder (overrides the config)")
+    args = parser.parse_args(argv)
+
+    pipe = Pipeline.from_config(args.config)
+    if args.cache_dir:
+        pipe.cache_dir = args.cache_dir
+    pipe.run(n_jobs=args.n_jobs, force=args.force)
+    for entry in pipe.report:
+        print(f"{entry['stage']:<24} {entry['status']:<7} {entry['seconds']:8.2f}s  {entry['key'][:12]}")
+    return pipe.report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+import hashlib
+import os
+import sys
+import threading
+from html import escape
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+# ostaGIS is a single module at the repo root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class LocalServer:
+    """
+    Local HTTP server for the feed/page tests.
+        routes: path -> bytes (200 with an ETag...304 when If-None-Match matches), int (that status) or a list of
+                those served one per request (the last one is kept)
+        requests: (path, headers dict) of every request received
+    """
+    def __init__(self):
+        self.routes = {}
+        self.requests = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.requests.append((self.path, dict(self.headers)))
+                response = server.routes.get(self.path, 404)
+                if isinstance(response, list):
+                    response = response.pop(0) if len(response) > 1 else response[0]
+                if isinstance(response, int):
+                    self.send_response(response)
+                    self.end_headers()
+                    return
+                etag = '"%s"' % hashlib.sha1(response).hexdigest()[:16]
+                if self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(response)))
+                self.end_headers()
+                self.wfile.write(response)
+
+            def log_message(self, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+
+    def url(self, path):
+        return f"http://127.0.0.1:{self._httpd.server_port}{path}"
+
+    def hits(self, path):
+        return sum(1 for p, _ in self.requests if p == path)
+
+    def close(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+@pytest.fixture
+def http_server():
+    server = LocalServer()
+    yield server
+    server.close()
+
+
+def make_feed(advisories):
+    """
+    State Dept style RSS feed.
+        advisories: list of (country tag, title, link slug, summary text) tuples...the summary links to the tag's OSAC report
+    """
+    items = []
+    for tag, title, slug, summary in advisories:
+        description = f'<p>{summary}</p><p>Read the Country Security Report <a href="https://www.osac.gov/Content/Report/{tag}">OSAC</a></p>'
+        items.append(
+            f"<item><title>{escape(title)}</title>"
+            f"<link>https://travel.state.gov/content/travel/en/traveladvisories/traveladvisories/{slug}-travel-advisory.html</link>"
+            f'<category domain="Country-Tag">{tag}</category>'
+            f"<pubDate>Mon, 01 Sep 2025 00:00:00 GMT</pubDate>"
+            f"<description>{escape(description)}</description></item>"
+        )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?><rss version="2.0"><channel><title>travel.state.gov: Travel Advisories</title>'
+        + "".join(items) + "</channel></rss>"
+    ).encode("utf-8")
+
+
+ADVISORIES = [
+    ("FR", "France - Level 2: Exercise Increased Caution", "france", "Terrorism in France."),
+    ("SY", "Syria - Level 4: Do Not Travel", "syria", "Civil unrest in Syria."),
+    ("JA", "Japan - Level 1: Exercise Normal Precautions", "japan", "Normal precautions in Japan."),
+    ("AJ", "Azerbaijan - Level 2: Exercise Increased Caution", "azerbajian", "Unrest near the border."),
+]
+
+
+@pytest.fixture
+def feed():
+    return make_feed(ADVISORIES)
+
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+T_ORGS_CSV = os.path.join(REPO, "help", "example_datasets", "wfb_t_orgs_geolocated.csv")
+
+
+@pytest.fixture
+def t_orgs():
+    # The bundled geolocated t_orgs...one row per t_org (the CSV is exploded by country) with the t_org number as index
+    import pandas as pd
+
+    df = pd.read_csv(T_ORGS_CSV, index_col=0)
+    df = df[~df.index.duplicated()].drop(columns="country_aor")
+    return df
@@ -0,0 +1,21 @@
+import pytest
+
+import ostaGIS
+
+SAVED_HTML = "help/mapping_t_orgs/CIA_t_o.html"
+
+
+@pytest.fixture(autouse=True)
+def repo_root(monkeypatch, request):
+    monkeypatch.chdir(request.config.rootpath)
+
+
+@pytest.mark.parametrize("arrow_strings", [True, False])
+def test_wfb_tos_batch_text_columns_match_geoscraper(arrow_strings):
+    batch = ostaGIS.wfb_tos_batch([SAVED_HTML], snapshot_dates={SAVED_HTML: "2025-01-01"}, arrow_strings=arrow_strings)
+    single = ostaGIS.wfb_tos_geoscraper(SAVED_HTML, arrow_strings=arrow_strings)
+    expected = ostaGIS._arrow_str_dtype() if arrow_strings else object
+    # Same dtype (and missing value) as the text columns of the other functions
+    assert single["area of operation"].dtype == expected
+    for col in ["snapshot_source", "name", "history", "area of operation", "designation"]:
+        assert batch[col].dtype == expected
@@ -0,0 +1,27 @@
+import pandas as pd
+import pytest
+
+import ostaGIS
+
+
+@pytest.fixture
+def df():
+    return pd.DataFrame({
+        "area of operation": ["Syria, Iraq (north).", "Guinea-Bissau; Mali", "no countries here", None],
+        "group": ["a", "b", "c", "d"],
+    }, index=[10, 11, 12, 13])
+
+
+@pytest.mark.parametrize("arrow_strings", [True, False])
+def test_to_exploded_matches_explode_true(df, arrow_strings):
+    matches = ostaGIS.parse_country(df, "area of operation", "aor", output="compact", arrow_strings=arrow_strings)
+    exploded = ostaGIS.parse_country(df, "area of operation", "aor", explode=True, arrow_strings=arrow_strings)
+    pd.testing.assert_frame_equal(matches.to_exploded(df), exploded)
+    # The caller's text is left as it is
+    assert df["area of operation"][10] == "Syria, Iraq (north)."
+
+
+def test_to_lists_matches_explode_false(df):
+    matches = ostaGIS.parse_country(df, "area of operation", "aor", output="compact")
+    lists = ostaGIS.parse_country(df, "area of operation", "aor", explode=False)
+    assert matches.to_lists().tolist() == lists["aor"].tolist()
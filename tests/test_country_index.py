@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("pyarrow")
+
+import ostaGIS
+
+QUERIES = [
+    (["SYR", "IRQ"], "and"),
+    (["SYR", "LBN"], "or"),
+    (["SYR"], "or"),
+    (["syr", "ZZZ"], "or"),
+    (["SYR", "ZZZ"], "and"),
+]
+
+
+@pytest.fixture
+def lists(t_orgs):
+    return ostaGIS.parse_country(t_orgs, "area of operation", "country_aor", explode=False)
+
+
+def parse(t_orgs, lists, form):
+    if form == "lists":
+        return lists
+    output = "compact" if form == "compact" else "frame"
+    return ostaGIS.parse_country(t_orgs, "area of operation", "country_aor", output=output)
+
+
+@pytest.fixture(params=["exploded", "lists", "compact"])
+def data(request, t_orgs, lists):
+    return parse(t_orgs, lists, request.param)
+
+
+def brute_force(lists, countries, how):
+    wanted = {c.upper() for c in countries}
+    test = (lambda found: wanted & found) if how == "or" else (lambda found: wanted <= found)
+    return [i for i, codes in enumerate(lists["country_aor"]) if test(set(codes))]
+
+
+@pytest.mark.parametrize("countries, how", QUERIES)
+def test_query_equals_brute_force(data, lists, tmp_path, countries, how):
+    index = ostaGIS.build_country_index(data, str(tmp_path / "index"))
+    assert len(index) == len(lists)
+    assert index.query(countries, how).tolist() == brute_force(lists, countries, how)
+
+
+def test_and_or_counts(lists, tmp_path):
+    index = ostaGIS.build_country_index(lists, str(tmp_path / "index"))
+    assert len(index.query(["SYR", "IRQ"], how="and")) == 6
+    assert len(index.query(["SYR", "LBN"], how="or")) == 21
+    with pytest.raises(Exception, match="how param"):
+        index.query(["SYR"], how="xor")
+
+
+@pytest.mark.parametrize("form", ["exploded", "lists"])
+@pytest.mark.parametrize("how", ["and", "or"])
+def test_search_rows(t_orgs, lists, tmp_path, form, how):
+    ostaGIS.build_country_index(parse(t_orgs, lists, form), str(tmp_path / "index"))
+
+    # Reopened from disk...the postings are memory mapped and the rows come from the Arrow file
+    index = ostaGIS.CountryIndex(str(tmp_path / "index"))
+    assert isinstance(index._postings, np.memmap)
+    found = index.search(["SYR", "IRQ"], how=how)
+    expected = lists.iloc[brute_force(lists, ["SYR", "IRQ"], how)]
+    assert found.index.equals(expected.index)
+    assert found["area of operation"].tolist() == expected["area of operation"].tolist()
+    assert [list(codes) for codes in found["country_aor"]] == expected["country_aor"].tolist()
+    assert index.rows([0, 5], columns=["index"]).columns.tolist() == ["index"]
+
+
+def test_reopen_from_disk(lists, tmp_path):
+    path = str(tmp_path / "index")
+    built = ostaGIS.build_country_index(lists, path)
+    index = ostaGIS.CountryIndex(path)
+    assert index.countries == built.countries
+    assert len(index) == len(built) == len(lists)
+    for code in ["SYR", "IRQ", "LBN", "ZZZ"]:
+        assert index.lookup(code).tolist() == built.lookup(code).tolist()
+        assert index.count(code) == len(brute_force(lists, [code], "or"))
+
+
+def test_compact_index_has_no_rows(t_orgs, tmp_path):
+    matches = ostaGIS.parse_country(t_orgs, "area of operation", "country_aor", output="compact")
+    index = ostaGIS.build_country_index(matches, str(tmp_path / "index"))
+    with pytest.raises(Exception, match="has no rows"):
+        index.rows([0])
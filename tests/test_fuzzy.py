@@ -0,0 +1,53 @@
+import pandas as pd
+import pytest
+
+import ostaGIS
+
+
+@pytest.fixture(scope="module")
+def resolver():
+    return ostaGIS.FuzzyCountryResolver()
+
+
+@pytest.mark.parametrize("name", ["Union", "Islands", "Republic", "Guinea"])
+def test_generic_words_are_unmatched(resolver, name):
+    assert resolver.resolve(name)[0] is None
+
+
+@pytest.mark.parametrize("name", ["Indian", "Syrian", "Palestinian", "Iraqi"])
+def test_demonyms_are_unmatched(resolver, name):
+    assert resolver.resolve(name)[0] is None
+
+
+def test_name_of_two_countries_is_unmatched(resolver):
+    assert resolver.resolve("Congo")[0] is None
+
+
+def test_close_runner_up_is_unmatched():
+    resolver = ostaGIS.FuzzyCountryResolver(aliases={"Azerbaijanx": "ARM"})
+    assert resolver.resolve("Azerbajian")[0] is None
+
+
+def test_threshold_is_strict(resolver):
+    iso, score = resolver.resolve("Isreal")
+    assert iso == "ISR"
+    assert resolver.resolve("Isreal", threshold=score) == (None, score)
+
+
+@pytest.mark.parametrize("name, iso", [
+    ("Azerbajian", "AZE"), ("Afganistan", "AFG"), ("Phillipines", "PHL"),
+    ("Venezuala", "VEN"), ("congo-republic-of-the", "COG"),
+])
+def test_misspellings_still_match(resolver, name, iso):
+    assert resolver.resolve(name)[0] == iso
+
+
+def test_parse_country_fuzzy_adds_only_misspellings():
+    df = pd.DataFrame({"text": [
+        "Attacks by Indian and Syrian cells",
+        "Palestinian groups active along the Congo river and in the Union",
+        "Cells based in Afganistan",
+    ]})
+    exact = ostaGIS.parse_country(df, "text", "aor", explode=False)["aor"].tolist()
+    fuzzy = ostaGIS.parse_country(df, "text", "aor", explode=False, fuzzy=0.8)["aor"].tolist()
+    assert fuzzy == exact[:2] + [sorted(exact[2] + ["AFG"])]
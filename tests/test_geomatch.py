@@ -0,0 +1,131 @@
+import pandas as pd
+import pytest
+
+gpd = pytest.importorskip("geopandas")
+pyogrio = pytest.importorskip("pyogrio")
+from shapely.geometry import box
+
+import ostaGIS
+from tests.conftest import T_ORGS_CSV
+
+
+@pytest.fixture
+def countries_gpkg(tmp_path):
+    # Temporary GeoPackage of three country squares...'NAME' collides with the table's name column below
+    countries = gpd.GeoDataFrame(
+        {"ISO_CC": ["FRA", "DEU", "ITA"], "NAME": ["X", "X", "X"]},
+        geometry=[box(0, 0, 1, 1), box(2, 0, 3, 1), box(4, 0, 5, 1)],
+        crs="EPSG:4326",
+    )
+    path = tmp_path / "countries.gpkg"
+    countries.to_file(path, driver="GPKG")
+    return str(path)
+
+
+@pytest.fixture
+def table():
+    return pd.DataFrame({
+        "NAME": ["org a", "org a", "org b", "org c"],
+        "country_aor": ["FRA", "DEU", "DEU", "ITA"],
+    })
+
+
+def layer_counts(path):
+    return {name: len(gpd.read_file(path, layer=name)) for name, _ in pyogrio.list_layers(path)}
+
+
+def test_layers_per_name(countries_gpkg, table, tmp_path):
+    out = str(tmp_path / "mult.gpkg")
+    ostaGIS.geomatch_and_multiply(countries_gpkg, table.rename(columns={"NAME": "index"}), "index", out_gdb=out, backend="geopandas")
+    assert layer_counts(out) == {"countries_multiplied": 4, "org_a": 2, "org_b": 1, "org_c": 1}
+    # Each layer holds that name's rows with the geometry of their country
+    org_a = gpd.read_file(out, layer="org_a")
+    assert sorted(org_a["ISO_CC"]) == ["DEU", "FRA"]
+    assert set(org_a["index"]) == {"org a"}
+    org_c = gpd.read_file(out, layer="org_c")
+    assert org_c["ISO_CC"].tolist() == ["ITA"]
+    assert org_c.geometry.iloc[0].bounds == (4.0, 0.0, 5.0, 1.0)
+
+
+def test_colliding_name_col_partitions_on_table_values(countries_gpkg, table, tmp_path):
+    out = str(tmp_path / "mult.gpkg")
+    ostaGIS.geomatch_and_multiply(countries_gpkg, table, "NAME", out_gdb=out, backend="geopandas")
+    assert layer_counts(out) == {"countries_multiplied": 4, "org_a": 2, "org_b": 1, "org_c": 1}
+    org_b = gpd.read_file(out, layer="org_b")
+    assert org_b["NAME_1"].tolist() == ["org b"]
+    assert org_b["NAME"].tolist() == ["X"]
+
+
+def test_colliding_name_col_parquet_and_read_multiplied(countries_gpkg, table, tmp_path):
+    out = str(tmp_path / "mult.parquet")
+    ostaGIS.geomatch_and_multiply(countries_gpkg, table, "NAME", out_gdb=out, backend="geopandas")
+    assert sorted(p.name for p in (tmp_path / "mult_individual_fc").iterdir()) == ["org_a.parquet", "org_b.parquet", "org_c.parquet"]
+    assert len(ostaGIS.read_multiplied(out, name="org a", name_col="NAME")) == 2
+
+
+def sorted_rows(gdf):
+    # Row order of a view depends on the join...compare the rows sorted by their attributes
+    fields = [c for c in gdf.columns if c != gdf.geometry.name]
+    return gdf.sort_values(fields).reset_index(drop=True)
+
+
+def assert_same_rows(left, right):
+    left, right = sorted_rows(left), sorted_rows(right)
+    assert left.columns.tolist() == right.columns.tolist()
+    pd.testing.assert_frame_equal(pd.DataFrame(left.drop(columns=left.geometry.name)), pd.DataFrame(right.drop(columns=right.geometry.name)))
+    assert left.geometry.geom_equals(right.geometry).all()
+    assert left.crs == right.crs
+
+
+@pytest.mark.parametrize("name_col", ["NAME", "index"])
+def test_normalized_views_equal_multiplied(countries_gpkg, table, tmp_path, name_col):
+    table = table.rename(columns={"NAME": name_col})
+    table.loc[len(table)] = ["org d", None]
+    multiplied, normalized = str(tmp_path / "mult.gpkg"), str(tmp_path / "norm.gpkg")
+    ostaGIS.geomatch_and_multiply(countries_gpkg, table, name_col, out_gdb=multiplied, backend="geopandas")
+    ostaGIS.geomatch_and_multiply(countries_gpkg, table, name_col, out_gdb=normalized, backend="geopandas", output_mode="normalized")
+
+    views = layer_counts(normalized)
+    assert views == {"countries": 3, "countries_links": 4, **layer_counts(multiplied)}
+    for layer in layer_counts(multiplied):
+        assert_same_rows(gpd.read_file(multiplied, layer=layer), gpd.read_file(normalized, layer=layer))
+
+
+@pytest.mark.parametrize("ext", ["gpkg", "parquet"])
+@pytest.mark.parametrize("output_mode", ["multiplied", "normalized"])
+def test_read_multiplied_round_trip(countries_gpkg, table, tmp_path, ext, output_mode):
+    reference = str(tmp_path / "reference.gpkg")
+    ostaGIS.geomatch_and_multiply(countries_gpkg, table, "NAME", out_gdb=reference, backend="geopandas")
+    expected = gpd.read_file(reference, layer="countries_multiplied")
+
+    out = str(tmp_path / f"out.{ext}")
+    ostaGIS.geomatch_and_multiply(countries_gpkg, table, "NAME", out_gdb=out, backend="geopandas", output_mode=output_mode)
+    assert_same_rows(ostaGIS.read_multiplied(out), expected)
+    org_a = ostaGIS.read_multiplied(out, name="org a", name_col="NAME")
+    assert_same_rows(org_a, expected[expected["NAME_1"] == "org a"])
+    assert sorted(org_a["ISO_CC"]) == ["DEU", "FRA"]
+
+
+def test_bundled_t_orgs(tmp_path):
+    # One square per country of the bundled geolocated t_orgs...the CSV path is the table
+    t_orgs = pd.read_csv(T_ORGS_CSV, index_col=0)
+    codes = sorted(t_orgs["country_aor"].unique())
+    countries = gpd.GeoDataFrame({"ISO_CC": codes}, geometry=[box(i, 0, i + 1, 1) for i in range(len(codes))], crs="EPSG:4326")
+    out = str(tmp_path / "t_orgs.gpkg")
+    ostaGIS.geomatch_and_multiply(countries, T_ORGS_CSV, "index", out_gdb=out, backend="geopandas")
+
+    counts = layer_counts(out)
+    assert counts.pop("countries_multiplied") == len(t_orgs) == 262
+    sizes = t_orgs.groupby("index", sort=False).size()
+    taken = {"countries_multiplied"}
+    assert counts == {ostaGIS.layer_name(name, taken): n for name, n in sizes.items()}
+    assert len(counts) == 74
+
+    mult = gpd.read_file(out, layer="countries_multiplied")
+    # The CSV's unnamed first column (the t_org number) is read as a field like any other
+    assert mult.columns.tolist() == ["ISO_CC", "Unnamed: 0", "index", "area of operation", "country_aor", "geometry"]
+    assert sorted(mult["Unnamed: 0"].unique()) == sorted(t_orgs.index.unique())
+    assert (mult["ISO_CC"] == mult["country_aor"]).all()
+    assert (mult.geometry.bounds["minx"] == mult["ISO_CC"].map(codes.index)).all()
+    aab = gpd.read_file(out, layer=ostaGIS.layer_name("Abdallah Azzam Brigades (AAB)"))
+    assert sorted(aab["country_aor"]) == ["LBN", "PSE", "SYR"]
@@ -0,0 +1,48 @@
+import pandas as pd
+import pytest
+
+import ostaGIS
+
+COL = "area of operation"
+
+
+@pytest.fixture(scope="module")
+def matcher():
+    return ostaGIS.CountryMatcher()
+
+
+@pytest.mark.parametrize("text, codes", [
+    ("Democratic Republic of the Congo", ["COD"]),
+    ("Republic of the Congo", ["COG"]),
+    ("Saudi Arabia", ["SAU"]),
+    ("Sri Lanka", ["LKA"]),
+    ("El Salvador", ["SLV"]),
+    ("Guinea-Bissau and Guinea", ["GIN", "GNB"]),
+    ("Papua New Guinea", ["PNG"]),
+    ("South Sudan and Sudan", ["SDN", "SSD"]),
+    ("Niger and Nigeria", ["NER", "NGA"]),
+])
+def test_multi_word_and_overlapping_names(matcher, text, codes):
+    assert matcher.codes(text) == codes
+
+
+def test_longest_phrase_wins_with_spans(matcher):
+    text = "Raids in Saudi Arabia and Guinea-Bissau"
+    assert matcher.find(text) == [("SAU", 9, 21), ("GNB", 26, 39)]
+    assert text[9:21] == "Saudi Arabia"
+
+
+def test_matcher_differs_from_batch_only_on_multi_word_names(t_orgs):
+    batch = ostaGIS.parse_country(t_orgs, COL, "aor", explode=False)["aor"]
+    matcher = ostaGIS.parse_country(t_orgs, COL, "aor", explode=False, engine="matcher")["aor"]
+    added = {i: sorted(set(m) - set(b)) for i, b, m in zip(t_orgs.index, batch, matcher) if set(m) - set(b)}
+    dropped = {i: sorted(set(b) - set(m)) for i, b, m in zip(t_orgs.index, batch, matcher) if set(b) - set(m)}
+    # The word by word engines miss Saudi Arabia, Sri Lanka and El Salvador, and read the DRC as the Republic of the Congo
+    assert added == {6: ["SAU"], 43: ["COD", "LKA", "SAU"], 53: ["SLV"], 56: ["LKA"]}
+    assert dropped == {43: ["COG"]}
+
+
+def test_matcher_engine_handles_missing_text():
+    df = pd.DataFrame({"text": ["Camps in Sri Lanka", None, ""]}, index=["a", "b", "c"])
+    out = ostaGIS.parse_country(df, "text", "aor", explode=False, engine="matcher")
+    assert out["aor"].tolist() == [["LKA"], [], []]
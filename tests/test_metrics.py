@@ -0,0 +1,91 @@
+import json
+import logging
+import re
+
+import pandas as pd
+import pytest
+
+import ostaGIS
+
+PARSE = (("function", "parse_country"),)
+
+# One sample line of the Prometheus text format...name{label="value",...} number
+SAMPLE = re.compile(r'^[a-zA-Z_:][a-zA-Z0-9_:]*(\{[a-zA-Z_][a-zA-Z0-9_]*="(?:[^"\\\n]|\\.)*"(,[a-zA-Z_][a-zA-Z0-9_]*="(?:[^"\\\n]|\\.)*")*\})? -?[0-9.e+-]+$')
+
+
+@pytest.fixture
+def df():
+    return pd.DataFrame({"text": ["Attacks in Syria", "Cells in Iraq and Iran", "Raids in Mali", None]})
+
+
+def test_parse_country_spans_and_counters(df):
+    ostaGIS.parse_country(df, "text", "aor")
+    with ostaGIS.instrument() as metrics:
+        ostaGIS.parse_country(df, "text", "aor")
+
+    assert set(metrics.spans) == {("parse_country.match", (("engine", "batch"),)), ("parse_country.explode", ())}
+    assert all(n == 1 and seconds > 0 for n, seconds in metrics.spans.values())
+    assert metrics.counters == {
+        ("rows_processed", PARSE): 4,
+        ("tokens_matched", PARSE): 4,
+        ("not_found", PARSE): 1,
+    }
+    summary = metrics.summary()
+    assert summary["counters"] == {"rows_processed": 4, "tokens_matched": 4, "not_found": 1}
+    assert summary["spans"]["parse_country.match"]["count"] == 1
+
+
+def test_remove_collector_stops_recording(df):
+    metrics = ostaGIS.add_collector(ostaGIS.MetricsCollector())
+    ostaGIS.parse_country(df, "text", "aor")
+    ostaGIS.remove_collector(metrics)
+    ostaGIS.parse_country(df, "text", "aor")
+    assert metrics.counters[("rows_processed", PARSE)] == 4
+    assert all(n == 1 for n, _ in metrics.spans.values())
+
+    # The collector of instrument() is removed when the block exits
+    with ostaGIS.instrument() as metrics:
+        pass
+    ostaGIS.parse_country(df, "text", "aor")
+    assert metrics.spans == {} and metrics.counters == {}
+
+
+def test_prometheus_is_well_formed(df):
+    with ostaGIS.instrument() as metrics:
+        ostaGIS.parse_country(df, "text", "aor")
+        ostaGIS._count("bytes_written", 10, path='C:\\out\\"a".csv\n')
+    text = metrics.prometheus()
+
+    assert text.endswith("\n")
+    typed = {}
+    for line in text.splitlines():
+        if line.startswith("# TYPE "):
+            _, _, family, kind = line.split(" ")
+            assert kind in ("summary", "counter") and family not in typed
+            typed[family] = kind
+            continue
+        assert SAMPLE.match(line), line
+        name = line.split("{")[0].split(" ")[0]
+        # Every sample follows the TYPE line of its family
+        family = re.sub(r"_(sum|count)$", "", name) if name.startswith("ostagis_stage_seconds") else name
+        assert family == list(typed)[-1]
+    assert typed == {
+        "ostagis_stage_seconds": "summary",
+        "ostagis_bytes_written_total": "counter",
+        "ostagis_not_found_total": "counter",
+        "ostagis_rows_processed_total": "counter",
+        "ostagis_tokens_matched_total": "counter",
+    }
+    assert 'ostagis_rows_processed_total{function="parse_country"} 4\n' in text
+    assert 'ostagis_bytes_written_total{path="C:\\\\out\\\\\\"a\\".csv\\n"} 10\n' in text
+    assert 'ostagis_stage_seconds_count{stage="parse_country.match",engine="batch"} 1\n' in text
+
+
+def test_logger_writes_json_lines(df, caplog):
+    logger = logging.getLogger("ostagis.test_metrics")
+    with caplog.at_level(logging.INFO, logger=logger.name):
+        with ostaGIS.instrument(ostaGIS.MetricsCollector(logger=logger)):
+            ostaGIS.parse_country(df, "text", "aor")
+    records = [json.loads(r.getMessage()) for r in caplog.records]
+    assert {"event": "count", "name": "rows_processed", "value": 4, "function": "parse_country"} in records
+    assert {r["stage"] for r in records if r["event"] == "span"} == {"parse_country.match", "parse_country.explode"}
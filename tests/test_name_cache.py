@@ -0,0 +1,25 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+import pytest
+
+import ostaGIS
+
+
+@pytest.fixture
+def name_cache(tmp_path):
+    cache = ostaGIS.use_name_cache(str(tmp_path / "names.sqlite"))
+    yield cache
+    ostaGIS.use_name_cache(None)
+
+
+def test_spawn_workers_use_the_name_cache(name_cache):
+    df = pd.DataFrame({"text": ["Attacks in Syria", "Cells in Iraq and Iran", "Raids in Mali", "Camps in Niger"]})
+    serial = ostaGIS.parse_country(df, "text", "aor", explode=False)["aor"].tolist()
+    name_cache.clear()
+
+    with ProcessPoolExecutor(max_workers=2, mp_context=multiprocessing.get_context("spawn")) as pool:
+        parallel = ostaGIS.parse_country(df, "text", "aor", explode=False, n_jobs=2, executor=pool)["aor"].tolist()
+    assert parallel == serial
+    assert len(name_cache) > 0
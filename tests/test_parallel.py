@@ -0,0 +1,40 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+import pytest
+
+import ostaGIS
+
+COL = "area of operation"
+
+
+@pytest.fixture
+def t_orgs_gaps(t_orgs):
+    # A None cell and a non-range index
+    df = t_orgs.copy()
+    df[COL] = df[COL].astype(object)
+    df.iloc[5, df.columns.get_loc(COL)] = None
+    df.index = [f"org{i}" for i in df.index]
+    return df
+
+
+@pytest.mark.parametrize("engine", ["batch", "rowwise", "matcher"])
+def test_n_jobs_equals_serial(t_orgs_gaps, engine):
+    serial = ostaGIS.parse_country(t_orgs_gaps, COL, "aor", engine=engine)
+    parallel = ostaGIS.parse_country(t_orgs_gaps, COL, "aor", engine=engine, n_jobs=2)
+    pd.testing.assert_frame_equal(parallel, serial)
+
+
+@pytest.mark.parametrize("engine", ["batch", "rowwise", "matcher"])
+def test_executor_equals_serial(t_orgs_gaps, engine):
+    serial = ostaGIS.parse_country(t_orgs_gaps, COL, "aor", explode=False, engine=engine)
+    with ProcessPoolExecutor(max_workers=2) as pool:
+        parallel = ostaGIS.parse_country(t_orgs_gaps, COL, "aor", explode=False, engine=engine, executor=pool)
+    pd.testing.assert_frame_equal(parallel, serial)
+
+
+@pytest.mark.parametrize("n_jobs", [0, True, -2, 1.5])
+def test_bad_n_jobs_raises(n_jobs):
+    df = pd.DataFrame({"text": ["Attacks in Syria"]})
+    with pytest.raises(Exception, match="n_jobs param"):
+        ostaGIS.parse_country(df, "text", "aor", n_jobs=n_jobs)
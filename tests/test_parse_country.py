@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import ostaGIS
+from tests.conftest import T_ORGS_CSV
+
+COL = "area of operation"
+
+
+@pytest.fixture
+def t_orgs_gaps(t_orgs):
+    # Missing text (None and NaN) and a non-range index
+    df = t_orgs.copy()
+    df[COL] = df[COL].astype(object)
+    df.iloc[3, df.columns.get_loc(COL)] = None
+    df.iloc[10, df.columns.get_loc(COL)] = np.nan
+    df.index = df.index * 10 + 7
+    return df
+
+
+def test_batch_matches_the_bundled_geolocated_csv(t_orgs):
+    # The bundled CSV is the output of the original parse_country...one row per t_org per country
+    expected = pd.read_csv(T_ORGS_CSV, index_col=0)["country_aor"]
+    out = ostaGIS.parse_country(t_orgs, COL, "country_aor")
+    assert out["country_aor"].tolist() == expected.tolist()
+    assert out.index.tolist() == expected.index.tolist()
+
+
+@pytest.mark.parametrize("explode", [True, False])
+def test_batch_equals_rowwise(t_orgs, explode):
+    batch = ostaGIS.parse_country(t_orgs, COL, "aor", explode=explode, engine="batch")
+    rowwise = ostaGIS.parse_country(t_orgs, COL, "aor", explode=explode, engine="rowwise")
+    pd.testing.assert_frame_equal(batch, rowwise)
+
+
+@pytest.mark.parametrize("explode", [True, False])
+def test_batch_equals_rowwise_with_missing_text(t_orgs_gaps, explode):
+    batch = ostaGIS.parse_country(t_orgs_gaps, COL, "aor", explode=explode, engine="batch")
+    rowwise = ostaGIS.parse_country(t_orgs_gaps, COL, "aor", explode=explode, engine="rowwise")
+    pd.testing.assert_frame_equal(batch, rowwise)
+    assert batch.index.unique().tolist() == t_orgs_gaps.index.tolist()
+    if not explode:
+        assert batch["aor"].iloc[3] == [] and batch["aor"].iloc[10] == []
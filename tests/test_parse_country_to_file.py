@@ -0,0 +1,48 @@
+import os
+
+import pandas as pd
+import pytest
+
+pq = pytest.importorskip("pyarrow.parquet")
+
+import ostaGIS
+
+
+@pytest.fixture
+def drifting_csv(tmp_path):
+    # 'note' is empty in the first chunk (read as float NaN) and text later...'count' is int then float (a missing value)
+    path = tmp_path / "source.csv"
+    path.write_text(
+        "text,note,count\n"
+        "Attacks in Syria,,1\n"
+        "Raids in Mali,,2\n"
+        "Camps in Niger,moved,3\n"
+        "Cells in Iraq,,\n"
+    )
+    return str(path)
+
+
+@pytest.mark.parametrize("explode", [True, False])
+def test_drifting_columns_are_written(drifting_csv, tmp_path, explode):
+    out = str(tmp_path / "out.parquet")
+    rows = ostaGIS.parse_country_to_file(drifting_csv, out, "text", "aor", chunksize=2, explode=explode)
+
+    written = pq.read_table(out).to_pandas()
+    assert rows == len(written) == 4
+    assert written["note"].isna().tolist() == [True, True, False, True]
+    assert written["note"][2] == "moved"
+    assert written["count"].tolist()[:3] == [1, 2, 3]
+    assert written["count"].isna().tolist() == [False, False, False, True]
+    aor = written["aor"].tolist() if explode else [list(codes) for codes in written["aor"]]
+    assert aor == (["SYR", "MLI", "NER", "IRQ"] if explode else [["SYR"], ["MLI"], ["NER"], ["IRQ"]])
+
+
+def test_failed_write_leaves_no_file(tmp_path):
+    out = str(tmp_path / "out.parquet")
+    chunks = [
+        pd.DataFrame({"text": ["Attacks in Syria"], "code": [1]}),
+        pd.DataFrame({"text": ["Raids in Mali"], "code": ["not a number"]}),
+    ]
+    with pytest.raises(Exception, match="'code'"):
+        ostaGIS.parse_country_to_file(iter(chunks), out, "text", "aor")
+    assert os.listdir(tmp_path) == []
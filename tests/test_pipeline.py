@@ -0,0 +1,55 @@
+import os
+
+import pandas as pd
+import pytest
+
+import ostaGIS
+
+calls = []
+
+
+def make_frame(n):
+    calls.append(n)
+    return pd.DataFrame({"n": range(n)})
+
+
+def make_file(n, out_path):
+    calls.append(n)
+    with open(out_path, "w") as file:
+        file.write(str(n))
+    return out_path
+
+
+@pytest.fixture(autouse=True)
+def reset_calls():
+    calls.clear()
+
+
+def test_export_creates_missing_parent_folder(tmp_path):
+    export = tmp_path / "exports" / "nested" / "frame.csv"
+    pipe = ostaGIS.Pipeline(cache_dir=str(tmp_path / "cache"))
+    pipe.stage("frame", make_frame, params={"n": 3}, export=str(export))
+    pipe.run()
+    assert pd.read_csv(export)["n"].tolist() == [0, 1, 2]
+
+
+def test_failed_export_is_not_cached_and_retried(tmp_path):
+    blocker = tmp_path / "blocker"
+    blocker.write_text("a file where the export folder should be")
+    pipe = ostaGIS.Pipeline(cache_dir=str(tmp_path / "cache"))
+    pipe.stage("file", make_file, params={"n": 2, "out_path": "n.txt"}, output="out_path", export=str(blocker / "out"))
+    with pytest.raises(OSError):
+        pipe.run()
+    assert os.listdir(tmp_path / "cache" / "artifacts") == []
+
+    blocker.unlink()
+    pipe.run()
+    assert calls == [2, 2]
+    assert (blocker / "out" / "n.txt").read_text() == "2"
+
+    # Cached now...a deleted export is copied back without running the stage again
+    (blocker / "out" / "n.txt").unlink()
+    os.rmdir(blocker / "out")
+    pipe.run()
+    assert calls == [2, 2]
+    assert (blocker / "out" / "n.txt").read_text() == "2"
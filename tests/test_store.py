@@ -0,0 +1,39 @@
+import pandas as pd
+import pytest
+
+import ostaGIS
+
+
+@pytest.mark.parametrize("engine", ["batch", "matcher"])
+@pytest.mark.parametrize("suffix", [".sqlite", ".parquet"])
+def test_stored_runs_equal_uncached_run(t_orgs, tmp_path, engine, suffix):
+    store = str(tmp_path / f"matches{suffix}")
+    for explode in (True, False):
+        expected = ostaGIS.parse_country(t_orgs, "area of operation", "aor", explode=explode, engine=engine)
+        cold = ostaGIS.parse_country(t_orgs, "area of operation", "aor", explode=explode, engine=engine, store=store)
+        warm = ostaGIS.parse_country(t_orgs, "area of operation", "aor", explode=explode, engine=engine, store=store)
+        pd.testing.assert_frame_equal(cold, expected)
+        pd.testing.assert_frame_equal(warm, expected)
+
+
+@pytest.mark.parametrize("suffix", [".sqlite", ".parquet"])
+def test_changed_text_is_matched_again(tmp_path, suffix):
+    store = str(tmp_path / f"matches{suffix}")
+    df = pd.DataFrame({"text": ["Attacks in Syria", "Raids in Mali", None]}, index=[5, 7, 9])
+    ostaGIS.parse_country(df, "text", "aor", explode=False, store=store)
+
+    df.loc[7, "text"] = "Raids in Niger"
+    with ostaGIS.instrument() as metrics:
+        out = ostaGIS.parse_country(df, "text", "aor", explode=False, store=store)
+    assert out["aor"].tolist() == [["SYR"], ["NER"], []]
+    # Only the changed row is matched...the other two come from the store
+    assert metrics.counters[("cache_hits", (("function", "parse_country"),))] == 2
+
+
+def test_store_is_emptied_when_the_engine_changes(tmp_path):
+    store = str(tmp_path / "matches.sqlite")
+    df = pd.DataFrame({"text": ["Riyadh, Saudi Arabia"]})
+    batch = ostaGIS.parse_country(df, "text", "aor", explode=False, store=store)["aor"].tolist()
+    matcher = ostaGIS.parse_country(df, "text", "aor", explode=False, engine="matcher", store=store)["aor"].tolist()
+    assert matcher == ostaGIS.parse_country(df, "text", "aor", explode=False, engine="matcher")["aor"].tolist()
+    assert batch == ostaGIS.parse_country(df, "text", "aor", explode=False)["aor"].tolist()
@@ -0,0 +1,168 @@
+import copy
+
+import pytest
+
+import ostaGIS
+
+# Stand-ins for the arcpy.mp Map/Layer objects and CIM classes used by apply_style_to_gp_lyr...only the class names,
+# attributes and methods it touches
+
+
+class CIMRGBColor:
+    def __init__(self, values):
+        self.values = values
+
+
+class CIMSolidFill:
+    def __init__(self, values):
+        self.color = CIMRGBColor(values)
+
+
+class CIMSolidStroke:
+    def __init__(self, values):
+        self.color = CIMRGBColor(values)
+
+
+class CIMPolygonSymbol:
+    def __init__(self, style):
+        self.style = style
+        self.symbolLayers = [CIMSolidStroke([0, 0, 0, 100]), CIMSolidFill([130, 130, 130, 100])]
+
+
+class CIMSymbolReference:
+    def __init__(self, symbol):
+        self.symbol = symbol
+
+
+class CIMSimpleRenderer:
+    def __init__(self, symbol):
+        self.symbol = CIMSymbolReference(symbol)
+
+
+class Definition:
+    def __init__(self, renderer):
+        self.renderer = renderer
+
+
+class Gallery:
+    calls = []
+
+
+class SymbolProxy:
+    def __init__(self, layer):
+        self.layer = layer
+
+    def applySymbolFromGallery(self, name):
+        Gallery.calls.append((self.layer.name, name))
+        self.layer.pending = CIMSimpleRenderer(CIMPolygonSymbol(name))
+
+
+class Renderer:
+    def __init__(self, layer):
+        self.symbol = SymbolProxy(layer)
+
+
+class Symbology:
+    def __init__(self, layer):
+        self.renderer = Renderer(layer)
+
+    def updateRenderer(self, kind):
+        pass
+
+
+class Layer:
+    isGroupLayer = False
+
+    def __init__(self, name):
+        self.name = name
+        self.definition = Definition(CIMSimpleRenderer(CIMPolygonSymbol("default")))
+        self.pending = None
+        self.sets = 0
+
+    @property
+    def symbology(self):
+        return Symbology(self)
+
+    @symbology.setter
+    def symbology(self, value):
+        if self.pending is not None:
+            self.definition.renderer = self.pending
+
+    def getDefinition(self, version):
+        return copy.deepcopy(self.definition)
+
+    def setDefinition(self, definition):
+        self.definition = definition
+        self.sets += 1
+
+    @property
+    def symbol(self):
+        return self.definition.renderer.symbol.symbol
+
+
+class GroupLayer(Layer):
+    isGroupLayer = True
+
+    def __init__(self, name, layers):
+        super().__init__(name)
+        self.layers = layers
+
+    def listLayers(self):
+        return self.layers
+
+
+class Map:
+    def __init__(self, layers):
+        self.layers = layers
+
+    def listLayers(self):
+        found = []
+        for layer in self.layers:
+            found.append(layer)
+            if layer.isGroupLayer:
+                found.extend(layer.listLayers())
+        return found
+
+
+@pytest.fixture
+def groups():
+    Gallery.calls = []
+    return GroupLayer("orgs_a", [Layer(f"a{i}") for i in range(50)]), GroupLayer("orgs_b", [Layer(f"b{i}") for i in range(20)])
+
+
+def test_one_gallery_lookup_per_style(groups):
+    orgs_a, orgs_b = groups
+    basemap = Layer("basemap")
+    m = Map([basemap, orgs_a, Layer("countries"), orgs_b])
+
+    ostaGIS.apply_style_to_gp_lyr(["orgs_a", "orgs_b"], "Hollow", colors=[[255, 0, 0], [0, 0, 255, 50]], m=m)
+    assert Gallery.calls == [("a0", "Hollow")]
+
+    layers = orgs_a.layers + orgs_b.layers
+    assert all(layer.symbol.style == "Hollow" for layer in layers)
+    assert all(layer.sets == 1 for layer in layers)
+    # Colors are used in turn on the fill only
+    assert [layer.symbol.symbolLayers[1].color.values for layer in layers[:3]] == [[255, 0, 0, 100], [0, 0, 255, 50], [255, 0, 0, 100]]
+    assert layers[0].symbol.symbolLayers[0].color.values == [0, 0, 0, 100]
+    # Each layer has its own symbol...coloring one does not change the others
+    assert layers[0].symbol is not layers[2].symbol
+    assert basemap.symbol.style == "default"
+
+    ostaGIS.apply_style_to_gp_lyr("orgs_b", "Red", m=m)
+    assert Gallery.calls == [("a0", "Hollow"), ("b0", "Red")]
+    assert all(layer.symbol.style == "Red" for layer in orgs_b.layers)
+    assert all(layer.symbol.style == "Hollow" for layer in orgs_a.layers)
+
+
+def test_dict_colors_by_layer_name(groups):
+    orgs_a, _ = groups
+    ostaGIS.apply_style_to_gp_lyr("orgs_a", "Hollow", colors={"a1": [1, 2, 3]}, m=Map([orgs_a]))
+    assert orgs_a.layers[1].symbol.symbolLayers[1].color.values == [1, 2, 3, 100]
+    assert orgs_a.layers[2].symbol.symbolLayers[1].color.values == [130, 130, 130, 100]
+
+
+def test_missing_group_layer(groups):
+    orgs_a, _ = groups
+    with pytest.raises(Exception, match="No Group Layer Found"):
+        ostaGIS.apply_style_to_gp_lyr(["orgs_a", "nope"], "Hollow", m=Map([orgs_a]))
+    assert Gallery.calls == []
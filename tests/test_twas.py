@@ -0,0 +1,141 @@
+import os
+
+import pandas as pd
+
+import ostaGIS
+from tests.conftest import ADVISORIES, make_feed
+
+
+def test_split_on_words_packs_greedily():
+    words = [("word%d" % i) * (1 + i % 5) for i in range(3000)]
+    text = " ".join(words)
+    chunks = ostaGIS._split_on_words(text, 3000)
+    assert " ".join(chunks) == text
+    assert all(len(c) <= 3000 for c in chunks)
+    # Each run is closed only when the next word would not fit
+    for chunk, following in zip(chunks, chunks[1:]):
+        assert len(chunk) + 1 + len(following.split()[0]) > 3000
+    assert len(chunks) == -(-len(text) // 3000)
+
+
+def test_split_on_words_cuts_words_over_the_limit():
+    assert ostaGIS._split_on_words("ab " + "x" * 7 + " cd", 3) == ["ab", "xxx", "xxx", "x", "cd"]
+
+
+def test_feed_not_modified_is_skipped(http_server, feed, tmp_path):
+    http_server.routes["/feed.xml"] = feed
+    url = http_server.url("/feed.xml")
+    cache_dir = str(tmp_path / "cache")
+
+    first = ostaGIS.state_dept_twas(cache_dir=cache_dir, url=url)
+    assert first["ISO3_CODE"].tolist() == ["AZE", "FRA", "JPN", "SYR"]
+    assert "If-None-Match" not in http_server.requests[0][1]
+
+    # Unchanged feed...the cached ETag is sent, the server answers 304 and nothing is processed
+    assert ostaGIS.state_dept_twas(cache_dir=cache_dir, url=url) is None
+    assert http_server.requests[1][1]["If-None-Match"].startswith('"')
+
+    # Changed feed...processed again
+    http_server.routes["/feed.xml"] = make_feed(ADVISORIES[:2])
+    assert ostaGIS.state_dept_twas(cache_dir=cache_dir, url=url)["ISO3_CODE"].tolist() == ["FRA", "SYR"]
+
+
+def test_cached_feed_replays_offline(http_server, feed, tmp_path):
+    http_server.routes["/feed.xml"] = feed
+    cache_dir = str(tmp_path / "cache")
+    online = ostaGIS.state_dept_twas(cache_dir=cache_dir, url=http_server.url("/feed.xml"))
+
+    xml_path, _ = ostaGIS._feed_cache_paths(cache_dir, http_server.url("/feed.xml"))
+    assert os.path.exists(xml_path)
+    offline = ostaGIS.state_dept_twas(source=xml_path)
+    pd.testing.assert_frame_equal(offline, online)
+    assert len(http_server.requests) == 1
+
+
+def test_incremental_run_equals_full_run(tmp_path):
+    changed = [
+        ("FR", "France - Level 2: Exercise Increased Caution", "france", "Terrorism and unrest in France."),
+        ("SY", "Syria - Level 3: Reconsider Travel", "syria", "Civil unrest in Syria."),
+        ADVISORIES[3],
+        ("IZ", "Iraq - Level 4: Do Not Travel", "iraq", "Terrorism in Iraq."),
+    ]
+    state_dir = str(tmp_path / "state")
+    ostaGIS.state_dept_twas(source=make_feed(ADVISORIES), state_dir=state_dir)
+
+    incremental = ostaGIS.state_dept_twas(source=make_feed(changed), state_dir=state_dir)
+    full = ostaGIS.state_dept_twas(source=make_feed(changed))
+    pd.testing.assert_frame_equal(incremental, full)
+
+    changes = incremental.attrs["changes"]
+    assert changes["processed"] == 3
+    assert (changes["added"], changes["updated"], changes["removed"]) == (["IRQ"], ["FRA", "SYR"], ["JPN"])
+    assert changes["threat_level_changes"] == [
+        {"ISO3_CODE": "SYR", "country": "Syria", "old": "Level 4: Do Not Travel", "new": "Level 3: Reconsider Travel"},
+    ]
+
+
+def test_incremental_export_equals_full_export(tmp_path):
+    state_dir = str(tmp_path / "state")
+    ostaGIS.state_dept_twas(str(tmp_path / "first.csv"), source=make_feed(ADVISORIES[:3]), state_dir=state_dir)
+    ostaGIS.state_dept_twas(str(tmp_path / "incremental.csv"), source=make_feed(ADVISORIES), state_dir=state_dir)
+    ostaGIS.state_dept_twas(str(tmp_path / "full.csv"), source=make_feed(ADVISORIES))
+    assert (tmp_path / "incremental.csv").read_bytes() == (tmp_path / "full.csv").read_bytes()
+
+
+def page(title, text):
+    return (
+        f"<html><head><title>{title}</title><script>var x = 1;</script><style>p {{}}</style></head>"
+        f"<body><nav>Menu</nav><h1>{title}</h1><p>{text}</p><footer>Footer</footer></body></html>"
+    ).encode("utf-8")
+
+
+def test_enrich_fetches_each_page_once(http_server, feed, tmp_path):
+    twas = ostaGIS.state_dept_twas(source=feed)
+    # Point the advisory and OSAC links at the local server
+    twas["link"] = twas["link"].str.replace("https://travel.state.gov", http_server.url(""), regex=False)
+    twas["security_report"] = twas["security_report"].str.replace("https://www.osac.gov", http_server.url(""), regex=False)
+
+    advisories = "/content/travel/en/traveladvisories/traveladvisories"
+    http_server.routes.update({
+        f"{advisories}/france-travel-advisory.html": page("France", "Exercise increased caution in France."),
+        f"{advisories}/syria-travel-advisory.html": [503, page("Syria", "Do not travel to Syria.")],
+        f"{advisories}/japan-travel-advisory.html": page("Japan", "Exercise normal precautions."),
+        "/Content/Report/FR": page("France report", "Crime is moderate."),
+        "/Content/Report/SY": page("Syria report", "Conflict is ongoing."),
+        "/Content/Report/JA": page("Japan report", "Crime is low."),
+    })
+    cache_dir = str(tmp_path / "pages")
+    enriched = ostaGIS.enrich_twas(twas, cache_dir=cache_dir, per_host_rate=100).set_index("ISO3_CODE")
+
+    assert enriched.loc["FRA", "advisory_text"] == "France Exercise increased caution in France."
+    assert enriched.loc["FRA", "security_report_text"] == "France report Crime is moderate."
+    # Retried after the 503
+    assert enriched.loc["SYR", "advisory_text"] == "Syria Do not travel to Syria."
+    assert http_server.hits(f"{advisories}/syria-travel-advisory.html") == 2
+    # Not found...left empty
+    assert pd.isna(enriched.loc["AZE", "advisory_text"])
+    assert pd.isna(enriched.loc["AZE", "security_report_text"])
+    assert http_server.hits(f"{advisories}/france-travel-advisory.html") == 1
+
+    # Only the pages that were not fetched are requested again...the rest come from the cache
+    requests = len(http_server.requests)
+    again = ostaGIS.enrich_twas(twas, cache_dir=cache_dir, per_host_rate=100).set_index("ISO3_CODE")
+    assert len(http_server.requests) - requests == 2
+    pd.testing.assert_frame_equal(again, enriched)
+
+
+def test_empty_feed(tmp_path):
+    state_dir = str(tmp_path / "state")
+    # No advisories and no state of a last run
+    incremental = ostaGIS.state_dept_twas(source=make_feed([]), state_dir=state_dir)
+    full = ostaGIS.state_dept_twas(source=make_feed([]))
+    assert incremental.columns.tolist() == full.columns.tolist() == ostaGIS._twas_columns
+    assert len(incremental) == len(full) == 0
+    assert incremental.attrs["changes"]["added"] == []
+
+    # The next run processes every advisory...and an empty feed after that removes them all
+    first = ostaGIS.state_dept_twas(source=make_feed(ADVISORIES), state_dir=state_dir)
+    assert first.attrs["changes"]["added"] == ["AZE", "FRA", "JPN", "SYR"]
+    emptied = ostaGIS.state_dept_twas(source=make_feed([]), state_dir=state_dir)
+    assert len(emptied) == 0
+    assert emptied.attrs["changes"]["removed"] == ["AZE", "FRA", "JPN", "SYR"]
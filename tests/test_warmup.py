@@ -0,0 +1,38 @@
+import pandas as pd
+import pytest
+
+import ostaGIS
+
+
+@pytest.fixture
+def shared(monkeypatch):
+    # Empty shared state for the test...the module's own converter/matcher are put back after it
+    shared = {}
+    monkeypatch.setattr(ostaGIS, "_shared", shared)
+    return shared
+
+
+def test_warmup_builds_the_shared_converter_and_matcher(shared, monkeypatch):
+    import country_converter as coco
+
+    ostaGIS.warmup()
+    assert isinstance(shared["cc"], coco.CountryConverter)
+    assert isinstance(shared["matcher"], ostaGIS.CountryMatcher)
+    cc, matcher = shared["cc"], shared["matcher"]
+
+    # Nothing is built again by the next calls
+    def rebuilt(*args, **kwargs):
+        raise AssertionError("shared state was rebuilt")
+
+    monkeypatch.setattr(coco, "CountryConverter", rebuilt)
+    monkeypatch.setattr(ostaGIS, "CountryMatcher", rebuilt)
+    df = pd.DataFrame({"text": ["Attacks in Syria", "Cells in Iraq and Iran"]})
+    for engine in ["batch", "matcher"]:
+        parsed = ostaGIS.parse_country(df, "text", "aor", explode=False, engine=engine)
+        assert parsed["aor"].tolist() == [["SYR"], ["IRN", "IRQ"]]
+    assert shared["cc"] is cc and shared["matcher"] is matcher
+
+
+def test_warmup_without_matcher(shared):
+    ostaGIS.warmup(matcher=False)
+    assert set(shared) == {"cc"}
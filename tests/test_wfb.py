@@ -0,0 +1,67 @@
+import datetime
+
+import pandas as pd
+import pytest
+
+import ostaGIS
+from tests.conftest import REPO
+
+T_ORGS_HTML = "help/mapping_t_orgs/CIA_t_o.html"
+WFB_HTML = "help/world_fact_book_scraping/CIA_wfb.html"
+
+
+@pytest.fixture(autouse=True)
+def repo_root(monkeypatch):
+    monkeypatch.chdir(REPO)
+
+
+@pytest.fixture(scope="module")
+def batch():
+    return ostaGIS.wfb_tos_batch([T_ORGS_HTML], snapshot_dates={T_ORGS_HTML: datetime.date(2025, 6, 1)})
+
+
+def test_batch_rows_and_snapshot(batch):
+    assert len(batch) == 77
+    assert batch["name"].is_unique
+    assert set(batch["snapshot_date"]) == {pd.Timestamp("2025-06-01")}
+    assert set(batch["snapshot_source"]) == {T_ORGS_HTML}
+
+
+def test_batch_area_of_operation_is_stripped(batch):
+    aor = batch.set_index("name")["area of operation"].dropna()
+    assert not aor.str.contains("\xa0").any()
+    assert (aor == aor.str.strip()).all()
+    assert aor["al-Qa'ida in the Indian Subcontinent (AQIS)"] == "Afghanistan, Bangladesh, India, and Pakistan"
+
+
+def test_batch_area_of_operation_matches_geoscraper(batch):
+    single = ostaGIS.wfb_tos_geoscraper(T_ORGS_HTML)
+    aor = dict(zip(batch["name"].str.strip(), batch["area of operation"]))
+    # The geoscraper keeps the \xa0 padding, and runs the AOR of these two into the next field's text
+    run_on = {"Asa’ib Ahl al-Haqq (AAH)", "Jaish-e-Mohammed (JeM)"}
+    for name, text in zip(single["index"].str.strip(), single["area of operation"]):
+        if name in run_on:
+            assert text.startswith(aor[name])
+        else:
+            assert aor[name] == text.strip(" \xa0")
+
+
+def test_sub_branch_headings_are_not_fields(batch):
+    other = {label for labels in batch["other"] for label in labels}
+    assert other == {"note"}
+
+
+@pytest.mark.parametrize("n_jobs", [0, True, False, -2])
+def test_bad_n_jobs_raises(n_jobs):
+    with pytest.raises(Exception, match="n_jobs param"):
+        ostaGIS.wfb_tos_batch([T_ORGS_HTML], n_jobs=n_jobs)
+
+
+@pytest.mark.parametrize("name", ["wfb_countries_coded", "wfb_countries_not_coded"])
+def test_country_scrape_csv_matches_bundled(tmp_path, name):
+    ostaGIS.wfb_country_scrape(WFB_HTML, str(tmp_path))
+    written = (tmp_path / f"{name}.csv").read_bytes()
+    with open(f"help/example_datasets/{name}.csv", "rb") as file:
+        bundled = file.read()
+    # The bundled CSVs were written on Windows...pandas ends the lines with os.linesep
+    assert written.replace(b"\r\n", b"\n") == bundled.replace(b"\r\n", b"\n")
@@ -0,0 +1,54 @@
+import pandas as pd
+import pytest
+
+import ostaGIS
+
+
+@pytest.fixture
+def df():
+    return pd.DataFrame({
+        "country": ["France", "Syria", "Japan"],
+        "ISO3_CODE": ["FRA", "SYR", "JPN"],
+        "level": [2, 4, 1],
+        "score": [0.5, None, 1.25],
+    })
+
+
+def read_back(path, fmt):
+    if fmt == "parquet":
+        return pd.read_parquet(path)
+    if fmt == "feather":
+        return pd.read_feather(path)
+    if fmt == "csv":
+        return pd.read_csv(path, index_col=0)
+    if fmt == "xlsx":
+        return pd.read_excel(path, sheet_name="advisories", index_col=0)
+    import pyogrio
+    return pyogrio.read_dataframe(path, layer="advisories").drop(columns="geometry", errors="ignore")
+
+
+@pytest.mark.parametrize("fmt", ["csv", "xlsx", "parquet", "feather", "gpkg"])
+def test_round_trip(df, tmp_path, fmt):
+    if fmt == "xlsx":
+        pytest.importorskip("openpyxl")
+    elif fmt == "gpkg":
+        pytest.importorskip("pyogrio")
+    else:
+        pytest.importorskip("pyarrow")
+    path = tmp_path / f"advisories.{fmt}"
+    assert ostaGIS.write_table(df, path, name="advisories") == str(path)
+    pd.testing.assert_frame_equal(read_back(str(path), fmt), df, check_dtype=False, check_index_type=False)
+
+
+def test_fmt_overrides_the_extension(df, tmp_path):
+    path = str(tmp_path / "advisories.txt")
+    ostaGIS.write_table(df, path, fmt="csv")
+    pd.testing.assert_frame_equal(pd.read_csv(path, index_col=0), df, check_dtype=False)
+
+
+def test_unknown_fmt_raises(df, tmp_path):
+    with pytest.raises(Exception, match="fmt param cannot equal 'json'"):
+        ostaGIS.write_table(df, tmp_path / "advisories.csv", fmt="json")
+    with pytest.raises(Exception, match="cannot tell the format"):
+        ostaGIS.write_table(df, tmp_path / "advisories.json")
+    assert list(tmp_path.iterdir()) == []